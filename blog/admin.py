@@ -2,6 +2,9 @@ from django import forms
 from django.contrib import admin
 from .models import Post, Category, NewsletterSubscriber, PartnershipRequest
 from django_ckeditor_5.widgets import CKEditor5Widget
+from rearm.changelist import FastChangeListMixin
+from rearm.export import ExportAdminMixin
+from rearm.search import SearchAdminMixin
 
 class PostAdminForm(forms.ModelForm):
     class Meta:
@@ -12,11 +15,12 @@ class PostAdminForm(forms.ModelForm):
         }
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(FastChangeListMixin, SearchAdminMixin, admin.ModelAdmin):
     form = PostAdminForm
     list_display = ('title', 'author', 'created_at', 'is_published')
+    list_select_related = ('author',)
     list_filter = ('is_published', 'categories', 'created_at')
-    search_fields = ('title', 'content')
+    search_fields = ('title', 'content')  # searched through the full-text index
     prepopulated_fields = {'slug': ('title',)}
 
 @admin.register(Category)
@@ -24,16 +28,19 @@ class CategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
 
 @admin.register(NewsletterSubscriber)
-class NewsletterSubscriberAdmin(admin.ModelAdmin):
+class NewsletterSubscriberAdmin(FastChangeListMixin, ExportAdminMixin, admin.ModelAdmin):
     list_display = ('email', 'subscribed_at')
     search_fields = ('email',)
+    list_filter = ('subscribed_at',)
+    ordering = ('-subscribed_at',)
 
 from django.contrib import admin
 from .models import PartnershipRequest
 
 @admin.register(PartnershipRequest)
-class PartnershipRequestAdmin(admin.ModelAdmin):
+class PartnershipRequestAdmin(FastChangeListMixin, ExportAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'email', 'business_name', 'business_type', 'submitted_at', 'status_icon')
+    ordering = ('-submitted_at',)
     list_filter = ('business_type', 'submitted_at')
     search_fields = ('name', 'email', 'business_name', 'phone')
     list_per_page = 20
@@ -0,0 +1,130 @@
+"""
+Async versions of the blog's read views (see rearm.async_views).
+
+Same templates, context and caching as blog.views; every query goes
+through the async ORM before rendering. The newsletter POST on the blog
+home still validates and enqueues like the sync view, with the outbox
+insert run in a thread.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.views.decorators.http import require_GET
+from rearm.async_views import alist, arender
+from rearm.conditional import detail_condition
+from rearm.context_processors import aglobal_context
+from rearm.outbox import enqueue
+from rearm.pagecache import cache_page_tagged
+from .forms import NewsletterForm, NewsletterSignupForm
+from .models import Category, NewsletterSubscriber, Post
+from .pagination import KeysetPaginator
+from .views import FEATURED_POSTS, POST_PAGE_TAGS, POSTS_PER_PAGE, RECENT_POSTS
+
+
+def recent_posts():
+    return Post.objects.published().cards().order_by('-created_at')
+
+
+@cache_page_tagged(*POST_PAGE_TAGS)
+async def home(request):
+    if request.method == 'POST':
+        form = NewsletterSignupForm(request.POST)
+        if form.is_valid():
+            await sync_to_async(enqueue)(NewsletterSubscriber, email=form.cleaned_data['email'])
+            return JsonResponse({'success': True})
+        return JsonResponse({'success': False, 'errors': form.errors})
+
+    posts = Post.objects.published().cards().with_card_relations()
+    paginator = KeysetPaginator(posts, POSTS_PER_PAGE)
+
+    window_size = max(FEATURED_POSTS + RECENT_POSTS, POSTS_PER_PAGE + 1)
+    window = await alist(posts.order_by('-created_at', '-id')[:window_size])
+
+    cursor = request.GET.get('cursor')
+    page_obj = await paginator.aget_page(cursor) if cursor else paginator.page_from_rows(window)
+
+    return await arender(request, 'blog/post_list.html', {
+        'posts': page_obj,
+        'page_obj': page_obj,
+        'featured_posts': window[:FEATURED_POSTS],
+        'recent_posts': window[FEATURED_POSTS:FEATURED_POSTS + RECENT_POSTS],
+        'categories': await alist(Category.objects.all()),
+        'newsletter_form': NewsletterForm()
+    })
+
+
+@cache_page_tagged(*POST_PAGE_TAGS)
+async def post_list_all(request):
+    posts = Post.objects.published().cards().with_card_relations().order_by('-created_at')
+    page = await KeysetPaginator(posts, POSTS_PER_PAGE).aget_page(request.GET.get('cursor'))
+
+    # What PostListView puts in the context
+    return await arender(request, 'blog/post_list.html', {
+        'paginator': None,
+        'page_obj': page,
+        'is_paginated': page.has_next() or page.has_previous(),
+        'object_list': page.object_list,
+        'posts': page.object_list,
+        'recent_posts': await alist(recent_posts()[:5]),
+        'categories': await alist(Category.objects.all()),
+        'newsletter_form': NewsletterForm(),
+    })
+
+
+@detail_condition(Post.objects.all(), tags=POST_PAGE_TAGS)
+@cache_page_tagged(*POST_PAGE_TAGS)
+async def post_detail(request, slug):
+    # The template shows the author and category links: fetch them up front
+    post = await aget_object_or_404(
+        Post.objects.select_related('author').prefetch_related('categories'), slug=slug
+    )
+    return await arender(request, 'blog/post_detail.html', {
+        'object': post,
+        'post': post,
+        'recent_posts': await alist(recent_posts().exclude(id=post.id)[:5]),
+        'categories': await alist(Category.objects.all()),
+        'newsletter_form': NewsletterForm(),
+    })
+
+
+@cache_page_tagged(*POST_PAGE_TAGS)
+async def category_posts(request, slug):
+    category = await aget_object_or_404(Category, slug=slug)
+    posts = Post.objects.published().cards().with_card_relations().filter(categories=category)
+    page_obj = await KeysetPaginator(posts, POSTS_PER_PAGE).aget_page(request.GET.get('cursor'))
+
+    return await arender(request, 'blog/post_list.html', {
+        'posts': page_obj,
+        'page_obj': page_obj,
+        'category': category,
+        'recent_posts': await alist(recent_posts()[:5]),
+        'categories': await alist(Category.objects.all()),
+        'newsletter_form': NewsletterForm()
+    })
+
+
+@require_GET
+async def post_list_json(request):
+    """Next page of post cards for infinite scroll (`?cursor=`, `?category=`)."""
+    posts = Post.objects.published().cards().with_card_relations()
+    category_slug = request.GET.get('category')
+    if category_slug:
+        posts = posts.filter(categories__slug=category_slug)
+
+    page = await KeysetPaginator(posts, POSTS_PER_PAGE).aget_page(request.GET.get('cursor'))
+
+    next_url = None
+    if page.has_next():
+        params = {'cursor': page.next_cursor}
+        if category_slug:
+            params['category'] = category_slug
+        next_url = f"{reverse('post_list_json')}?{urlencode(params)}"
+
+    await aglobal_context(request)
+    return JsonResponse({
+        'html': render_to_string('blog/includes/post_cards.html', {'posts': page}, request=request),
+        'next': next_url,
+    })
@@ -1,5 +1,5 @@
 from django import forms
-from .models import NewsletterSubscriber, Category
+from .models import NewsletterSubscriber, Category, PartnershipRequest
 from django_ckeditor_5.widgets import CKEditor5Widget
 from django_ckeditor_5.fields import CKEditor5Field
 
@@ -25,3 +25,18 @@ class NewsletterForm(forms.ModelForm):
             })
         }
 
+
+class NewsletterSignupForm(forms.Form):
+    """Signup validation without NewsletterForm's uniqueness query; duplicates
+    are dropped when the lead outbox is drained."""
+    email = forms.EmailField()
+
+    def clean_email(self):
+        return self.cleaned_data['email'].strip().lower()
+
+
+class PartnershipRequestForm(forms.ModelForm):
+    class Meta:
+        model = PartnershipRequest
+        fields = ['name', 'email', 'position', 'phone', 'business_name', 'business_type',
+                  'business_location', 'interest', 'message']
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Recompute excerpt, plain text, word count and reading time for posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Posts to load and update per round trip')
+        parser.add_argument('--missing-only', action='store_true',
+                            help='Only process posts whose plain text is still empty')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        posts = Post.objects.only('id', 'content').order_by('pk')
+        if options['missing_only']:
+            posts = posts.filter(plain_text='')
+
+        # Walk the table by primary key so every batch is one range read,
+        # however large the table gets.
+        total = 0
+        last_pk = 0
+        while True:
+            batch = list(posts.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            for post in batch:
+                post.refresh_text_fields()
+            Post.objects.bulk_update(batch, Post.TEXT_FIELDS)
+            last_pk = batch[-1].pk
+            total += len(batch)
+            self.stdout.write(f'{total} posts updated...')
+
+        self.stdout.write(self.style.SUCCESS(f'Updated {total} posts.'))
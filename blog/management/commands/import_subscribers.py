@@ -0,0 +1,149 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from blog.models import NewsletterSubscriber
+
+
+class Command(BaseCommand):
+    help = ('Import newsletter subscribers from a CSV or JSONL file (or stdin), '
+            'streaming, in batches; resumable with --offset')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Input format (default: from the file extension, csv for stdin)')
+        parser.add_argument('--column', default='email',
+                            help='CSV column / JSON key holding the email address')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per bulk_create')
+        parser.add_argument('--offset', type=int, default=0,
+                            help='Byte offset to resume from, as printed by an earlier run')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        self.column = options['column']
+        self.batch_size = options['batch_size']
+        self.offset = 0
+        # Where a rerun should start if we stop before the first batch is written
+        self.committed_offset = options['offset']
+
+        stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        try:
+            lines = self.read_lines(stream)
+            if fmt == 'csv':
+                records = self.csv_records(lines, stream, options['offset'])
+            else:
+                self.skip_to(stream, options['offset'])
+                records = self.jsonl_records(lines)
+            self.import_records(records)
+        except KeyboardInterrupt:
+            raise CommandError(f'Interrupted; resume with --offset {self.committed_offset}')
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+    def read_lines(self, stream):
+        # Binary reads so self.offset counts bytes, whatever the encoding
+        for raw in iter(stream.readline, b''):
+            self.offset += len(raw)
+            yield raw.decode('utf-8-sig' if self.offset == len(raw) else 'utf-8', errors='replace')
+
+    def skip_to(self, stream, offset):
+        if offset <= self.offset:
+            return
+        if stream.seekable():
+            stream.seek(offset)
+        else:
+            remaining = offset - self.offset
+            while remaining:
+                chunk = stream.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+        self.offset = offset
+
+    def csv_records(self, lines, stream, offset):
+        header = next(csv.reader(lines), None)
+        if header is None:
+            return
+        columns = [name.strip().lower() for name in header]
+        if self.column.lower() not in columns:
+            raise CommandError(f'No {self.column!r} column in the CSV header: {header}')
+        email_index = columns.index(self.column.lower())
+        date_index = columns.index('subscribed_at') if 'subscribed_at' in columns else None
+
+        self.skip_to(stream, offset)
+        for row in csv.reader(lines):
+            if len(row) > email_index:
+                subscribed_at = row[date_index] if date_index is not None and len(row) > date_index else None
+                yield row[email_index], subscribed_at, self.offset
+            else:
+                yield None, None, self.offset
+
+    def jsonl_records(self, lines):
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield None, None, self.offset
+                continue
+            if isinstance(record, dict):
+                yield record.get(self.column), record.get('subscribed_at'), self.offset
+            else:
+                yield record, None, self.offset
+
+    def import_records(self, records):
+        started = time.monotonic()
+        now = timezone.now()
+        total = invalid = 0
+        batch = {}
+
+        for email, subscribed_at, offset in records:
+            total += 1
+            email = self.normalize(email)
+            if email is None:
+                invalid += 1
+            elif email not in batch:
+                date = parse_datetime(subscribed_at) if isinstance(subscribed_at, str) else None
+                if date is not None and timezone.is_naive(date):
+                    date = timezone.make_aware(date)
+                batch[email] = NewsletterSubscriber(email=email, subscribed_at=date or now)
+
+            if len(batch) >= self.batch_size:
+                self.flush(batch, offset, total, invalid, started)
+        self.flush(batch, self.offset, total, invalid, started)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {total} rows ({invalid} invalid) in {time.monotonic() - started:.1f}s.'
+        ))
+
+    def normalize(self, email):
+        if not isinstance(email, str):
+            return None
+        email = email.strip().lower()
+        try:
+            validate_email(email)
+        except ValidationError:
+            return None
+        return email
+
+    def flush(self, batch, offset, total, invalid, started):
+        if batch:
+            # Existing subscribers are skipped by the unique index
+            NewsletterSubscriber.objects.bulk_create(batch.values(), ignore_conflicts=True)
+            batch.clear()
+        self.committed_offset = offset
+        elapsed = time.monotonic() - started
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(f'{total} rows ({invalid} invalid), {rate:.0f} rows/s, offset {offset}')
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_post_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='newslettersubscriber',
+            name='subscribed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='partnershiprequest',
+            name='submitted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_lead_date_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['-created_at', '-id'], name='blog_post_published_idx'),
+        ),
+        # Same access path; the ORM's bare boolean test can only seek on the partial index
+        migrations.RemoveIndex(
+            model_name='post',
+            name='blog_post_pub_created_idx',
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+from blog.models import text_fields
+
+BATCH_SIZE = 500
+
+
+def backfill_text_fields(apps, schema_editor):
+    # Posts written before 0002 have empty derived columns: fill them in,
+    # walking the table by primary key (as backfill_post_text does)
+    Post = apps.get_model('blog', 'Post')
+    posts = Post.objects.using(schema_editor.connection.alias).filter(plain_text='')
+    posts = posts.only('id', 'content').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        for post in batch:
+            for name, value in text_fields(post.content).items():
+                setattr(post, name, value)
+        Post.objects.using(schema_editor.connection.alias).bulk_update(
+            batch, ['excerpt', 'plain_text', 'word_count', 'reading_time'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_post_published_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_text_fields, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,11 @@
+import html
 import logging
+import math
 from django.db import models
 from django.contrib.auth import get_user_model
-from django.utils.text import slugify
+from django.utils import timezone
+from django.utils.html import strip_tags
+from django.utils.text import slugify, Truncator
 from django.urls import reverse
 from django_ckeditor_5.fields import CKEditor5Field
 from django.conf import settings 
@@ -22,6 +26,45 @@ class Category(models.Model):
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)  
 
+EXCERPT_WORDS = 20
+WORDS_PER_MINUTE = 200
+
+
+def html_to_text(value):
+    """Plain text of a CKEditor HTML body, whitespace collapsed."""
+    return ' '.join(html.unescape(strip_tags(value or '')).split())
+
+
+def text_fields(content):
+    """Post.TEXT_FIELDS derived from an HTML body (also used by migrations)."""
+    plain_text = html_to_text(content)
+    word_count = len(plain_text.split())
+    return {
+        'excerpt': Truncator(plain_text).words(EXCERPT_WORDS),
+        'plain_text': plain_text,
+        'word_count': word_count,
+        'reading_time': math.ceil(word_count / WORDS_PER_MINUTE) if word_count else 0,
+    }
+
+
+class PostQuerySet(models.QuerySet):
+    # Columns the list cards render; never pulls the HTML body.
+    CARD_FIELDS = (
+        'id', 'title', 'slug', 'author', 'featured_image', 'created_at',
+        'excerpt', 'word_count', 'reading_time',
+    )
+
+    def published(self):
+        return self.filter(is_published=True)
+
+    def cards(self):
+        return self.only(*self.CARD_FIELDS)
+
+    def with_card_relations(self):
+        # author and category badges are shown on every card
+        return self.select_related('author').prefetch_related('categories')
+
+
 class Post(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True, max_length=200)
@@ -38,16 +81,41 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=False)
-    
+
+    # Derived from `content` on save (see refresh_text_fields)
+    excerpt = models.TextField(blank=True, editable=False)
+    plain_text = models.TextField(blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveIntegerField(default=0, editable=False, help_text="Minutes")
+
+    objects = PostQuerySet.as_manager()
+
+    TEXT_FIELDS = ('excerpt', 'plain_text', 'word_count', 'reading_time')
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Published listings, "latest posts" and keyset pagination (one range
+            # scan per page, see blog.pagination): WHERE is_published ORDER BY created_at
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_published=True),
+                         name='blog_post_published_idx'),
+        ]
     
     def __str__(self):
         return self.title
+
+    def refresh_text_fields(self):
+        for name, value in text_fields(self.content).items():
+            setattr(self, name, value)
     
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.refresh_text_fields()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(self.TEXT_FIELDS)
         super().save(*args, **kwargs)  # ✅ FIXED
     
     def get_absolute_url(self):
@@ -55,7 +123,7 @@ class Post(models.Model):
 
 class NewsletterSubscriber(models.Model):
     email = models.EmailField(unique=True)
-    subscribed_at = models.DateTimeField(auto_now_add=True)
+    subscribed_at = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
     
     def __str__(self):
         return self.email
@@ -74,7 +142,7 @@ class PartnershipRequest(models.Model):
     business_location = models.CharField(max_length=100, blank=True)
     interest = models.CharField(max_length=200)
     message = models.TextField(blank=True)
-    submitted_at = models.DateTimeField(auto_now_add=True)
+    submitted_at = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
     
     def __str__(self):
         return f"Partnership request from {self.name}"
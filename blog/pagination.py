@@ -0,0 +1,104 @@
+"""
+Keyset (cursor) pagination for post lists.
+
+Pages are keyed on (created_at, id) so each page is one index range scan:
+no COUNT(*) and no OFFSET, however deep the reader goes. Cursors are
+opaque url-safe tokens; a malformed one just gives the first page.
+"""
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(post, direction):
+    payload = json.dumps([post.created_at.isoformat(), post.pk, direction])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (created_at, pk, direction) or None for a bad token."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, pk, direction = json.loads(base64.urlsafe_b64decode(padded))
+        created_at = parse_datetime(created_at)
+    except (ValueError, TypeError, binascii.Error):
+        return None
+    if created_at is None or not isinstance(pk, int) or direction not in ('next', 'prev'):
+        return None
+    return created_at, pk, direction
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, prev_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+
+class KeysetPaginator:
+    """Newest-first pages of `queryset`, ordered by (-created_at, -id)."""
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def get_page(self, token):
+        cursor = decode_cursor(token)
+        return self._page_for(cursor, list(self._rows(cursor)))
+
+    async def aget_page(self, token):
+        cursor = decode_cursor(token)
+        return self._page_for(cursor, [row async for row in self._rows(cursor)])
+
+    def _rows(self, cursor):
+        """The query for the page at `cursor`: up to per_page + 1 rows, in scan order."""
+        qs = self.queryset
+        if cursor is None:
+            return qs.order_by('-created_at', '-id')[:self.per_page + 1]
+
+        created_at, pk, direction = cursor
+        if direction == 'next':
+            return qs.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            ).order_by('-created_at', '-id')[:self.per_page + 1]
+        return qs.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+        ).order_by('created_at', 'id')[:self.per_page + 1]
+
+    def _page_for(self, cursor, rows):
+        if cursor is None:
+            return self.page_from_rows(rows)
+        if cursor[2] == 'next':
+            return self.page_from_rows(rows, has_before=True)
+        has_before = len(rows) > self.per_page
+        return self._page(rows[:self.per_page][::-1], True, has_before)
+
+    def page_from_rows(self, rows, has_before=False):
+        """Page from rows already fetched newest-first, up to per_page + 1 of them."""
+        return self._page(rows[:self.per_page], len(rows) > self.per_page, has_before)
+
+    def _page(self, rows, has_more, has_before):
+        if not rows:
+            return KeysetPage([])
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1], 'next') if has_more else None,
+            prev_cursor=encode_cursor(rows[0], 'prev') if has_before else None,
+        )
@@ -0,0 +1,45 @@
+// Infinite scroll for the post list: when the pager comes into view, fetch
+// the next page of cards from the JSON endpoint and append them.
+document.addEventListener('DOMContentLoaded', function() {
+    const grid = document.getElementById('post-masonry');
+    const pager = document.getElementById('post-pagination');
+
+    if (!grid || !pager || !pager.dataset.nextUrl || !('IntersectionObserver' in window)) {
+        return;  // plain next/previous links still work
+    }
+
+    // Cards load on scroll, so the "older posts" link is only a no-JS fallback
+    const nextLink = pager.querySelector('.page-next');
+    if (nextLink) nextLink.hidden = true;
+
+    let loading = false;
+
+    const observer = new IntersectionObserver(async function(entries) {
+        if (!entries[0].isIntersecting || loading || !pager.dataset.nextUrl) return;
+        loading = true;
+
+        try {
+            const response = await fetch(pager.dataset.nextUrl, {
+                headers: { 'X-Requested-With': 'XMLHttpRequest' }
+            });
+            if (!response.ok) throw new Error('HTTP ' + response.status);
+
+            const data = await response.json();
+            grid.insertAdjacentHTML('beforeend', data.html);
+
+            if (data.next) {
+                pager.dataset.nextUrl = data.next;
+            } else {
+                observer.disconnect();
+                pager.remove();
+            }
+        } catch (error) {
+            console.error('Infinite scroll error:', error);
+            observer.disconnect();
+        } finally {
+            loading = false;
+        }
+    }, { rootMargin: '400px' });
+
+    observer.observe(pager);
+});
@@ -1,3 +1,183 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import shutil
+import tempfile
+from importlib import import_module
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .management.commands import import_subscribers
+from .models import NewsletterSubscriber, Post
+from .pagination import KeysetPaginator, decode_cursor, encode_cursor
+from .views import FEATURED_POSTS, POSTS_PER_PAGE, RECENT_POSTS
+from rearm.tests import LOCMEM_CACHE, PLAIN_STORAGES
+
+
+class PostTextFieldTests(TestCase):
+    """Excerpt, plain text and reading time follow the body, old rows included."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = get_user_model().objects.create(username='author')
+
+    def test_save_derives_the_text_fields(self):
+        post = Post.objects.create(title='Harvest', author=self.author,
+                                   content='<p>Maize &amp; beans</p>\n' + '<p>word</p>\n' * 250)
+        self.assertEqual(post.plain_text[:13], 'Maize & beans')
+        self.assertEqual(post.excerpt, 'Maize & beans ' + 'word ' * 16 + 'word…')
+        self.assertEqual((post.word_count, post.reading_time), (253, 2))
+
+    def test_migration_backfills_existing_posts(self):
+        for i in range(3):
+            Post.objects.create(title=f'Post {i}', author=self.author, content=f'<p>Harvest {i}</p>')
+        Post.objects.update(excerpt='', plain_text='', word_count=0, reading_time=0)
+        migration = import_module('blog.migrations.0007_backfill_post_text')
+        with mock.patch.object(migration, 'BATCH_SIZE', 2):
+            migration.backfill_text_fields(apps, connection.schema_editor())
+        self.assertEqual(list(Post.objects.order_by('pk').values_list('plain_text', 'reading_time')),
+                         [('Harvest 0', 1), ('Harvest 1', 1), ('Harvest 2', 1)])
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursors walk (-created_at, -id) both ways; ties and bad tokens are handled."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = get_user_model().objects.create(username='author')
+        for i in range(7):
+            Post.objects.create(title=f'Post {i}', author=author, content='<p>-</p>', is_published=True)
+        # Two pairs share a timestamp, so pages must break ties on id
+        now = timezone.now()
+        for i, pk in enumerate(Post.objects.order_by('pk').values_list('pk', flat=True)):
+            Post.objects.filter(pk=pk).update(created_at=now - timezone.timedelta(minutes=i // 2))
+        cls.newest_first = list(Post.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def pks(self, page):
+        return [post.pk for post in page]
+
+    def test_next_and_prev_round_trip(self):
+        paginator = KeysetPaginator(Post.objects.all(), 3)
+        pages = [paginator.get_page(None)]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual([self.pks(page) for page in pages],
+                         [self.newest_first[:3], self.newest_first[3:6], self.newest_first[6:]])
+        self.assertFalse(pages[0].has_previous())
+
+        back = paginator.get_page(pages[2].prev_cursor)
+        self.assertEqual(self.pks(back), self.newest_first[3:6])
+        self.assertEqual(back.next_cursor, pages[1].next_cursor)
+        first = paginator.get_page(back.prev_cursor)
+        self.assertEqual(self.pks(first), self.newest_first[:3])
+        self.assertFalse(first.has_previous())
+
+    def test_cursor_round_trips(self):
+        post = Post.objects.get(pk=self.newest_first[0])
+        self.assertEqual(decode_cursor(encode_cursor(post, 'prev')), (post.created_at, post.pk, 'prev'))
+
+    def test_invalid_cursor_gives_the_first_page(self):
+        paginator = KeysetPaginator(Post.objects.all(), 3)
+        post = Post.objects.get(pk=self.newest_first[0])
+        tampered = [base64.urlsafe_b64encode(json.dumps(payload).encode()).decode() for payload in (
+            [post.created_at.isoformat(), post.pk, 'sideways'],
+            [post.created_at.isoformat(), str(post.pk), 'next'],
+            ['yesterday', post.pk, 'next'],
+            {},
+        )]
+        for token in ['garbage!', encode_cursor(post, 'next')[:-4], *tampered]:
+            with self.subTest(token=token):
+                self.assertIsNone(decode_cursor(token))
+                self.assertEqual(self.pks(paginator.get_page(token)), self.newest_first[:3])
+
+
+@override_settings(CACHES=LOCMEM_CACHE, QUERY_BUDGET_ENABLED=False, PAGE_CACHE_ENABLED=False,
+                   STORAGES=PLAIN_STORAGES)
+class BlogHomeTests(TestCase):
+    """Featured, recent and the first page are all cut from one window of posts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = get_user_model().objects.create(username='author')
+
+    def publish(self, count):
+        for i in range(count):
+            Post.objects.create(title=f'Post {i}', author=self.author, content='<p>-</p>', is_published=True)
+        Post.objects.create(title='Draft', author=self.author, content='<p>-</p>')
+        return list(Post.objects.published().order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def context(self, **params):
+        response = self.client.get(reverse('post_list'), params)
+        self.assertEqual(response.status_code, 200)
+        return {name: response.context[name] for name in ('featured_posts', 'recent_posts', 'posts')}
+
+    def pks(self, posts):
+        return [post.pk for post in posts]
+
+    def test_window_is_split_into_featured_recent_and_first_page(self):
+        newest = self.publish(POSTS_PER_PAGE + 3)
+        context = self.context()
+        self.assertEqual(self.pks(context['featured_posts']), newest[:FEATURED_POSTS])
+        self.assertEqual(self.pks(context['recent_posts']),
+                         newest[FEATURED_POSTS:FEATURED_POSTS + RECENT_POSTS])
+        self.assertEqual(self.pks(context['posts']), newest[:POSTS_PER_PAGE])
+        self.assertFalse(context['posts'].has_previous())
+
+        following = self.context(cursor=context['posts'].next_cursor)
+        self.assertEqual(self.pks(following['posts']), newest[POSTS_PER_PAGE:])
+        self.assertFalse(following['posts'].has_next())
+        self.assertEqual(self.pks(following['featured_posts']), newest[:FEATURED_POSTS])
+
+    def test_short_blog_has_one_page(self):
+        newest = self.publish(FEATURED_POSTS + 1)
+        context = self.context()
+        self.assertEqual(self.pks(context['featured_posts']), newest[:FEATURED_POSTS])
+        self.assertEqual(self.pks(context['recent_posts']), newest[FEATURED_POSTS:])
+        self.assertEqual(self.pks(context['posts']), newest)
+        self.assertFalse(context['posts'].has_next())
+
+
+class ImportSubscribersTests(TestCase):
+    def write(self, name, content):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def emails(self):
+        return sorted(NewsletterSubscriber.objects.values_list('email', flat=True))
+
+    def test_csv_is_normalized_and_deduplicated(self):
+        NewsletterSubscriber.objects.create(email='old@example.com')
+        path = self.write('list.csv', 'Name,Email\nAda,ADA@example.com \nAda,ada@example.com\n'
+                                      'Bob,not-an-email\nOld,old@example.com\n')
+        out = StringIO()
+        call_command('import_subscribers', path, batch_size=2, stdout=out)
+        self.assertEqual(self.emails(), ['ada@example.com', 'old@example.com'])
+        self.assertIn('4 rows (1 invalid)', out.getvalue())
+
+    def test_resume_from_printed_offset(self):
+        path = self.write('list.jsonl', '{"email": "a@example.com"}\n"b@example.com"\n{"email": "c@example.com"}\n')
+        out = StringIO()
+        call_command('import_subscribers', path, batch_size=1, stdout=out)
+        first_offset = out.getvalue().splitlines()[0].rsplit(' ', 1)[1]
+
+        NewsletterSubscriber.objects.all().delete()
+        call_command('import_subscribers', path, offset=int(first_offset), stdout=StringIO())
+        self.assertEqual(self.emails(), ['b@example.com', 'c@example.com'])
+
+    def test_interrupt_before_the_first_batch_resumes_from_the_given_offset(self):
+        path = self.write('list.jsonl', '"a@example.com"\n"b@example.com"\n')
+        with mock.patch.object(import_subscribers.Command, 'skip_to', side_effect=KeyboardInterrupt):
+            with self.assertRaisesMessage(CommandError, 'resume with --offset 16'):
+                call_command('import_subscribers', path, offset=16, stdout=StringIO())
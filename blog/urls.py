@@ -1,17 +1,29 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     PostListView, 
     PostDetailView, 
     category_posts, 
+    post_list_json,
     subscribe_newsletter,
     submit_contact,
     home
 )
 
+post_list_all = PostListView.as_view()
+post_detail = PostDetailView.as_view()
+
+# The read pages are served by their async versions under ASGI
+if settings.ASYNC_VIEWS:
+    from .async_views import (
+        category_posts, home, post_detail, post_list_all, post_list_json
+    )
+
 urlpatterns = [
     path('', home, name='post_list'),
-    path('posts/', PostListView.as_view(), name='post_list_all'),
-    path('post/<slug:slug>/', PostDetailView.as_view(), name='post_detail'),
+    path('posts/', post_list_all, name='post_list_all'),
+    path('posts/json/', post_list_json, name='post_list_json'),
+    path('post/<slug:slug>/', post_detail, name='post_detail'),
     path('category/<slug:slug>/', category_posts, name='category_posts'),
     path('subscribe/', subscribe_newsletter, name='subscribe_newsletter'),
     path('contact/', submit_contact, name='submit_contact'),
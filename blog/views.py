@@ -1,49 +1,78 @@
 from django.shortcuts import render, get_object_or_404
 from django.views.generic import ListView, DetailView
 from .models import Post, Category, NewsletterSubscriber
-from .forms import NewsletterForm
+from .forms import NewsletterForm, NewsletterSignupForm, PartnershipRequestForm
 from django.http import JsonResponse
-from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_GET
+from rearm.conditional import detail_condition
+from rearm.outbox import enqueue
+from rearm.pagecache import cache_page_tagged
+from .pagination import KeysetPaginator
 
+POSTS_PER_PAGE = 9
+POST_PAGE_TAGS = ('post:*', 'category:*')
+
+FEATURED_POSTS = 3
+RECENT_POSTS = 3
+
+
+@cache_page_tagged(*POST_PAGE_TAGS)
 def home(request):
-    posts = Post.objects.filter(is_published=True).order_by('-created_at')
-    featured_posts = Post.objects.filter(is_published=True).order_by('-created_at')[:3]
-    recent_posts = Post.objects.filter(is_published=True).order_by('-created_at')[3:6]
-    categories = Category.objects.all()
-    
     if request.method == 'POST':
-        form = NewsletterForm(request.POST)
+        form = NewsletterSignupForm(request.POST)
         if form.is_valid():
-            form.save()
+            enqueue(NewsletterSubscriber, email=form.cleaned_data['email'])
             return JsonResponse({'success': True})
         return JsonResponse({'success': False, 'errors': form.errors})
-    else:
-        form = NewsletterForm()
-    
+    form = NewsletterForm()
+
+    posts = Post.objects.published().cards().with_card_relations()
+    paginator = KeysetPaginator(posts, POSTS_PER_PAGE)
+
+    # One bounded query for the top of the list: featured, recent and the
+    # first page are all sliced from it. Later pages go through the cursor.
+    window_size = max(FEATURED_POSTS + RECENT_POSTS, POSTS_PER_PAGE + 1)
+    window = list(posts.order_by('-created_at', '-id')[:window_size])
+
+    cursor = request.GET.get('cursor')
+    page_obj = paginator.get_page(cursor) if cursor else paginator.page_from_rows(window)
+
     return render(request, 'blog/post_list.html', {
-        'posts': posts,
-        'featured_posts': featured_posts,
-        'recent_posts': recent_posts,
-        'categories': categories,
+        'posts': page_obj,
+        'page_obj': page_obj,
+        'featured_posts': window[:FEATURED_POSTS],
+        'recent_posts': window[FEATURED_POSTS:FEATURED_POSTS + RECENT_POSTS],
+        'categories': Category.objects.all(),
         'newsletter_form': form
     })
 
+@method_decorator(cache_page_tagged(*POST_PAGE_TAGS), name='dispatch')
 class PostListView(ListView):
     model = Post
     template_name = 'blog/post_list.html'
     context_object_name = 'posts'
-    paginate_by = 9
+    paginate_by = POSTS_PER_PAGE
     
     def get_queryset(self):
-        return Post.objects.filter(is_published=True).order_by('-created_at')
+        return Post.objects.published().cards().with_card_relations().order_by('-created_at')
+
+    def paginate_queryset(self, queryset, page_size):
+        page = KeysetPaginator(queryset, page_size).get_page(self.request.GET.get('cursor'))
+        return None, page, page.object_list, page.has_next() or page.has_previous()
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['recent_posts'] = Post.objects.filter(is_published=True).order_by('-created_at')[:5]
+        context['recent_posts'] = Post.objects.published().cards().order_by('-created_at')[:5]
         context['categories'] = Category.objects.all()
         context['newsletter_form'] = NewsletterForm()
         return context
 
+@method_decorator(detail_condition(Post.objects.all(), tags=POST_PAGE_TAGS), name='dispatch')
+@method_decorator(cache_page_tagged(*POST_PAGE_TAGS), name='dispatch')
 class PostDetailView(DetailView):
     model = Post
     template_name = 'blog/post_detail.html'
@@ -51,7 +80,7 @@ class PostDetailView(DetailView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['recent_posts'] = Post.objects.filter(is_published=True).exclude(
+        context['recent_posts'] = Post.objects.published().cards().exclude(
             id=self.object.id
         ).order_by('-created_at')[:5]
         context['categories'] = Category.objects.all()
@@ -59,54 +88,58 @@ class PostDetailView(DetailView):
         
         return context
 
+@cache_page_tagged(*POST_PAGE_TAGS)
 def category_posts(request, slug):
     category = get_object_or_404(Category, slug=slug)
-    posts = Post.objects.filter(categories=category, is_published=True).order_by('-created_at')
-    paginator = Paginator(posts, 9)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.published().cards().with_card_relations().filter(categories=category)
+    page_obj = KeysetPaginator(posts, POSTS_PER_PAGE).get_page(request.GET.get('cursor'))
     
     return render(request, 'blog/post_list.html', {
         'posts': page_obj,
+        'page_obj': page_obj,
         'category': category,
-        'recent_posts': Post.objects.filter(is_published=True).order_by('-created_at')[:5],
+        'recent_posts': Post.objects.published().cards().order_by('-created_at')[:5],
         'categories': Category.objects.all(),
         'newsletter_form': NewsletterForm()
     })
 
+@require_GET
+def post_list_json(request):
+    """Next page of post cards for infinite scroll (`?cursor=`, `?category=`)."""
+    posts = Post.objects.published().cards().with_card_relations()
+    category_slug = request.GET.get('category')
+    if category_slug:
+        posts = posts.filter(categories__slug=category_slug)
+
+    page = KeysetPaginator(posts, POSTS_PER_PAGE).get_page(request.GET.get('cursor'))
+
+    next_url = None
+    if page.has_next():
+        params = {'cursor': page.next_cursor}
+        if category_slug:
+            params['category'] = category_slug
+        next_url = f"{reverse('post_list_json')}?{urlencode(params)}"
+
+    return JsonResponse({
+        'html': render_to_string('blog/includes/post_cards.html', {'posts': page}, request=request),
+        'next': next_url,
+    })
+
 # newsletter
 
 def subscribe_newsletter(request):
     if request.method == 'POST' and request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        email = request.POST.get('email')
-        
-        # Basic validation
-        if not email or '@' not in email:
+        form = NewsletterSignupForm(request.POST)
+        if not form.is_valid():
             return JsonResponse({
                 'success': False,
                 'errors': {'email': ['Please enter a valid email address']}
             }, status=400)
-            
-        try:
-            # Create or get existing subscription
-            subscriber, created = NewsletterSubscriber.objects.get_or_create(
-                email=email,
-                defaults={'email': email}
-            )
-            
-            if not created:
-                return JsonResponse({
-                    'success': False,
-                    'errors': {'email': ['This email is already subscribed']}
-                }, status=400)
-                
-            return JsonResponse({'success': True})
-            
-        except Exception as e:
-            return JsonResponse({
-                'success': False,
-                'errors': {'general': ['An error occurred. Please try again later.']}
-            }, status=500)
+
+        # Queued, not inserted: a repeat signup is dropped when the outbox is
+        # drained, so it gets the same answer as a new one.
+        enqueue(NewsletterSubscriber, email=form.cleaned_data['email'])
+        return JsonResponse({'success': True})
     
     return JsonResponse({
         'success': False,
@@ -119,21 +152,12 @@ from .models import PartnershipRequest
 
 def submit_contact(request):
     if request.method == 'POST' and request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        try:
-            # Create new partnership request
-            PartnershipRequest.objects.create(
-                name=request.POST.get('name'),
-                email=request.POST.get('email'),
-                position=request.POST.get('position', ''),
-                phone=request.POST.get('phone'),
-                business_name=request.POST.get('business_name'),
-                business_type=request.POST.get('business_type'),
-                business_location=request.POST.get('business_location', ''),
-                interest=request.POST.get('interest'),
-                message=request.POST.get('message', '')
-            )
-            return JsonResponse({'success': True, 'message': 'Thank you for your submission!'})
-        except Exception as e:
-            return JsonResponse({'success': False, 'message': str(e)}, status=400)
+        form = PartnershipRequestForm(request.POST)
+        if not form.is_valid():
+            field, errors = next(iter(form.errors.items()))
+            return JsonResponse({'success': False, 'message': f'{field}: {errors[0]}'}, status=400)
+
+        enqueue(PartnershipRequest, **form.cleaned_data)
+        return JsonResponse({'success': True, 'message': 'Thank you for your submission!'})
     
-    return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
\ No newline at end of file
+    return JsonResponse({'success': False, 'message': 'Invalid request'}, status=400)
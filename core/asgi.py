@@ -3,6 +3,17 @@ ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Served by uvicorn, either directly or as gunicorn workers (the `asgi`
+process type in the Procfile):
+
+    uvicorn core.asgi:application --workers 4 --lifespan off
+    gunicorn core.asgi:application --worker-class uvicorn_worker.UvicornWorker
+
+The read pages then run as async views (ASYNC_VIEWS, on by default here),
+so a slow client holds a socket, not a worker. Every worker process drains
+the lead form outbox (rearm.outbox) too. bench_servers compares this stack
+with core.wsgi under gunicorn.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +23,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
+
+# Sends 103 Early Hints where the server supports them (rearm.preload)
+from rearm.outbox import DrainerASGI  # noqa: E402  needs the app registry
+from rearm.preload import EarlyHints  # noqa: E402
+
+application = DrainerASGI(EarlyHints(application))
@@ -1,39 +1,20 @@
 import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .database import POSTGRESQL_ENGINE
 from .settings import *
-from .settings import BASE_DIR
+from .settings import DATABASES, STORAGES
 
 ALLOWED_HOSTS = [os.environ['WEBSITE_HOSTNAME']]
 CSRF_TRUSTED_ORIGINS =['https://'+  os.environ['WEBSITE_HOSTNAME']]
 DEBUG = False
 
+# MIDDLEWARE, STATIC_ROOT and the rest come from core.settings. Static
+# files are always the built bundles here, whatever DEBUG was there.
+STORAGES = {**STORAGES, 'staticfiles': {'BACKEND': 'rearm.bundles.BundledStaticFilesStorage'}}
 
-MIDDLEWARE = [
-    'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
-]
-
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
-
-STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-
-
-connection_string = os.environ['AZURE_POSTGRESQL_CONNECTIONSTRING']
-parameters = {pair.split('='):pair.split('=')[1] for pair in connection_string.split('')}
-
-
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': parameters['dbname'],
-        'USER': parameters['user'],
-        'PASSWORD': parameters['password'],
-        'HOST': parameters['host'],
-    }
-
-}
\ No newline at end of file
+# core.settings built DATABASES from AZURE_POSTGRESQL_CONNECTIONSTRING
+# (or DATABASE_URL), pooled (core/database.py); never fall back to SQLite
+if DATABASES['default']['ENGINE'] != POSTGRESQL_ENGINE:
+    raise ImproperlyConfigured('Set AZURE_POSTGRESQL_CONNECTIONSTRING (or DATABASE_URL) to a PostgreSQL database')
@@ -0,0 +1,110 @@
+"""
+Gunicorn production settings for core.wsgi and core.asgi.
+
+    gunicorn core.wsgi:application --config python:core.gunicorn_config
+    gunicorn core.asgi:application --config python:core.gunicorn_config \
+        --worker-class uvicorn_worker.UvicornWorker
+
+Workers and threads follow the cores this process may run on; the app is
+imported once in the master (preload_app) and the workers fork from it,
+sharing its memory copy-on-write. The master compiles the project's
+templates before forking; each worker then warms itself up (rearm.warmup)
+before it accepts a connection, so /readyz only answers 200 from a warm
+worker, and then drains the lead form outbox (rearm.outbox) in a
+background thread until it exits. Workers are recycled after
+max_requests, jittered so they do not all restart at once; the master
+folds an exited worker's metrics file into the aggregate (rearm.metrics).
+
+Every value can be overridden from the environment (WEB_CONCURRENCY,
+GUNICORN_THREADS, GUNICORN_MAX_REQUESTS, ...) or on the command line.
+"""
+
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+
+def _cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not on Linux
+        return os.cpu_count() or 1
+
+
+cores = _cores()
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '8000')}")
+
+# Processes for CPU (templates, ORM), threads to overlap database and cache
+# round trips; threads > 1 makes gunicorn use its gthread worker. Each
+# thread holds its own database connection: workers * threads in total.
+workers = int(os.getenv('WEB_CONCURRENCY', cores * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 2))
+
+preload_app = True
+
+# Recycle workers (slow leaks, fragmented heaps), not all at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Worker heartbeats on tmpfs, not a disk that may block
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    # The app is loaded (preload_app): runs once, in the master
+    import django
+    django.setup()
+
+    from core.database import pool_options
+    from rearm import metrics, warmup
+    metrics.clear()
+    server.log.info('Compiled %d templates before forking', warmup.compile_templates())
+
+    pool = pool_options()
+    if pool is not None:
+        # Each worker has its own pool, shared by its threads
+        max_size = pool.get('max_size', pool.get('min_size', 4))
+        server.log.info('Database pool: %d workers x %d connections = %d at most',
+                        server.cfg.workers, max_size, server.cfg.workers * max_size)
+        if server.cfg.threads > max_size:
+            server.log.warning('%d threads per worker share %d pooled connections; '
+                               'raise DATABASE_POOL_MAX_SIZE', server.cfg.threads, max_size)
+
+
+def pre_fork(server, worker):
+    # A connection (or a pool and its threads) from the master must not reach the workers
+    from core.database import pool_options
+    from django.db import connections
+    connections.close_all()
+    for connection in connections.all():
+        if pool_options(connection.alias) is not None:
+            connection.close_pool()
+
+
+def post_worker_init(worker):
+    from rearm import outbox, warmup
+    worker.log.info('Worker %s warmed up: %s', worker.pid, warmup.warm(notify=worker.notify))
+    # Lead forms queue on this host's disk (rearm.outbox): drain from here
+    outbox.start_drainer()
+
+
+def worker_exit(server, worker):
+    from rearm import outbox
+    inserted = outbox.stop_drainer()
+    if inserted:
+        worker.log.info('Worker %s drained the lead outbox on exit: %s', worker.pid, inserted)
+
+
+def child_exit(server, worker):
+    # In the master: keep the exited worker's counts, drop its file
+    from rearm import metrics
+    metrics.mark_process_dead(worker.pid)
@@ -1,7 +1,8 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-import dj_database_url
+
+from .database import database_config
 
 # Base Directory
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -41,14 +42,19 @@ INSTALLED_APPS = [
 
 # Middleware
 MIDDLEWARE = [
+    'rearm.warmup.HealthCheckMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'rearm.staticserve.AsyncWhiteNoiseMiddleware',
+    'rearm.metrics.MetricsMiddleware',
+    'rearm.servertiming.ServerTimingMiddleware',
+    'rearm.preload.PreloadMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'rearm.querybudget.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -71,15 +77,108 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
-# Database config using DATABASE_URL or fallback to SQLite
-DATABASE_URL = os.getenv('DATABASE_URL')
-
+# Database: DATABASE_URL, AZURE_POSTGRESQL_CONNECTIONSTRING or SQLite.
+# PostgreSQL goes through psycopg's connection pool; sizes, timeouts and
+# the statement timeout come from DATABASE_* variables (core/database.py).
 DATABASES = {
-    "default": dj_database_url.config(
-        default=DATABASE_URL,
-        conn_max_age=600,
-        ssl_require=True
-    )
+    'default': database_config(base_dir=BASE_DIR),
+}
+
+# Cache shared by every gunicorn worker (site chrome snapshot etc.).
+# Set REDIS_URL to use Redis (needs the `redis` package), otherwise a
+# file-based cache on local disk is used.
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR', os.path.join(BASE_DIR, '.django_cache')),
+        }
+    }
+
+# Full-page cache for anonymous visitors (rearm.pagecache), invalidated by
+# model save/delete signals; the timeout only bounds untracked changes.
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', str(not DEBUG)).lower() in ['true', '1', 'yes']
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Lead forms (demo bookings, partnership requests, newsletter signups) are
+# queued in a local SQLite outbox (rearm.outbox). Every process serving
+# core.wsgi or core.asgi (gunicorn, uvicorn, runserver) drains it every
+# LEAD_OUTBOX_DRAIN_INTERVAL seconds; 0 turns that off, and then
+# `manage.py drain_lead_outbox --wait 1` must run on the same host.
+LEAD_OUTBOX_PATH = os.getenv('LEAD_OUTBOX_PATH', os.path.join(BASE_DIR, 'var', 'lead_outbox.sqlite3'))
+LEAD_OUTBOX_BATCH_SIZE = 500
+LEAD_OUTBOX_DRAIN_INTERVAL = float(os.getenv('LEAD_OUTBOX_DRAIN_INTERVAL', '1.0'))
+
+# Admin changelists over this many rows show estimated totals on
+# PostgreSQL instead of running COUNT(*) (rearm.changelist).
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100_000
+
+# Query budgets (rearm.querybudget). Counts are for a warm site chrome
+# cache; views not listed get QUERY_BUDGET_DEFAULT. A statement shape run
+# more than QUERY_BUDGET_REPEAT_THRESHOLD times in one request is an N+1.
+QUERY_BUDGET_ENABLED = os.getenv('QUERY_BUDGET_ENABLED', str(DEBUG)).lower() in ['true', '1', 'yes']
+QUERY_BUDGET_RAISE = os.getenv('QUERY_BUDGET_RAISE', 'False').lower() in ['true', '1', 'yes']
+QUERY_BUDGET_DEFAULT = 20
+QUERY_BUDGET_REPEAT_THRESHOLD = 5
+QUERY_BUDGETS = {
+    # rearm.urls
+    'home': 6,
+    'services': 3,
+    'service_detail': 3,
+    'book_demo': 2,
+    'about': 4,
+    'product_list': 4,
+    'product_detail': 5,
+    'search': 5,
+    'search_json': 5,
+    # blog.urls
+    'post_list': 4,
+    'post_list_all': 4,
+    'post_list_json': 4,
+    'post_detail': 6,
+    'category_posts': 5,
+}
+
+# Server-Timing header and timing log line (rearm.servertiming) for a
+# random SERVER_TIMING_SAMPLE_RATE share of requests.
+SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'True').lower() in ['true', '1', 'yes']
+SERVER_TIMING_SAMPLE_RATE = float(os.getenv('SERVER_TIMING_SAMPLE_RATE', '1.0' if DEBUG else '0.05'))
+
+# Prometheus /metrics (rearm.metrics). Every process writes its own file
+# in METRICS_DIR; use a directory local to the host, emptied on start.
+# With METRICS_TOKEN set, scrapes must send "Authorization: Bearer <token>".
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False').lower() in ['true', '1', 'yes']
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(BASE_DIR, 'var', 'metrics'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Link: rel=preload headers for each page's bundles, fonts and above-the-fold
+# images, plus 103 Early Hints under an ASGI server that supports them
+# (rearm.preload).
+PRELOAD_ENABLED = os.getenv('PRELOAD_ENABLED', 'True').lower() in ['true', '1', 'yes']
+
+# Async read views (rearm.async_views, blog.async_views) instead of the sync
+# ones. core/asgi.py turns this on; under WSGI it only adds thread hops.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False').lower() in ['true', '1', 'yes']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'rearm.servertiming': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'rearm.warmup': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
 }
 
 # Password Validators
@@ -102,16 +201,69 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
-if not DEBUG:
-    DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
-else:
-    MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-    MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_URL = '/media/'
+
+# upload_media limits (rearm.uploads); after the response, bigger images are
+# downscaled to UPLOAD_MAX_DIMENSION and a WebP copy is stored.
+UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+UPLOAD_MAX_PIXELS = 40_000_000
+UPLOAD_MAX_DIMENSION = 2560
+UPLOAD_WEBP_QUALITY = 80
 
+# srcset widths for the {% responsive_image %} tag (rearm.images)
+RESPONSIVE_IMAGE_WIDTHS = [320, 480, 640, 960, 1280, 1920]
 
-# Whitenoise for static files in production
-if not DEBUG:
-    STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+# Django 5.1+ only reads STORAGES (STATICFILES_STORAGE/DEFAULT_FILE_STORAGE
+# are ignored). Media stays on the filesystem; image fields upload to
+# Cloudinary themselves. In production static files go through WhiteNoise's
+# manifest storage, with the bundles below built first (rearm.bundles).
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'rearm.bundles.BundledStaticFilesStorage',
+    },
+}
+
+# {% bundle "<name>" %} -> one hashed, minified file per bundle, built at
+# collectstatic; sources are listed in cascade order. With bundles off
+# (DEBUG) the tag links the sources instead.
+STATIC_BUNDLES_ENABLED = not DEBUG
+STATIC_BUNDLES = {
+    # On every page: navbar, hero, footer, contact modal, demo banner
+    'core.css': [
+        'css/base.css', 'css/animation.css', 'css/contact-form.css', 'css/navbar.css',
+        'css/hero.css', 'css/book_demo_banner.css', 'css/footer.css', 'css/modal-contact.css',
+    ],
+    'home.css': [
+        'css/services.css', 'css/service_cards.css', 'css/about.css', 'css/features.css',
+        'css/products.css', 'css/ceo.css', 'css/blog.css',
+    ],
+    'services.css': ['css/services.css', 'css/service_cards.css'],
+    'about.css': ['css/about.css', 'css/ceo.css'],
+    'products.css': ['css/products.css', 'css/product_detail.css'],
+    'blog.css': ['blog/css/main.css', 'css/post_detail.css', 'css/blog.css'],
+    'core.js': ['js/navbar.js', 'blog/js/newsletter.js'],
+    'product.js': ['js/product_detail.js'],
+}
+
+# Static image/font variants (collectstatic writes .avif/.webp/.woff2 copies;
+# see rearm.staticvariants). Font subsets keep the characters found in the
+# templates plus these ranges, for text that comes from the database.
+STATIC_VARIANT_DIRS = ['img', 'font']
+STATIC_IMAGE_FORMATS = ['avif', 'webp']
+STATIC_FONT_UNICODES = 'U+0020-007E,U+00A0-00FF,U+0152-0153,U+2013-2014,U+2018-201E,U+2022,U+2026,U+20AC,U+2122,U+2197'
+
+# Critical CSS (manage.py build_critical_css writes static/critical/<page>.css)
+# page: (URL name, bundles loaded after first paint)
+CRITICAL_CSS_PAGES = {
+    'home': ('home', ['core.css', 'home.css']),
+    'about': ('about', ['core.css', 'about.css']),
+    'product_list': ('product_list', ['core.css', 'products.css']),
+    'post_detail': ('post_detail', ['core.css', 'blog.css']),
+}
 
 # CKEditor
 CKEDITOR_UPLOAD_PATH = "uploads/"
@@ -19,6 +19,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rearm import views
+from rearm.metrics import metrics_view
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -28,6 +29,7 @@ urlpatterns = [
     path('', include('rearm.urls')),  # All frontend URLs now come from rearm/urls.py
     path('blog/', include('blog.urls')),  # Add this line
     path('ckeditor5/', include('django_ckeditor_5.urls')), 
+    path('metrics', metrics_view, name='metrics'),  # 404 unless METRICS_ENABLED
 ]
 # Add static and media URLs if DEBUG is True
 if settings.DEBUG:
@@ -3,6 +3,9 @@ WSGI config for core project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
 
+Each process serving it drains the lead form outbox (rearm.outbox), under
+gunicorn and runserver alike.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
@@ -13,3 +16,7 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 application = get_wsgi_application()
+
+from rearm.outbox import DrainerWSGI  # noqa: E402  needs the app registry
+
+application = DrainerWSGI(application)
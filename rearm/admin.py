@@ -2,12 +2,16 @@
 
 # Register your models here.
 from django.db import models
+from django.db.models import Count
 from django.contrib import admin
 from .models import Navbar
 from django.utils.safestring import mark_safe
 from .models import HeroSection # hero section imported
 from django_ckeditor_5.fields import CKEditor5Field
 from .models import Service
+from .changelist import FastChangeListMixin
+from .export import ExportAdminMixin
+from .search import SearchAdminMixin
 from django.urls import reverse
 from django.utils.html import format_html
 from django.core.exceptions import ValidationError
@@ -78,11 +82,12 @@ class HeroAdmin(admin.ModelAdmin):
 
 # services
 @admin.register(Service)
-class ServiceAdmin(admin.ModelAdmin):
+class ServiceAdmin(SearchAdminMixin, admin.ModelAdmin):
     formfield_overrides = {
         models.TextField: {'widget': CKEditor5Field()},
     }
     list_display = ('title', 'is_featured')
+    search_fields = ('title',)  # searched through the full-text index
     prepopulated_fields = {'slug': ('title',)}
 
 
@@ -92,10 +97,11 @@ from django.contrib import admin
 from .models import DemoBooking
 
 @admin.register(DemoBooking)
-class DemoBookingAdmin(admin.ModelAdmin):
+class DemoBookingAdmin(FastChangeListMixin, ExportAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'email', 'submitted_at')
     search_fields = ('name', 'email')
     list_filter = ('submitted_at',)
+    ordering = ('-submitted_at',)
 
 
 
@@ -154,20 +160,23 @@ class CompanyInfoAdmin(admin.ModelAdmin):
 from django.contrib import admin
 from .models import Product, ProductCategory
 
-class ProductCategoryAdmin(admin.ModelAdmin):
+class ProductCategoryAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = ('name', 'slug', 'product_count')
     search_fields = ('name',)
     prepopulated_fields = {'slug': ('name',)}
+    count_annotations = {'num_products': Count('product')}
     
     def product_count(self, obj):
-        return obj.product_set.count()
+        return obj.num_products
     product_count.short_description = 'Products'
+    product_count.admin_order_field = 'num_products'
 
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(FastChangeListMixin, SearchAdminMixin, admin.ModelAdmin):
     # add 'price' to list_display should you need price in future
     list_display = ('name', 'category', 'product_type',  'is_featured', 'is_active')
+    list_select_related = ('category',)
     list_filter = ('category', 'product_type', 'is_featured', 'is_active')
-    search_fields = ('name', 'description')
+    search_fields = ('name', 'description')  # searched through the full-text index
     # add 'price',  to list_editable should you need price in admin
     list_editable = ('is_featured', 'is_active')
     prepopulated_fields = {'slug': ('name',)}
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class RearmConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rearm'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from . import signals
+
+        post_migrate.connect(signals.reinstall_sqlite_search, sender=self)
@@ -0,0 +1,134 @@
+# rearm/async_views.py
+"""
+Async versions of the read-only views in rearm.views, for ASGI serving.
+
+Each view runs every query through the async ORM (afirst, aget, async
+iteration) and only then renders, so nothing touches the database from
+the event loop while the template renders. The site chrome is fetched the
+same way (aglobal_context) before rendering. Responses are identical to
+the sync views; urls.py picks these when ASYNC_VIEWS is on.
+"""
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404, render
+from django.views.decorators.http import require_GET
+
+from blog.models import Post
+
+from .conditional import detail_condition
+from .context_processors import aglobal_context
+from .models import AboutSection, Leadership, Product, Service, TeamMember
+from .pagecache import add_page_tags, cache_page_tagged
+from .views import PRODUCT_DETAIL_TAGS, _search_payload, _search_querysets
+
+
+async def alist(queryset):
+    return [row async for row in queryset]
+
+
+async def arender(request, template_name, context):
+    """render() once the site chrome is loaded; `context` must hold no unevaluated querysets."""
+    await aglobal_context(request)
+    return render(request, template_name, context)
+
+
+@cache_page_tagged('leadership:*', 'aboutsection:*', 'service:*', 'product:*', 'post:*', 'category:*')
+async def home(request):
+    context = {
+        'ceo': await Leadership.objects.filter(is_ceo=True).afirst(),
+        'blog_posts': await alist(
+            Post.objects.published().cards().with_card_relations().order_by('-created_at')[:4]
+        ),
+        'about_content': await AboutSection.objects.filter(is_active=True).afirst(),
+        'page_name': 'home',
+        'featured_services': await alist(Service.objects.filter(is_featured=True)[:3]),
+        'featured_products': await alist(Product.objects.filter(is_featured=True)[:3]),
+    }
+    return await arender(request, "rearm/home.html", context)
+
+
+@cache_page_tagged('service:*')
+async def services(request):
+    services = await alist(Service.objects.filter(is_featured=True))
+    return await arender(request, 'rearm/services.html', {'services': services})
+
+
+async def service_detail(request, slug):
+    service = await aget_object_or_404(Service, slug=slug)
+    return await arender(request, 'rearm/service_detail.html', {'service': service})
+
+
+@require_GET
+@cache_page_tagged('aboutsection:*', 'leadership:*', 'teammember:*')
+async def about(request):
+    try:
+        about_content = await AboutSection.objects.filter(is_active=True).alatest('id')
+        leadership = await alist(Leadership.objects.all().order_by('display_order'))
+    except AboutSection.DoesNotExist:
+        about_content = None
+        leadership = []
+
+    team_members = await alist(TeamMember.objects.filter(
+        is_active=True,
+        show_on_about=True
+    ).order_by('order'))
+
+    context = {
+        'leadership': leadership,
+        'about_content': about_content,
+        'team_members': team_members,
+        'page_name': 'about',
+        'meta_title': getattr(about_content, 'meta_title', 'About Us | Your Company'),
+        'meta_description': getattr(about_content, 'meta_description', 'Learn about our company and team'),
+        'canonical_url': request.build_absolute_uri(request.path)
+    }
+    return await arender(request, 'rearm/about.html', context)
+
+
+@cache_page_tagged('product:*')
+async def product_list(request):
+    products = Product.objects.filter(is_active=True).select_related('category')
+    context = {
+        'agricultural_products': await alist(products.filter(product_type='type1')),
+        'equipment_products': await alist(products.filter(product_type='type2')),
+    }
+    return await arender(request, 'rearm/products/list.html', context)
+
+
+@detail_condition(Product.objects.filter(is_active=True), tags=PRODUCT_DETAIL_TAGS)
+@cache_page_tagged()
+async def product_detail(request, slug):
+    product = await aget_object_or_404(Product, slug=slug, is_active=True)
+    related_products = await alist(Product.objects.filter(
+        category=product.category_id,
+        is_active=True
+    ).exclude(id=product.id)[:4])
+
+    add_page_tags(request, f'product:{product.id}', f'productcategory:{product.category_id}',
+                  *(f'product:{related.id}' for related in related_products))
+
+    context = {
+        'product': product,
+        'related_products': related_products,
+    }
+    return await arender(request, 'rearm/products/detail.html', context)
+
+
+async def _search_results(query):
+    return {kind: await alist(results) for kind, results in _search_querysets(query).items()}
+
+
+@require_GET
+async def search(request):
+    query = request.GET.get('q', '').strip()
+    context = {
+        'query': query,
+        'results': await _search_results(query),
+        'page_name': 'search',
+    }
+    return await arender(request, 'rearm/search.html', context)
+
+
+@require_GET
+async def search_json(request):
+    query = request.GET.get('q', '').strip()
+    return JsonResponse(_search_payload(query, await _search_results(query)))
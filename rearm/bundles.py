@@ -0,0 +1,130 @@
+# rearm/bundles.py
+"""
+CSS/JS bundles, built during collectstatic.
+
+STATIC_BUNDLES maps a bundle name ("core.css", "products.css", ...) to the
+static files it is made of, in cascade order. BundledStaticFilesStorage
+concatenates and minifies each bundle into bundles/<name> before WhiteNoise
+post-processes the collected files, so bundles get a content hash in the
+manifest and .gz/.br copies like every other file.
+
+Templates link bundles with {% bundle "core.css" %} (rearm.templatetags.
+bundles). Unless STATIC_BUNDLES_ENABLED (off in DEBUG), the tag links the
+source files one by one instead, so runserver needs no build step.
+
+Minification is deliberately conservative: CSS loses comments and
+insignificant whitespace, JS loses indentation, blank lines and whole-line
+// comments. Relative url()s in CSS are rebased onto the bundle's path.
+"""
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+from .staticvariants import build_variants
+
+BUNDLE_DIR = 'bundles'
+
+_CSS_STRING = r'"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\''
+_CSS_COMMENT_RE = re.compile(rf'({_CSS_STRING})|/\*.*?\*/', re.S)
+_CSS_STRING_RE = re.compile(rf'({_CSS_STRING})')
+_CSS_PUNCTUATION_RE = re.compile(r'\s*([{};,>])\s*')
+_CSS_URL_RE = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def bundle_path(name):
+    return f'{BUNDLE_DIR}/{name}'
+
+
+def bundles_enabled():
+    return getattr(settings, 'STATIC_BUNDLES_ENABLED', not settings.DEBUG)
+
+
+def get_bundle(name):
+    try:
+        return settings.STATIC_BUNDLES[name]
+    except KeyError:
+        raise KeyError(f'Unknown static bundle {name!r}; add it to STATIC_BUNDLES') from None
+
+
+# --- building ---------------------------------------------------------------
+
+def minify_css(css):
+    css = _CSS_COMMENT_RE.sub(lambda match: match.group(1) or '', css)
+    parts = _CSS_STRING_RE.split(css)
+    for index in range(0, len(parts), 2):  # odd indexes are string literals
+        code = ' '.join(parts[index].split())
+        code = _CSS_PUNCTUATION_RE.sub(r'\1', code)
+        parts[index] = code.replace(': ', ':').replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+def minify_js(js):
+    lines = (line.strip() for line in js.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def rebase_css_urls(css, source, target):
+    """Rewrite relative url()s in `css` (from static path `source`) for `target`."""
+    source_dir, target_dir = posixpath.dirname(source), posixpath.dirname(target)
+
+    def rebase(match):
+        quote, url = match.groups()
+        if url.startswith(('/', '#', 'data:')) or '://' in url:
+            return match.group(0)
+        absolute = posixpath.normpath(posixpath.join(source_dir, url))
+        return f'url({quote}{posixpath.relpath(absolute, target_dir or ".")}{quote})'
+
+    return _CSS_URL_RE.sub(rebase, css)
+
+
+def build_bundle(name, read):
+    """Bundle `name`'s content; `read(path)` returns a source file's text."""
+    target = bundle_path(name)
+    if name.endswith('.css'):
+        return '\n'.join(minify_css(rebase_css_urls(read(path), path, target))
+                         for path in get_bundle(name))
+    # A source without a trailing semicolon must not run into the next one
+    return '\n;\n'.join(minify_js(read(path)) for path in get_bundle(name))
+
+
+class BundledStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """WhiteNoise's manifest storage, with STATIC_BUNDLES and image/font variants built first."""
+
+    def _read(self, path):
+        with self.open(path) as f:
+            return f.read().decode('utf-8')
+
+    def build_bundles(self, paths):
+        for name in getattr(settings, 'STATIC_BUNDLES', {}):
+            path = bundle_path(name)
+            content = build_bundle(name, self._read)
+            if self.exists(path):
+                self.delete(path)
+            self.save(path, ContentFile(content.encode('utf-8')))
+            paths[path] = (self, path)
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            self.build_bundles(paths)
+            build_variants(self, paths)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+
+# --- rendering --------------------------------------------------------------
+
+def bundle_paths(name):
+    """Static paths to link for bundle `name`: the bundle, or its sources when disabled."""
+    return [bundle_path(name)] if bundles_enabled() else get_bundle(name)
+
+
+def bundle_tags(name):
+    """<link>/<script> tags for bundle `name` (or its sources, when disabled)."""
+    urls = ((static(path),) for path in bundle_paths(name))
+    if name.endswith('.css'):
+        return format_html_join('', '<link rel="stylesheet" href="{}">', urls)
+    return format_html_join('', '<script src="{}" defer></script>', urls)
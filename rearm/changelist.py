@@ -0,0 +1,69 @@
+# rearm/changelist.py
+"""
+Admin changelists for big tables.
+
+FastChangeListMixin:
+  - annotates `count_annotations` onto the changelist query, so a column
+    like "Products" is one GROUP BY instead of a COUNT per row;
+  - paginates with EstimatedCountPaginator: on PostgreSQL, once the table
+    holds more than ADMIN_ESTIMATED_COUNT_THRESHOLD rows, the total comes
+    from pg_class.reltuples (unfiltered) or the planner's row estimate
+    (filtered/searched) instead of an exact COUNT(*);
+  - skips the second "N total" COUNT(*) Django runs for filtered lists.
+"""
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def table_estimate(model, using='default'):
+    """Planner's row estimate for `model`'s table, or None off PostgreSQL."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                       [model._meta.db_table])
+        row = cursor.fetchone()
+    # reltuples is -1 for a table never vacuumed/analyzed
+    return row[0] if row and row[0] >= 0 else None
+
+
+def query_estimate(queryset):
+    """Planner's row estimate for `queryset` (PostgreSQL only)."""
+    connection = connections[queryset.db]
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        threshold = getattr(settings, 'ADMIN_ESTIMATED_COUNT_THRESHOLD', 100_000)
+        estimate = table_estimate(queryset.model, queryset.db)
+        if estimate is None or estimate < threshold:
+            return queryset.count()
+        if not queryset.query.where:
+            return estimate
+        return query_estimate(queryset)
+
+
+class FastChangeListMixin:
+    count_annotations = {}
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if self.count_annotations:
+            queryset = queryset.annotate(**self.count_annotations)
+        return queryset
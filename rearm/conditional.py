@@ -0,0 +1,70 @@
+# rearm/conditional.py
+"""
+Conditional GET (ETag / Last-Modified) for detail pages.
+
+The validators come from the object's ``updated_at``, the site chrome
+version and the page cache versions (rearm.pagecache) of the tags for
+everything else the page shows, e.g. related products or the recent posts
+sidebar; all are read before the view runs. A browser or crawler
+revalidating an unchanged page gets a 304 for one indexed lookup, with no
+rendering. For an async view that lookup is awaited before condition()
+runs.
+"""
+from datetime import datetime, timezone
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.views.decorators.http import condition
+
+from .pagecache import tag_versions
+from .site_chrome import get_changed_at, get_version
+
+
+def detail_condition(queryset, lookup='slug', tags=()):
+    """
+    `condition()` for a view taking `lookup` as a URL kwarg and showing the
+    matching row of `queryset`, plus the rows behind the page cache `tags`.
+    """
+    def row(kwargs):
+        return queryset.filter(**{lookup: kwargs.get(lookup)}).values_list('updated_at', flat=True)
+
+    def updated_at(request, **kwargs):
+        # etag and last_modified are both asked for; look the row up once
+        if not hasattr(request, '_detail_updated_at'):
+            request._detail_updated_at = row(kwargs).first()
+        return request._detail_updated_at
+
+    def versions(request):
+        if not hasattr(request, '_detail_tag_versions'):
+            request._detail_tag_versions = tag_versions(tags) if tags else {}
+        return request._detail_tag_versions
+
+    def etag(request, *args, **kwargs):
+        modified = updated_at(request, **kwargs)
+        if modified is None:
+            return None  # let the view 404
+        current = versions(request)
+        return '-'.join([f'{modified.timestamp():.6f}', str(get_version()),
+                         *(str(current.get(tag)) for tag in sorted(tags))])
+
+    def last_modified(request, *args, **kwargs):
+        modified = updated_at(request, **kwargs)
+        if modified is None:
+            return None
+        # Tag versions are nanosecond timestamps of their last change
+        changed = [datetime.fromtimestamp(version / 1e9, tz=timezone.utc)
+                   for version in versions(request).values()]
+        return max(modified, get_changed_at(), *changed)
+
+    def decorator(view_func):
+        conditional = condition(etag_func=etag, last_modified_func=last_modified)(view_func)
+        if not iscoroutinefunction(view_func):
+            return conditional
+
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            request._detail_updated_at = await row(kwargs).afirst()
+            return await conditional(request, *args, **kwargs)
+        return wrapper
+
+    return decorator
@@ -1,21 +1,23 @@
 # rearm/context_processors.py
 from datetime import datetime
-from .models import CompanyInfo, Navbar, HeroSection
+from .site_chrome import aget_snapshot, get_snapshot
 
 def global_context(request):
     """Provides ALL global data to templates"""
-    context = {}
-    
-    # Navbar data
-    context['navbar'] = Navbar.objects.first()
-    
-    # Hero sections
-    context['hero_sections'] = {
-        hero.page: hero for hero in HeroSection.objects.all()
-    } if HeroSection.objects.exists() else {}
-    
-    # Footer data
-    context['company'] = CompanyInfo.objects.first()
-    context['current_year'] = datetime.now().year
-    
-    return context
\ No newline at end of file
+    # Async views fetch the snapshot before rendering (aglobal_context):
+    # templates render on the event loop, where the ORM can't be used
+    snapshot = getattr(request, 'site_chrome', None) or get_snapshot()
+
+    return {
+        'navbar': snapshot.navbar,
+        'hero_sections': snapshot.hero_sections,
+        'company': snapshot.company,
+        'social_links': snapshot.social_links,
+        'current_year': datetime.now().year,
+    }
+
+
+async def aglobal_context(request):
+    """global_context for async views; call it before rendering."""
+    request.site_chrome = await aget_snapshot()
+    return global_context(request)
@@ -0,0 +1,253 @@
+# rearm/critical.py
+"""
+Critical (above-the-fold) CSS per page type.
+
+build_critical_css renders each CRITICAL_CSS_PAGES page in-process, finds
+the elements in the fold (the navbar, the hero and the first block after
+it) with an HTML parser, and keeps the rules of the page's bundles whose
+selectors can match one of those elements. The result is written to
+static/critical/<page>.css and committed like any other stylesheet.
+
+{% critical_css "<page>" %} inlines that file in <head> and loads the full
+bundles without blocking rendering (rel=preload, swapped to stylesheet on
+load, with a <noscript> fallback). Without a critical file, or with
+bundles off (DEBUG), it links the bundles normally.
+
+Matching is static and errs towards keeping rules: pseudo-classes and
+attribute selectors are ignored, and only the rightmost compound selector
+must match a single fold element.
+"""
+import functools
+import posixpath
+import re
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from .bundles import _CSS_URL_RE, bundle_tags, bundles_enabled, minify_css
+
+CRITICAL_DIR = 'critical'
+
+# Elements that start the fold; the fold ends with the first block after the last one
+FOLD_ANCHORS = {'navbar', 'hero-section'}
+FOLD_MAX_ELEMENTS = 400
+
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param',
+    'source', 'track', 'wbr',
+}
+SKIPPED_ELEMENTS = {'script', 'style', 'noscript', 'template'}
+
+# Rules for these always apply to the fold
+ALWAYS_KEPT = {'*', 'html', 'body', ':root'}
+
+
+def critical_path(page):
+    return f'{CRITICAL_DIR}/{page}.css'
+
+
+# --- the fold ---------------------------------------------------------------
+
+class FoldParser(HTMLParser):
+    """Collects (tag, classes, id) for every element in a page's fold."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.elements = [('html', frozenset(), None), ('body', frozenset(), None)]
+        self.stack = []
+        self.in_body = False
+        self.done = False
+        self.resume_depth = None  # after an anchor: depth the next block starts at
+        self.block_depth = None   # depth of that block, once it has started
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'body':
+            self.in_body = True
+            return
+        if not self.in_body or self.done:
+            return
+        attrs = dict(attrs)
+        classes = frozenset((attrs.get('class') or '').split())
+        depth = len(self.stack)
+        if tag not in VOID_ELEMENTS:
+            self.stack.append((tag, bool(classes & FOLD_ANCHORS)))
+        if tag in SKIPPED_ELEMENTS or any(t in SKIPPED_ELEMENTS for t, _ in self.stack[:-1]):
+            return
+
+        if classes & FOLD_ANCHORS or tag == 'nav':
+            self.block_depth = None  # a hero inside the "first block": start over after it
+        elif self.resume_depth is not None and self.block_depth is None and depth <= self.resume_depth:
+            self.block_depth = depth
+        self.elements.append((tag, classes, attrs.get('id')))
+        if len(self.elements) >= FOLD_MAX_ELEMENTS:
+            self.done = True
+
+    def handle_endtag(self, tag):
+        if not self.in_body or self.done or tag in VOID_ELEMENTS:
+            return
+        if tag == 'body':
+            self.done = True
+            return
+        # Tolerate unclosed elements: close up to the matching tag, if any is open
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index][0] == tag:
+                break
+        else:
+            return
+        anchor = self.stack[index][1] or tag == 'nav'
+        del self.stack[index:]
+        depth = len(self.stack)
+        if anchor and self.block_depth is None:
+            self.resume_depth = depth
+        elif self.block_depth is not None and depth <= self.block_depth:
+            self.done = True
+
+
+def fold_elements(html):
+    parser = FoldParser()
+    parser.feed(html)
+    parser.close()
+    return parser.elements
+
+
+# --- CSS --------------------------------------------------------------------
+
+def parse_css(css):
+    """
+    Split minified CSS into top-level items: (prelude, body) for blocks
+    (body is the text between the braces) and (statement, None) for
+    @import/@charset statements.
+    """
+    items, start, depth, quote, index = [], 0, 0, None, 0
+    while index < len(css):
+        char = css[index]
+        if quote:
+            if char == '\\':
+                index += 1
+            elif char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '{':
+            if depth == 0:
+                prelude, body_start = css[start:index].strip(), index + 1
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                items.append((prelude, css[body_start:index]))
+                start = index + 1
+        elif char == ';' and depth == 0:
+            items.append((css[start:index + 1].strip(), None))
+            start = index + 1
+        index += 1
+    return items
+
+
+_PSEUDO_RE = re.compile(r'::?[\w-]+(\((?:[^()]|\([^()]*\))*\))?')
+_ATTRIBUTE_RE = re.compile(r'\[[^\]]*\]')
+_COMBINATOR_RE = re.compile(r'\s*[>+~]\s*|\s+')
+_COMPOUND_RE = re.compile(r'([.#]?)(-?[\w-]+|\*)')
+_ANIMATION_RE = re.compile(r'animation(?:-name)?:([^;}]*)')
+
+
+def _compound_matches(compound, elements):
+    tag, ids, classes = None, set(), set()
+    for kind, name in _COMPOUND_RE.findall(compound):
+        if kind == '.':
+            classes.add(name)
+        elif kind == '#':
+            ids.add(name)
+        elif name != '*':
+            tag = name.lower()
+    return any(
+        (tag is None or tag == element_tag)
+        and classes <= element_classes
+        and (not ids or element_id in ids)
+        for element_tag, element_classes, element_id in elements
+    )
+
+
+def selector_matches(selector, elements):
+    selector = selector.strip()
+    if selector in ALWAYS_KEPT:
+        return True
+    simplified = _ATTRIBUTE_RE.sub('', _PSEUDO_RE.sub('', selector)).strip()
+    if not simplified:
+        return True  # only pseudo/attribute parts, e.g. ":root" or "[hidden]"
+    compounds = [part for part in _COMBINATOR_RE.split(simplified) if part]
+    return all(_compound_matches(compound, elements) for compound in compounds)
+
+
+def _split_selectors(prelude):
+    return [part for part in re.split(r',(?![^(]*\))', prelude) if part.strip()]
+
+
+def _filter_rules(css, elements, keyframes):
+    kept = []
+    for prelude, body in parse_css(css):
+        if body is None:
+            kept.append(prelude)  # @import / @charset
+        elif prelude.startswith(('@media', '@supports')):
+            inner = _filter_rules(body, elements, keyframes)
+            if inner:
+                kept.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@font-face'):
+            kept.append(f'{prelude}{{{body}}}')
+        elif prelude.startswith('@'):
+            continue  # @keyframes are added back below if a kept rule uses them
+        elif any(selector_matches(selector, elements) for selector in _split_selectors(prelude)):
+            kept.append(f'{prelude}{{{body}}}')
+            for value in _ANIMATION_RE.findall(body):
+                keyframes.update(value.replace(',', ' ').split())
+    return ''.join(kept)
+
+
+def critical_css(css, elements):
+    """The rules of `css` that can apply to `elements` (see fold_elements)."""
+    css = minify_css(css)
+    keyframes = set()
+    kept = _filter_rules(css, elements, keyframes)
+    for prelude, body in parse_css(css):
+        if body is not None and re.match(r'@(-\w+-)?keyframes\s', prelude) and prelude.split()[-1] in keyframes:
+            kept += f'{prelude}{{{body}}}'
+    return kept
+
+
+# --- rendering --------------------------------------------------------------
+
+@functools.lru_cache(maxsize=None)
+def load_critical_css(page):
+    """Inline-ready critical CSS for `page`, or None if it was never built."""
+    path = finders.find(critical_path(page))
+    if path is None:
+        return None
+    with open(path, encoding='utf-8') as f:
+        css = f.read()
+
+    # Inline CSS resolves url()s against the page, so make them absolute
+    def absolute(match):
+        quote, url = match.groups()
+        if url.startswith(('/', '#', 'data:')) or '://' in url:
+            return match.group(0)
+        return f'url({quote}{static(posixpath.normpath(posixpath.join(CRITICAL_DIR, url)))}{quote})'
+
+    return _CSS_URL_RE.sub(absolute, css).replace('</', '<\\/')
+
+
+def critical_css_tags(page):
+    bundles = settings.CRITICAL_CSS_PAGES[page][1]
+    css = load_critical_css(page) if bundles_enabled() else None
+    if css is None:
+        return mark_safe(''.join(bundle_tags(name) for name in bundles))
+    links = format_html_join(
+        '',
+        '<link rel="preload" href="{0}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">'
+        '<noscript><link rel="stylesheet" href="{0}"></noscript>',
+        ((static(f'bundles/{name}'),) for name in bundles),
+    )
+    return format_html('<style>{}</style>{}', mark_safe(css), links)
@@ -0,0 +1,167 @@
+# rearm/export.py
+"""
+Streaming CSV/JSONL export for the lead and subscriber tables.
+
+Rows are read with values_list(...).iterator(chunk_size), which is a
+server-side cursor on PostgreSQL, and written out as they arrive, optionally
+through gzip. A worker only ever holds one chunk of rows, however big the
+table. Used by ExportAdminMixin's actions and the export_leads command.
+
+Under ASGI Django would turn a sync iterator into a list before sending
+it, so an admin export there streams aexport_chunks(): each chunk is read
+with sync_to_async on the request's thread (and so its database
+connection), one chunk at a time.
+"""
+import csv
+import re
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.contrib import admin
+from django.contrib.admin.options import IS_POPUP_VAR
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+EXPORT_CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+
+# Columns exported per model (label_lower); the primary key comes first.
+EXPORT_FIELDS = {
+    'blog.newslettersubscriber': ('id', 'email', 'subscribed_at'),
+    'blog.partnershiprequest': (
+        'id', 'name', 'email', 'position', 'phone', 'business_name', 'business_type',
+        'business_location', 'interest', 'message', 'submitted_at',
+    ),
+    'rearm.demobooking': ('id', 'name', 'email', 'phone', 'submitted_at', 'calendly_event_uri'),
+}
+
+FORMATS = {
+    # format: (extension, content type)
+    'csv': ('csv', 'text/csv'),
+    'jsonl': ('jsonl', 'application/x-ndjson'),
+}
+
+
+# Signed numbers (+234 801 234 5678, -12.5) are not formulas; leave them be
+_NUMBER = re.compile(r'[+-]?\d[\d ]*(\.\d+)?')
+
+
+class _Echo:
+    """File-like object for csv.writer that hands back what is written."""
+
+    def write(self, value):
+        return value
+
+
+# Leading characters a spreadsheet may read as the start of a formula (OWASP)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value):
+    # Form input ends up here; keep spreadsheets from running it as a formula
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) and not _NUMBER.fullmatch(value):
+        return "'" + value
+    return value
+
+
+def _csv_lines(rows, fields):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+def _jsonl_lines(rows, fields):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(fields, row))) + '\n'
+
+
+def _buffered(lines):
+    """Join small lines into ~BUFFER_SIZE byte chunks."""
+    buffer, size = [], 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= BUFFER_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(queryset, fields, fmt='csv', compress=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """Byte chunks of `queryset` as CSV or JSONL, gzipped if `compress`."""
+    rows = queryset.order_by('pk').values_list(*fields).iterator(chunk_size=chunk_size)
+    lines = _csv_lines(rows, fields) if fmt == 'csv' else _jsonl_lines(rows, fields)
+    chunks = _buffered(lines)
+    return _gzipped(chunks) if compress else chunks
+
+
+def export_filename(model, fmt, compress=False):
+    extension = FORMATS[fmt][0] + ('.gz' if compress else '')
+    return f'{model._meta.model_name}-{timezone.now():%Y%m%d-%H%M%S}.{extension}'
+
+
+async def aexport_chunks(queryset, fields, fmt='csv', compress=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """export_chunks() as an async iterator, for streaming under ASGI."""
+    chunks = export_chunks(queryset, fields, fmt, compress, chunk_size)
+    read = sync_to_async(next)
+    try:
+        while (chunk := await read(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()  # closes the server-side cursor
+
+
+def export_response(queryset, fields, fmt='csv', compress=False, asynchronous=False):
+    content_type = 'application/gzip' if compress else FORMATS[fmt][1]
+    chunks = aexport_chunks if asynchronous else export_chunks
+    response = StreamingHttpResponse(
+        chunks(queryset, fields, fmt, compress), content_type=content_type
+    )
+    filename = export_filename(queryset.model, fmt, compress)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _export_action(fmt, compress):
+    def action(modeladmin, request, queryset):
+        return export_response(queryset, modeladmin.get_export_fields(), fmt, compress,
+                               asynchronous=isinstance(request, ASGIRequest))
+    action.__name__ = f'export_{fmt}' + ('_gz' if compress else '')
+    description = f'Export selected as {fmt.upper()}' + (' (gzip)' if compress else '')
+    return admin.action(permissions=['view'], description=description)(action)
+
+
+EXPORT_ACTIONS = [_export_action(fmt, compress) for fmt in FORMATS for compress in (False, True)]
+
+
+class ExportAdminMixin:
+    """Adds streaming export actions; columns come from EXPORT_FIELDS."""
+    export_fields = None
+
+    def get_export_fields(self):
+        return self.export_fields or EXPORT_FIELDS[self.model._meta.label_lower]
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if self.actions is None or IS_POPUP_VAR in request.GET:
+            return actions
+        for action in EXPORT_ACTIONS:
+            if all(getattr(self, f'has_{permission}_permission')(request)
+                   for permission in action.allowed_permissions):
+                actions.setdefault(action.__name__, (action, action.__name__, action.short_description))
+        return actions
@@ -0,0 +1,155 @@
+# rearm/images.py
+"""
+Width variants (srcset) for uploaded images.
+
+Production images are Cloudinary resources: each variant is a transformation
+URL (w_<n>, q_auto, f_auto) built locally, nothing is fetched. In DEBUG the
+fields are plain ImageFields: variants are generated once with Pillow and
+saved next to the media files under RESPONSIVE_IMAGE_DIR.
+
+Passing a `ratio` ("4:3") crops every variant to that shape, which also
+gives known intrinsic width/height for Cloudinary images; without one,
+Cloudinary images only get width/height when the resource carries upload
+metadata.
+"""
+import logging
+import os
+from io import BytesIO
+
+from cloudinary import CloudinaryResource
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (320, 480, 640, 960, 1280, 1920)
+RESPONSIVE_IMAGE_DIR = 'responsive'
+CROP_MODES = ('fill', 'pad')
+
+
+class ResponsiveImage:
+    def __init__(self, src, variants=(), width=None, height=None):
+        self.src = src
+        self.variants = list(variants)  # [(url, width), ...] narrowest first
+        self.width = width
+        self.height = height
+
+    @property
+    def srcset(self):
+        return ', '.join(f'{url} {width}w' for url, width in self.variants)
+
+    def url_for(self, width):
+        """Narrowest variant at least `width` wide (or the widest there is)."""
+        for url, variant_width in self.variants:
+            if variant_width >= width:
+                return url
+        return self.src
+
+
+def get_widths(widths=None):
+    if isinstance(widths, str):
+        widths = [int(w) for w in widths.split(',') if w.strip()]
+    return sorted(widths or getattr(settings, 'RESPONSIVE_IMAGE_WIDTHS', DEFAULT_WIDTHS))
+
+
+def parse_ratio(ratio):
+    """'4:3' or '16/9' -> (4, 3); None for anything else."""
+    if not ratio:
+        return None
+    try:
+        w, h = (int(part) for part in str(ratio).replace('/', ':').split(':'))
+    except ValueError:
+        return None
+    return (w, h) if w > 0 and h > 0 else None
+
+
+def _height_for(width, ratio):
+    return round(width * ratio[1] / ratio[0])
+
+
+def responsive_image(image, widths=None, ratio=None, crop='fill'):
+    """ResponsiveImage for a CloudinaryField/ImageField value, or None if empty."""
+    if not image:
+        return None
+    widths = get_widths(widths)
+    ratio = parse_ratio(ratio)
+    crop = crop if crop in CROP_MODES else 'fill'
+    if isinstance(image, CloudinaryResource):
+        return _cloudinary_image(image, widths, ratio, crop)
+    return _local_image(image, widths, ratio, crop)
+
+
+def _cloudinary_image(resource, widths, ratio, crop):
+    options = {'quality': 'auto', 'fetch_format': 'auto', 'secure': True}
+    if ratio:
+        options.update(crop=crop, aspect_ratio=f'{ratio[0]}:{ratio[1]}')
+        if crop == 'fill':
+            options['gravity'] = 'auto'
+    else:
+        options['crop'] = 'limit'  # never upscale
+
+    variants = [(resource.build_url(width=w, **options), w) for w in widths]
+
+    width = height = None
+    metadata = resource.metadata or {}
+    if ratio:
+        width, height = widths[-1], _height_for(widths[-1], ratio)
+    elif metadata.get('width') and metadata.get('height'):
+        width, height = metadata['width'], metadata['height']
+        variants = [v for v in variants if v[1] < width] + [(resource.build_url(**options), width)]
+    return ResponsiveImage(variants[-1][0], variants, width, height)
+
+
+def _local_image(field_file, widths, ratio, crop):
+    try:
+        original_width, original_height = field_file.width, field_file.height
+    except (OSError, ValueError) as e:
+        logger.warning(f'Cannot read image {field_file.name}: {e}')
+        return ResponsiveImage(field_file.url)
+
+    if ratio:
+        # Largest crop of that shape the original holds; never upscale
+        original_width = min(original_width, original_height * ratio[0] // ratio[1])
+        original_height = _height_for(original_width, ratio)
+    variants = []
+    for width in widths:
+        if width >= original_width:
+            break
+        url = _local_variant(field_file, width, _height_for(width, ratio) if ratio else None, crop)
+        if url:
+            variants.append((url, width))
+
+    src = field_file.url
+    if ratio:
+        src = _local_variant(field_file, original_width, original_height, crop) or src
+    variants.append((src, original_width))
+    return ResponsiveImage(src, variants, original_width, original_height)
+
+
+def _local_variant(field_file, width, height, crop):
+    """URL of a resized copy of `field_file`, generating it on first use."""
+    storage = field_file.storage
+    suffix = f'{width}x{height}-{crop}' if height else f'{width}w'
+    name = os.path.join(RESPONSIVE_IMAGE_DIR, suffix, field_file.name)
+    if storage.exists(name):
+        return storage.url(name)
+
+    try:
+        with field_file.open('rb') as f, Image.open(f) as img:
+            img_format = img.format or 'PNG'
+            img = ImageOps.exif_transpose(img)
+            if height is None:
+                img.thumbnail((width, img.height))
+            elif crop == 'pad':
+                img = ImageOps.pad(img.convert('RGB'), (width, height), color='white')
+            else:
+                img = ImageOps.fit(img, (width, height))
+            if img_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            buffer = BytesIO()
+            img.save(buffer, format=img_format)
+    except (OSError, ValueError) as e:
+        logger.warning(f'Cannot resize image {field_file.name}: {e}')
+        return None
+    return storage.url(storage.save(name, ContentFile(buffer.getvalue())))
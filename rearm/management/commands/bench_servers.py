@@ -0,0 +1,253 @@
+import asyncio
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from .bench_views import URL_ARGS, URL_QUERIES, percentile
+
+# name: (gunicorn arguments, module the worker class needs, ASYNC_VIEWS)
+STACKS = {
+    'sync': (['core.wsgi:application'], 'gunicorn', 'False'),
+    'async': (['core.asgi:application', '--worker-class', 'uvicorn_worker.UvicornWorker'],
+              'uvicorn_worker', 'True'),
+}
+
+LOAD_ERRORS = (OSError, TimeoutError, ValueError, IndexError)
+
+
+def build_request(path, host, headers=()):
+    lines = [f'GET {path} HTTP/1.1', f'Host: {host}', 'Connection: close', *headers]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+async def fetch(host, port, request):
+    """Send `request` on a new connection and return the response's status code."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(request)
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split(b' ', 2)[1])
+
+
+async def slow_request(host, port, request, interval, stop):
+    """
+    Send `request` a header line at a time, one every `interval` seconds,
+    until `stop` is set; then finish it and read the response.
+    """
+    head = request[:-2]  # ends with the blank line
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(head)
+        await writer.drain()
+        dripped = 0
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except TimeoutError:
+                pass
+            writer.write(f'X-Slow-{dripped}: 1\r\n'.encode())
+            await writer.drain()
+            dripped += 1
+        writer.write(b'\r\n')
+        await writer.drain()
+        await reader.read()
+    finally:
+        writer.close()
+
+
+async def slow_client(host, port, request, interval, stop):
+    # Like a real slow client, come back if the server drops the connection
+    while not stop.is_set():
+        try:
+            await slow_request(host, port, request, interval, stop)
+        except LOAD_ERRORS:
+            await asyncio.sleep(interval)
+
+
+async def run_load(host, port, request, concurrency, duration, slow_clients=0,
+                   slow_interval=1.0, timeout=10.0):
+    """
+    `concurrency` clients sending `request` back to back for `duration`
+    seconds, while `slow_clients` connections trickle theirs in.
+    """
+    stop = asyncio.Event()
+    slow = [asyncio.create_task(slow_client(host, port, request, slow_interval, stop))
+            for _ in range(slow_clients)]
+    if slow:
+        await asyncio.sleep(min(slow_interval, duration))  # let them take their connections
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+    latencies, statuses = [], Counter()
+
+    async def client():
+        while loop.time() < deadline:
+            started = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(fetch(host, port, request), timeout)
+            except LOAD_ERRORS:
+                statuses['error'] += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*slow, return_exceptions=True)
+
+    latencies.sort()
+    ok = sum(count for status, count in statuses.items() if status != 'error' and status < 400)
+    return {
+        'requests': ok,
+        'errors': sum(statuses.values()) - ok,
+        'seconds': round(elapsed, 3),
+        'rps': round(ok / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 2) if latencies else None,
+        'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = ('Start the sync (gunicorn, core.wsgi) and async (gunicorn + uvicorn workers, '
+            'core.asgi) stacks in turn and compare their throughput and latency under '
+            'concurrent load while slow clients hold connections open')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stack', action='append', dest='stacks', choices=sorted(STACKS),
+                            help='Only this stack (repeatable; default: both)')
+        parser.add_argument('--url', default='home', metavar='NAME', help='URL name to request')
+        parser.add_argument('--workers', type=int, default=4, help='Server worker processes')
+        parser.add_argument('--concurrency', type=int, default=16, help='Clients sending requests back to back')
+        parser.add_argument('--slow-clients', type=int, default=8,
+                            help='Connections sending their headers a line per --slow-interval')
+        parser.add_argument('--slow-interval', type=float, default=1.0, help='Seconds between slow header lines')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load per stack')
+        parser.add_argument('--timeout', type=float, default=10.0, help='Seconds before a request counts as an error')
+        parser.add_argument('--warmup', type=int, default=20, help='Untimed requests per stack first')
+        parser.add_argument('--json', metavar='PATH',
+                            help="Also write the results as JSON to PATH ('-' for stdout)")
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['workers'] < 1:
+            raise CommandError('--concurrency and --workers must be at least 1')
+        stacks = options['stacks'] or list(STACKS)
+        for stack in stacks:
+            module = STACKS[stack][1]
+            if importlib.util.find_spec(module) is None:
+                raise CommandError(f'{stack}: {module} is not installed (see requirements.txt)')
+
+        path = self.path(options['url'])
+        host = settings.ALLOWED_HOSTS[0].strip().lstrip('.') if settings.ALLOWED_HOSTS else ''
+        headers = []
+        proxy_header = getattr(settings, 'SECURE_PROXY_SSL_HEADER', None)
+        if proxy_header:
+            name, value = proxy_header
+            headers.append(f'{name.removeprefix("HTTP_").replace("_", "-").title()}: {value}')
+        request = build_request(path, host if host and host != '*' else 'localhost', headers)
+
+        results = {}
+        for stack in stacks:
+            self.stderr.write(f'{stack}: starting {options["workers"]} workers')
+            results[stack] = self.bench(stack, request, options)
+
+        self.print_table(results, options)
+        if options['json']:
+            report = {
+                'path': path,
+                'workers': options['workers'],
+                'concurrency': options['concurrency'],
+                'slow_clients': options['slow_clients'],
+                'slow_interval': options['slow_interval'],
+                'duration': options['duration'],
+                'stacks': results,
+            }
+            data = json.dumps(report, indent=2, sort_keys=True) + '\n'
+            if options['json'] == '-':
+                self.stdout.write(data, ending='')
+            else:
+                with open(options['json'], 'w') as stream:
+                    stream.write(data)
+
+    def path(self, name):
+        args = ()
+        if name in URL_ARGS:
+            value = URL_ARGS[name]()
+            if value is None:
+                raise CommandError(f'No rows to build the {name} URL from')
+            args = (value,)
+        query = URL_QUERIES.get(name, '')
+        return reverse(name, args=args) + (f'?{query}' if query else '')
+
+    def bench(self, stack, request, options):
+        arguments, _, async_views = STACKS[stack]
+        port = free_port()
+        command = [sys.executable, '-m', 'gunicorn', *arguments,
+                   '--bind', f'127.0.0.1:{port}', '--workers', str(options['workers']),
+                   '--log-level', 'warning']
+        env = {**os.environ, 'ASYNC_VIEWS': async_views}
+        with tempfile.TemporaryFile() as log:
+            server = subprocess.Popen(command, env=env, cwd=settings.BASE_DIR,
+                                      stdout=log, stderr=subprocess.STDOUT)
+            try:
+                self.wait_ready(server, port, request, log)
+                for _ in range(options['warmup']):
+                    asyncio.run(fetch('127.0.0.1', port, request))
+                return asyncio.run(run_load(
+                    '127.0.0.1', port, request, options['concurrency'], options['duration'],
+                    slow_clients=options['slow_clients'], slow_interval=options['slow_interval'],
+                    timeout=options['timeout'],
+                ))
+            finally:
+                server.terminate()
+                try:
+                    server.wait(10)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+                    server.wait()
+
+    def wait_ready(self, server, port, request, log, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                log.seek(0)
+                raise CommandError(f'Server exited with {server.returncode}:\n'
+                                   f'{log.read().decode(errors="replace")}')
+            try:
+                asyncio.run(fetch('127.0.0.1', port, request))
+                return
+            except LOAD_ERRORS:
+                time.sleep(0.2)
+        raise CommandError(f'Server not answering on port {port} after {timeout}s')
+
+    def print_table(self, results, options):
+        self.stdout.write(f'{options["workers"]} workers, {options["concurrency"]} clients, '
+                          f'{options["slow_clients"]} slow clients, {options["duration"]:g}s')
+        self.stdout.write(f'{"stack":<8} {"requests":>9} {"req/s":>9} {"p50 ms":>9} {"p99 ms":>9} {"errors":>7}')
+        for stack, row in results.items():
+            p50 = f'{row["p50_ms"]:.2f}' if row['p50_ms'] is not None else '-'
+            p99 = f'{row["p99_ms"]:.2f}' if row['p99_ms'] is not None else '-'
+            line = (f'{stack:<8} {row["requests"]:>9} {row["rps"]:>9.1f} {p50:>9} {p99:>9} '
+                    f'{row["errors"]:>7}')
+            self.stdout.write(self.style.ERROR(line) if row['errors'] else line)
@@ -0,0 +1,150 @@
+import json
+import math
+import time
+from importlib import import_module
+from wsgiref.util import setup_testing_defaults
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, connection
+from django.urls import reverse
+
+from rearm.querybudget import QueryRecorder
+from rearm.warmup import SKIPPED_VIEWS, URL_ARGS, URL_QUERIES, URLCONFS
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+
+class Command(BaseCommand):
+    help = ('Request every named rearm/blog URL in-process through the WSGI handler and '
+            'report p50/p95/p99 latency, queries per request and response size')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per URL')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per URL first')
+        parser.add_argument('--url', action='append', dest='urls', metavar='NAME',
+                            help='Only benchmark this URL name (repeatable)')
+        parser.add_argument('--cold', action='store_true',
+                            help='Clear the cache before every request (no page cache hits)')
+        parser.add_argument('--json', metavar='PATH',
+                            help="Also write the results as JSON to PATH ('-' for stdout)")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1')
+        targets = self.targets(options['urls'])
+        handler = WSGIHandler()
+
+        # Keep one database connection for the whole run, as the test client
+        # does; connection setup is not part of what is measured.
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            results = {name: self.bench(handler, path, query, options)
+                       for name, path, query in targets}
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+
+        self.print_table(results)
+        if options['json']:
+            report = {
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'requests': options['requests'],
+                'warmup': options['warmup'],
+                'cold': options['cold'],
+                'urls': results,
+            }
+            data = json.dumps(report, indent=2, sort_keys=True) + '\n'
+            if options['json'] == '-':
+                self.stdout.write(data, ending='')
+            else:
+                with open(options['json'], 'w') as stream:
+                    stream.write(data)
+
+    def targets(self, only=None):
+        targets = []
+        for urlconf in URLCONFS:
+            for pattern in import_module(urlconf).urlpatterns:
+                name = pattern.name
+                if not name or name in SKIPPED_VIEWS or (only and name not in only):
+                    continue
+                args = ()
+                if name in URL_ARGS:
+                    value = URL_ARGS[name]()
+                    if value is None:
+                        self.stderr.write(f'Skipping {name}: no rows to build its URL from')
+                        continue
+                    args = (value,)
+                targets.append((name, reverse(name, args=args), URL_QUERIES.get(name, '')))
+        if only and not targets:
+            raise CommandError(f'No URL named {", ".join(only)}')
+        return targets
+
+    def environ(self, path, query):
+        host = settings.ALLOWED_HOSTS[0].strip().lstrip('.') if settings.ALLOWED_HOSTS else ''
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'HTTP_HOST': host if host and host != '*' else 'localhost',
+        }
+        if getattr(settings, 'SECURE_SSL_REDIRECT', False):
+            environ['wsgi.url_scheme'] = 'https'
+        setup_testing_defaults(environ)
+        return environ
+
+    def request(self, handler, path, query):
+        status = []
+
+        def start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split()[0]))
+            return lambda data: None
+
+        with QueryRecorder() as recorder:
+            started = time.perf_counter()
+            response = handler(self.environ(path, query), start_response)
+            try:
+                size = sum(len(chunk) for chunk in response)
+            finally:
+                response.close()
+            elapsed = time.perf_counter() - started
+        return status[0], elapsed, recorder.count, size
+
+    def bench(self, handler, path, query, options):
+        for _ in range(options['warmup']):
+            self.request(handler, path, query)
+
+        timings, queries = [], []
+        for _ in range(options['requests']):
+            if options['cold']:
+                cache.clear()
+            status, elapsed, count, size = self.request(handler, path, query)
+            timings.append(elapsed * 1000)
+            queries.append(count)
+        timings.sort()
+        return {
+            'path': path + (f'?{query}' if query else ''),
+            'status': status,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'queries': round(sum(queries) / len(queries), 2),
+            'bytes': size,
+        }
+
+    def print_table(self, results):
+        self.stdout.write(f'{"url":<16} {"status":>6} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} '
+                          f'{"queries":>8} {"bytes":>9}')
+        for name, row in results.items():
+            line = (f'{name:<16} {row["status"]:>6} {row["p50_ms"]:>9.2f} {row["p95_ms"]:>9.2f} '
+                    f'{row["p99_ms"]:>9.2f} {row["queries"]:>8} {row["bytes"]:>9}')
+            self.stdout.write(self.style.ERROR(line) if row['status'] >= 400 else line)
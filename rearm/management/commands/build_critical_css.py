@@ -0,0 +1,70 @@
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from rearm.bundles import build_bundle, rebase_css_urls
+from rearm.critical import CRITICAL_DIR, critical_css, critical_path, fold_elements, load_critical_css
+
+from .bench_views import URL_ARGS
+
+
+def read_static(path):
+    found = finders.find(path)
+    if found is None:
+        raise CommandError(f'Static file {path} not found')
+    with open(found, encoding='utf-8') as f:
+        return f.read()
+
+
+class Command(BaseCommand):
+    help = ('Render each CRITICAL_CSS_PAGES page and write the rules of its bundles that '
+            'apply above the fold to static/critical/<page>.css')
+
+    def add_arguments(self, parser):
+        parser.add_argument('pages', nargs='*', help='Only these pages (default: all)')
+        parser.add_argument('--output-dir', default=os.path.join(settings.BASE_DIR, 'static'),
+                            help='Static directory to write critical/<page>.css into')
+
+    def handle(self, *args, **options):
+        pages = options['pages'] or list(settings.CRITICAL_CSS_PAGES)
+        unknown = set(pages) - set(settings.CRITICAL_CSS_PAGES)
+        if unknown:
+            raise CommandError(f'Unknown page(s): {", ".join(sorted(unknown))}')
+        os.makedirs(os.path.join(options['output_dir'], CRITICAL_DIR), exist_ok=True)
+
+        host = settings.ALLOWED_HOSTS[0].strip().lstrip('.') if settings.ALLOWED_HOSTS else ''
+        client = Client(HTTP_HOST=host if host and host != '*' else 'localhost',
+                        secure=getattr(settings, 'SECURE_SSL_REDIRECT', False))
+        # Render the page as it is written, not through a stale page cache
+        cache.clear()
+        for page in pages:
+            url_name, bundles = settings.CRITICAL_CSS_PAGES[page]
+            args = ()
+            if url_name in URL_ARGS:
+                value = URL_ARGS[url_name]()
+                if value is None:
+                    raise CommandError(f'{page}: no rows to build the {url_name} URL from')
+                args = (value,)
+            with override_settings(STATIC_BUNDLES_ENABLED=False):
+                response = client.get(reverse(url_name, args=args))
+            if response.status_code != 200:
+                raise CommandError(f'{page}: {reverse(url_name, args=args)} returned {response.status_code}')
+
+            elements = fold_elements(response.content.decode(response.charset or 'utf-8'))
+            # Bundle CSS has url()s relative to bundles/; the critical file lives in critical/
+            css = '\n'.join(
+                rebase_css_urls(build_bundle(name, read_static), f'bundles/{name}', critical_path(page))
+                for name in bundles
+            )
+            critical = critical_css(css, elements)
+            with open(os.path.join(options['output_dir'], critical_path(page)), 'w', encoding='utf-8') as f:
+                f.write(critical + '\n')
+            self.stdout.write(f'{page}: {len(elements)} fold elements, '
+                              f'{len(critical)} of {len(css)} bytes of CSS')
+        cache.clear()
+        load_critical_css.cache_clear()
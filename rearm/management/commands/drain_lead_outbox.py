@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from rearm.outbox import dead_letter_count, drain, pending_count, retry_dead_letters
+
+
+class Command(BaseCommand):
+    help = 'Insert queued lead form submissions (demo bookings, partnership requests, newsletter signups)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.LEAD_OUTBOX_BATCH_SIZE,
+                            help='Submissions to insert per bulk_create and transaction')
+        parser.add_argument('--wait', type=float, default=None,
+                            help='Keep running, polling every WAIT seconds once the outbox is empty')
+        parser.add_argument('--retry-dead-letters', action='store_true',
+                            help='Queue submissions that failed to insert again first')
+
+    def handle(self, *args, **options):
+        if options['retry_dead_letters']:
+            self.stdout.write(f'{retry_dead_letters()} dead letters queued again.')
+        self.stdout.write(f'{pending_count()} submissions queued.')
+        totals = drain(options['batch_size'], wait=options['wait'])
+        for label, count in sorted(totals.items()):
+            self.stdout.write(f'{label}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Inserted {sum(totals.values())} submissions.'))
+        dead = dead_letter_count()
+        if dead:
+            self.stdout.write(self.style.WARNING(
+                f'{dead} submissions could not be inserted; see the dead_letter table in '
+                f'{settings.LEAD_OUTBOX_PATH}, then run with --retry-dead-letters.'
+            ))
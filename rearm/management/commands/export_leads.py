@@ -0,0 +1,38 @@
+import sys
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from rearm.export import EXPORT_CHUNK_SIZE, EXPORT_FIELDS, FORMATS, export_chunks
+
+
+class Command(BaseCommand):
+    help = 'Stream a lead or subscriber table to CSV/JSONL, optionally gzipped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(EXPORT_FIELDS),
+                            help='Table to export, e.g. blog.newslettersubscriber')
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip')
+        parser.add_argument('--output', '-o', default='-', help="File to write, or '-' for stdout")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        label = options['model']
+        model = apps.get_model(label)
+        chunks = export_chunks(model.objects.all(), EXPORT_FIELDS[label], options['format'],
+                               options['gzip'], options['chunk_size'])
+
+        output = options['output']
+        stream = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        written = 0
+        try:
+            for chunk in chunks:
+                stream.write(chunk)
+                written += len(chunk)
+        finally:
+            if stream is not sys.stdout.buffer:
+                stream.close()
+        if output != '-':
+            self.stdout.write(self.style.SUCCESS(f'Wrote {written} bytes to {output}.'))
@@ -0,0 +1,225 @@
+import random
+from datetime import timedelta
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from PIL import Image, ImageDraw
+
+from blog.models import Category, NewsletterSubscriber, PartnershipRequest, Post
+from rearm.models import (
+    AboutSection, CompanyInfo, DemoBooking, HeroSection, Leadership, Navbar, Product,
+    ProductCategory, Service, SocialMedia, TeamMember,
+)
+
+WORDS = (
+    'maize', 'cassava', 'sorghum', 'rice', 'soybean', 'cocoa', 'harvest', 'yield', 'farm',
+    'processing', 'storage', 'export', 'market', 'season', 'rainfall', 'irrigation', 'seed',
+    'fertilizer', 'tractor', 'cooperative', 'smallholder', 'supply', 'quality', 'grade',
+    'warehouse', 'logistics', 'drying', 'milling', 'packaging', 'price', 'demand', 'region',
+)
+FIRST_NAMES = ('Ada', 'Bola', 'Chidi', 'Dayo', 'Emeka', 'Funmi', 'Gbenga', 'Halima', 'Ife', 'Kemi')
+LAST_NAMES = ('Okafor', 'Adeyemi', 'Bello', 'Eze', 'Ibrahim', 'Nwosu', 'Ogun', 'Sani', 'Uche')
+PLACEHOLDER_COLOURS = ('#2f6b3a', '#8a6d1f', '#3d5a80', '#9c4a1a', '#5b4b8a', '#2a7f7f')
+PLACEHOLDER_SIZE = (1600, 1000)
+
+
+class Command(BaseCommand):
+    help = ('Bulk-generate synthetic rows for every rearm and blog model, '
+            'with placeholder images in local media storage')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--subscribers', type=int, default=10000)
+        parser.add_argument('--leads', type=int, default=1000,
+                            help='Demo bookings and partnership requests (each)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk_create')
+        parser.add_argument('--seed', type=int, help='Random seed, for repeatable data')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        # Seeded slugs/emails carry a run token so repeated runs add rows
+        # instead of colliding with the previous run's unique values.
+        self.token = '%06x' % self.random.getrandbits(24)
+        self.images = self.placeholder_images()
+
+        with transaction.atomic():
+            self.seed_site()
+        self.seed_posts(options['posts'])
+        self.seed_products(options['products'])
+        self.seed_subscribers(options['subscribers'])
+        self.seed_leads(options['leads'])
+
+        # bulk_create sends no post_save, so drop cached pages/chrome by hand
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS('Seeding complete.'))
+
+    # --- helpers ----------------------------------------------------------
+
+    def words(self, count):
+        return ' '.join(self.random.choice(WORDS) for _ in range(count))
+
+    def sentence(self, low=8, high=18):
+        return self.words(self.random.randint(low, high)).capitalize() + '.'
+
+    def paragraphs(self, count):
+        return ''.join(
+            '<p>' + ' '.join(self.sentence() for _ in range(self.random.randint(3, 7))) + '</p>'
+            for _ in range(count)
+        )
+
+    def person(self):
+        return f'{self.random.choice(FIRST_NAMES)} {self.random.choice(LAST_NAMES)}'
+
+    def phone(self):
+        return '080' + ''.join(self.random.choice('0123456789') for _ in range(8))
+
+    def past(self, days=730):
+        return self.now - timedelta(seconds=self.random.randint(0, days * 86400))
+
+    def image(self):
+        return self.random.choice(self.images)
+
+    def placeholder_images(self):
+        names = []
+        for index, colour in enumerate(PLACEHOLDER_COLOURS):
+            name = f'seed/placeholder-{index}.jpg'
+            if not default_storage.exists(name):
+                picture = Image.new('RGB', PLACEHOLDER_SIZE, colour)
+                draw = ImageDraw.Draw(picture)
+                width, height = PLACEHOLDER_SIZE
+                for step in range(0, width, 80):
+                    draw.line([(step, 0), (step + height, height)], fill='#ffffff', width=3)
+                buffer = BytesIO()
+                picture.save(buffer, 'JPEG', quality=80)
+                name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            names.append(name)
+        return names
+
+    def bulk_create(self, model, objs, **kwargs):
+        created = []
+        for start in range(0, len(objs), self.batch_size):
+            created += model.objects.bulk_create(objs[start:start + self.batch_size], **kwargs)
+        self.stdout.write(f'{model._meta.label}: {len(objs)} rows')
+        return created
+
+    def backdate(self, model, objs):
+        # created_at is auto_now_add, so spread it out after the insert
+        for obj in objs:
+            obj.created_at = self.past()
+        model.objects.bulk_update(objs, ['created_at'], batch_size=self.batch_size)
+
+    # --- models -----------------------------------------------------------
+
+    def seed_site(self):
+        if not Navbar.objects.exists():
+            Navbar.objects.create(site_name='Rearm', logo=self.image())
+        company = CompanyInfo.objects.first() or CompanyInfo.objects.create(
+            name='Rearm', logo=self.image(), address='12 Farm Road, Lagos',
+            phone_number_1=self.phone(), email='info@example.com',
+        )
+        if not company.social_media.exists():
+            SocialMedia.objects.bulk_create(
+                SocialMedia(company=company, platform=platform, url=f'https://{platform}.com/rearm')
+                for platform, _ in SocialMedia.PLATFORMS
+            )
+        existing_pages = set(HeroSection.objects.values_list('page', flat=True))
+        HeroSection.objects.bulk_create(
+            HeroSection(page=page, title=label, subtitle=self.sentence(), background_image=self.image())
+            for page, label in HeroSection.PAGE_CHOICES if page not in existing_pages
+        )
+        if not AboutSection.objects.filter(is_active=True).exists():
+            AboutSection.objects.create(title='About Rearm', subtitle=self.sentence(4, 8),
+                                        content=self.paragraphs(4), main_image=self.image(),
+                                        secondary_image=self.image())
+
+        Service.objects.bulk_create(
+            Service(title=title.title(), short_description=self.sentence(), content=self.paragraphs(3),
+                    image=self.image(), is_featured=index < 4, slug=f'{slugify(title)}-{self.token}')
+            for index, title in enumerate(self.words(1) + f' service {n}' for n in range(12))
+        )
+        TeamMember.objects.bulk_create(
+            TeamMember(name=self.person(), position=self.words(2).title(), bio=self.paragraphs(1),
+                       image=self.image(), order=order, show_on_about=order < 9)
+            for order in range(12)
+        )
+        Leadership.objects.bulk_create(
+            Leadership(name=self.person(), title=self.words(2).title(), photo=self.image(),
+                       home_excerpt=self.sentence()[:200], full_bio=self.paragraphs(2),
+                       is_ceo=order == 0 and not Leadership.objects.filter(is_ceo=True).exists(),
+                       display_order=order)
+            for order in range(5)
+        )
+
+    def seed_posts(self, count):
+        if not count:
+            return
+        author, _ = get_user_model().objects.get_or_create(username='seed-author')
+        categories = self.bulk_create(Category, [
+            Category(name=self.words(2).title(), slug=f'seed-{self.token}-{index}') for index in range(10)
+        ])
+        posts = []
+        for index in range(count):
+            title = self.sentence(4, 9).rstrip('.')
+            post = Post(title=title, slug=f'{slugify(title)[:160]}-{self.token}-{index}',
+                        author=author, content=self.paragraphs(self.random.randint(3, 10)),
+                        featured_image=self.image() if self.random.random() < 0.8 else None,
+                        is_published=self.random.random() < 0.9)
+            post.refresh_text_fields()  # bulk_create skips save()
+            posts.append(post)
+        posts = self.bulk_create(Post, posts)
+        self.backdate(Post, posts)
+
+        Through = Post.categories.through
+        self.bulk_create(Through, [
+            Through(post_id=post.pk, category_id=category.pk)
+            for post in posts for category in self.random.sample(categories, self.random.randint(1, 3))
+        ])
+
+    def seed_products(self, count):
+        if not count:
+            return
+        categories = self.bulk_create(ProductCategory, [
+            ProductCategory(name=f'{self.words(1).title()} {self.token} {index}',
+                            slug=f'seed-{self.token}-{index}')
+            for index in range(12)
+        ])
+        products = self.bulk_create(Product, [
+            Product(name=self.words(3).title(), slug=f'seed-{self.token}-{index}',
+                    category=self.random.choice(categories),
+                    product_type=self.random.choice(Product.PRODUCT_TYPES)[0],
+                    description=self.paragraphs(2), image=self.image(),
+                    is_featured=self.random.random() < 0.05, is_active=self.random.random() < 0.95)
+            for index in range(count)
+        ])
+        self.backdate(Product, products)
+
+    def seed_subscribers(self, count):
+        self.bulk_create(NewsletterSubscriber, [
+            NewsletterSubscriber(email=f'subscriber-{self.token}-{index}@example.com',
+                                 subscribed_at=self.past())
+            for index in range(count)
+        ], ignore_conflicts=True)
+
+    def seed_leads(self, count):
+        self.bulk_create(DemoBooking, [
+            DemoBooking(name=self.person(), email=f'demo-{self.token}-{index}@example.com',
+                        phone=self.phone(), submitted_at=self.past())
+            for index in range(count)
+        ])
+        self.bulk_create(PartnershipRequest, [
+            PartnershipRequest(name=self.person(), email=f'partner-{self.token}-{index}@example.com',
+                               phone=self.phone(), business_name=self.words(2).title() + ' Ltd',
+                               business_type=self.random.choice(('Farm', 'Processor', 'Retailer')),
+                               interest=self.words(3), message=self.sentence(), submitted_at=self.past())
+            for index in range(count)
+        ])
@@ -0,0 +1,359 @@
+# rearm/metrics.py
+"""
+Prometheus metrics, aggregated across worker processes.
+
+Each process keeps its values in its own memory-mapped file under
+METRICS_DIR (metrics_<pid>.db): recording a value is a dict lookup and a
+struct write into the map, no lock shared with other processes and no
+system call. The /metrics view reads every file in the directory and sums
+them, so a scrape never touches the database. When a worker exits, the
+gunicorn master folds its file into one aggregate file and deletes it
+(mark_process_dead(), from core/gunicorn_config.py's child_exit), so its
+counts stay in the totals while the number of files a scrape reads stays
+at one per live worker plus one. clear() empties the directory and is
+meant to run once when the server starts.
+
+MetricsMiddleware records latency, status and query-count per URL name
+and page cache hits; site_chrome and outbox record their own counters.
+Everything is a no-op unless METRICS_ENABLED.
+"""
+import fcntl
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
+
+from core.database import POOL_COUNTERS, pool_stats
+
+from .querybudget import QueryRecorder
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    'rearm_http_request_duration_seconds': (
+        'histogram', 'Request latency by URL name.', LATENCY_BUCKETS),
+    'rearm_http_responses_total': (
+        'counter', 'Responses by URL name and status code.', None),
+    'rearm_db_queries_per_request': (
+        'histogram', 'Database queries per request by URL name.', QUERY_BUCKETS),
+    'rearm_cache_requests_total': (
+        'counter', 'Cache lookups by cache and result (hit/miss).', None),
+    'rearm_form_submissions_total': (
+        'counter', 'Form submissions queued, by form.', None),
+    'rearm_lead_outbox_dead_letters_total': (
+        'counter', 'Queued submissions moved to the outbox dead_letter table, by model.', None),
+    'rearm_db_pool_events_total': (
+        'counter', 'Connection pool counters by database and event (psycopg pool stats names).', None),
+    'rearm_db_pool_wait_seconds_total': (
+        'counter', 'Time spent waiting for a pooled connection, by database.', None),
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+FILE_PATTERN = 'metrics_*.db'
+AGGREGATE_FILE = 'metrics_aggregate.db'  # exited processes, summed
+LOCK_FILE = 'metrics.lock'
+
+_HEADER = struct.Struct('<I4x')  # bytes in use, padded to 8
+_LENGTH = struct.Struct('<I')
+_VALUE = struct.Struct('<d')
+_INITIAL_SIZE = 64 * 1024
+
+
+def _padded(length):
+    # key length prefix + key, padded so the value that follows is 8-aligned
+    return length + (-(length + _LENGTH.size)) % 8
+
+
+class MmapStore:
+    """One process's values: string key -> float64, in a memory-mapped file."""
+
+    def __init__(self, path):
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < _INITIAL_SIZE:
+            self._file.truncate(_INITIAL_SIZE)
+            size = _INITIAL_SIZE
+        self._capacity = size
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._used = _HEADER.unpack_from(self._map, 0)[0] or _HEADER.size
+        self._positions = {key: position for key, _, position in _entries(self._map, self._used)}
+
+    def _add_key(self, key):
+        encoded = key.encode('utf-8')
+        size = _LENGTH.size + _padded(len(encoded)) + _VALUE.size
+        if self._used + size > self._capacity:
+            self._map.close()
+            while self._used + size > self._capacity:
+                self._capacity *= 2
+            self._file.truncate(self._capacity)
+            self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        _LENGTH.pack_into(self._map, self._used, len(encoded))
+        self._map[self._used + _LENGTH.size:self._used + _LENGTH.size + len(encoded)] = encoded
+        position = self._used + size - _VALUE.size
+        _VALUE.pack_into(self._map, position, 0.0)
+        # Publish the entry only once it is complete, for concurrent readers
+        self._used += size
+        _HEADER.pack_into(self._map, 0, self._used)
+        self._positions[key] = position
+        return position
+
+    def add(self, key, amount):
+        position = self._positions.get(key)
+        if position is None:
+            position = self._add_key(key)
+        _VALUE.pack_into(self._map, position, _VALUE.unpack_from(self._map, position)[0] + amount)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def _entries(data, used):
+    position = _HEADER.size
+    while position < used:
+        length = _LENGTH.unpack_from(data, position)[0]
+        start = position + _LENGTH.size
+        key = bytes(data[start:start + length]).decode('utf-8')
+        position = start + _padded(length)
+        yield key, _VALUE.unpack_from(data, position)[0], position
+        position += _VALUE.size
+
+
+def read_file(path):
+    """(key, value) pairs from one process's file."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        return []
+    used = min(_HEADER.unpack_from(data, 0)[0], len(data))
+    return [(key, value) for key, value, _ in _entries(data, used)]
+
+
+# --- recording --------------------------------------------------------------
+
+_lock = threading.Lock()
+_state = {'pid': None, 'directory': None, 'store': None}
+
+
+def enabled():
+    return getattr(settings, 'METRICS_ENABLED', False)
+
+
+def _directory():
+    return str(settings.METRICS_DIR)
+
+
+def _store():
+    pid, directory = os.getpid(), _directory()
+    if _state['pid'] != pid or _state['directory'] != directory:
+        # First use in this process (or a forked worker): open its own file
+        os.makedirs(directory, exist_ok=True)
+        _state['store'] = MmapStore(os.path.join(directory, f'metrics_{pid}.db'))
+        _state['pid'], _state['directory'] = pid, directory
+    return _state['store']
+
+
+def _key(name, suffix='', labels=None, le=None):
+    return json.dumps([name, suffix, sorted((labels or {}).items()), le])
+
+
+def inc(name, amount=1, **labels):
+    """Add `amount` to counter `name`."""
+    if not enabled():
+        return
+    with _lock:
+        _store().add(_key(name, labels=labels), amount)
+
+
+def observe(name, value, **labels):
+    """Record `value` in histogram `name`."""
+    if not enabled():
+        return
+    buckets = METRICS[name][2]
+    # Only the first bucket that fits is stored; render() makes them cumulative
+    le = next((bound for bound in buckets if value <= bound), '+Inf')
+    with _lock:
+        store = _store()
+        store.add(_key(name, '_bucket', labels, le), 1)
+        store.add(_key(name, '_sum', labels), value)
+        store.add(_key(name, '_count', labels), 1)
+
+
+def record_pool_stats():
+    """Move this process's connection pool counters (reset as they are read) into the metrics."""
+    for alias in settings.DATABASES:
+        stats = pool_stats(alias, reset=True) or {}
+        for event in POOL_COUNTERS:
+            if not stats.get(event):
+                continue
+            if event == 'requests_wait_ms':
+                inc('rearm_db_pool_wait_seconds_total', stats[event] / 1000, database=alias)
+            else:
+                inc('rearm_db_pool_events_total', stats[event], database=alias, event=event)
+
+
+@contextmanager
+def _files_lock(exclusive):
+    """Shared while a scrape reads the files, exclusive while one is folded into the aggregate."""
+    directory = _directory()
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+
+def mark_process_dead(pid):
+    """Fold the file of exited process `pid` into AGGREGATE_FILE and delete it."""
+    directory = _directory()
+    path = os.path.join(directory, f'metrics_{pid}.db')
+    if not os.path.exists(path):
+        return
+    aggregate = os.path.join(directory, AGGREGATE_FILE)
+    with _files_lock(exclusive=True):
+        totals = defaultdict(float)
+        for source in (aggregate, path):
+            if os.path.exists(source):
+                for key, value in read_file(source):
+                    totals[key] += value
+        # Written aside and renamed, so the aggregate is never half written
+        if os.path.exists(f'{aggregate}.tmp'):
+            os.remove(f'{aggregate}.tmp')  # left by an interrupted merge
+        store = MmapStore(f'{aggregate}.tmp')
+        try:
+            for key, value in totals.items():
+                store.add(key, value)
+        finally:
+            store.close()
+        os.replace(f'{aggregate}.tmp', aggregate)
+        os.remove(path)
+
+
+def clear():
+    """Delete every process's file. Only safe before the workers start."""
+    with _lock:
+        if _state['store'] is not None:
+            _state['store'].close()
+        _state.update(pid=None, directory=None, store=None)
+        for path in glob.glob(os.path.join(_directory(), FILE_PATTERN)):
+            os.remove(path)
+
+
+# --- exposition -------------------------------------------------------------
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def collect():
+    """Sum every process's values: {key: value}."""
+    totals = defaultdict(float)
+    with _files_lock(exclusive=False):
+        for path in glob.glob(os.path.join(_directory(), FILE_PATTERN)):
+            try:
+                for key, value in read_file(path):
+                    totals[key] += value
+            except (OSError, ValueError, struct.error):
+                continue  # a file being created
+    return totals
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    samples = defaultdict(lambda: defaultdict(dict))  # name -> labels -> {suffix/le: value}
+    for key, value in collect().items():
+        name, suffix, labels, le = json.loads(key)
+        if name not in METRICS:
+            continue
+        labels = tuple(tuple(pair) for pair in labels)
+        samples[name][labels][le if suffix == '_bucket' else suffix] = value
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, values in sorted(samples[name].items()):
+            if kind == 'counter':
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(values[""])}')
+                continue
+            cumulative = 0
+            for bound in (*buckets, '+Inf'):
+                cumulative += values.get(bound, 0)
+                le = bound if bound == '+Inf' else _format_value(bound)
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", le),))} '
+                             f'{_format_value(cumulative)}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(values.get("_sum", 0))}')
+            lines.append(f'{name}_count{_format_labels(labels)} {_format_value(values.get("_count", 0))}')
+    return '\n'.join(lines) + '\n'
+
+
+@require_GET
+@never_cache
+def metrics_view(request):
+    if not enabled():
+        raise Http404
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        return self.record(request, response, recorder, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        async with QueryRecorder() as recorder:
+            response = await self.get_response(request)
+        return self.record(request, response, recorder, time.perf_counter() - started)
+
+    def record(self, request, response, recorder, elapsed):
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else 'unresolved'
+        observe('rearm_http_request_duration_seconds', elapsed, view=view)
+        observe('rearm_db_queries_per_request', recorder.count, view=view)
+        inc('rearm_http_responses_total', view=view, status=response.status_code)
+        if response.has_header('X-Page-Cache'):
+            inc('rearm_cache_requests_total', cache='page', result=response['X-Page-Cache'])
+        record_pool_stats()
+        return response
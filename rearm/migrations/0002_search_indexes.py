@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from rearm.search import install_search_indexes, uninstall_search_indexes
+
+
+def install(apps, schema_editor):
+    install_search_indexes(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    uninstall_search_indexes(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rearm', '0001_initial'),
+        ('blog', '0002_post_text_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:47
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rearm', '0004_lead_submission_times'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='demobooking',
+            name='submitted_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rearm', '0005_lead_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aboutsection',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['id'], name='rearm_about_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leadership',
+            index=models.Index(fields=['display_order'], name='rearm_leadership_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['product_type', '-created_at'], name='rearm_product_type_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', '-created_at'], name='rearm_product_cat_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_featured', True)), fields=['-created_at'], name='rearm_product_featured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(condition=models.Q(('is_featured', True)), fields=['id'], name='rearm_service_featured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teammember',
+            index=models.Index(condition=models.Q(('is_active', True), ('show_on_about', True)), fields=['order'], name='rearm_team_about_order_idx'),
+        ),
+    ]
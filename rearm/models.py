@@ -8,6 +8,7 @@ from django.core.validators import RegexValidator
 from django.urls import reverse
 from django_ckeditor_5.fields import CKEditor5Field 
 from cloudinary.models import CloudinaryField
+from django.utils import timezone
 from django.utils.text import slugify
 
 
@@ -23,6 +24,7 @@ class Navbar(models.Model):
             logger.error(f"Error uploading logo image: {e}")
     
     site_name = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def logo_preview(self):
         if self.logo:
@@ -97,6 +99,7 @@ class HeroSection(models.Model):
                  "- Path: '/services/'<br>"
                  "- Full URL: 'https://example.com'"
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Hero for {self.get_page_display()}"
@@ -117,6 +120,13 @@ class Service(models.Model):
             logger.error(f'Error uploading service image:')
     is_featured = models.BooleanField(default=False)
     slug = models.SlugField(unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # services page and home: featured only
+            models.Index(fields=['id'], condition=models.Q(is_featured=True), name='rearm_service_featured_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -131,7 +141,8 @@ class DemoBooking(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField()
     phone = models.CharField(max_length=20)
-    submitted_at = models.DateTimeField(auto_now_add=True)
+    # Set when the form is submitted, not when the outbox row is inserted
+    submitted_at = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
     calendly_event_uri = models.URLField(blank=True, null=True)  # To store Calendly link
     
     def __str__(self):
@@ -169,6 +180,12 @@ class AboutSection(models.Model):
     meta_description = models.CharField(max_length=160, blank=True)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            # home and about: the active section
+            models.Index(fields=['id'], condition=models.Q(is_active=True), name='rearm_about_active_idx'),
+        ]
+
     def __str__(self):
         return self.title
     
@@ -200,6 +217,11 @@ class TeamMember(models.Model):
 
     class Meta:
         ordering = ['order']
+        indexes = [
+            # about page: active members shown there, in display order
+            models.Index(fields=['order'], condition=models.Q(is_active=True, show_on_about=True),
+                         name='rearm_team_about_order_idx'),
+        ]
         verbose_name_plural = "Team Members"
 
     def __str__(self):
@@ -222,6 +244,7 @@ class CompanyInfo(models.Model):
     phone_number_1 = models.CharField(max_length=20)
     phone_number_2 = models.CharField(max_length=20, blank=True, null=True)
     email = models.EmailField()
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name_plural = "Company Info"
@@ -241,6 +264,7 @@ class SocialMedia(models.Model):
     company = models.ForeignKey(CompanyInfo, on_delete=models.CASCADE, related_name='social_media')
     platform = models.CharField(max_length=20, choices=PLATFORMS)
     url = models.URLField()
+    updated_at = models.DateTimeField(auto_now=True)
     
     def icon_class(self):
         return f"fab fa-{self.platform}"
@@ -298,9 +322,22 @@ class Product(models.Model):
     is_featured = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Partial on is_active: inactive products are never listed.
+            # product_list: one list per product_type
+            models.Index(fields=['product_type', '-created_at'], condition=models.Q(is_active=True),
+                         name='rearm_product_type_active_idx'),
+            # product_detail: related products in the same category
+            models.Index(fields=['category', '-created_at'], condition=models.Q(is_active=True),
+                         name='rearm_product_cat_active_idx'),
+            # home: featured products, newest first
+            models.Index(fields=['-created_at'], condition=models.Q(is_featured=True),
+                         name='rearm_product_featured_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -329,6 +366,9 @@ class Leadership(models.Model):
 
     class Meta:
         ordering = ['display_order']
+        indexes = [
+            models.Index(fields=['display_order'], name='rearm_leadership_order_idx'),
+        ]
         verbose_name_plural = "Leadership Team"
 
     def __str__(self):
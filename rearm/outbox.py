@@ -0,0 +1,306 @@
+# rearm/outbox.py
+"""
+Local outbox for lead form submissions.
+
+Form views validate and enqueue() the row instead of inserting it: one
+append to a SQLite file on local disk, no database round trip. drain()
+moves queued rows into the real database with bulk_create, one batch (and
+one transaction) at a time. A row leaves the outbox only after its batch
+has been committed, so a crash repeats a batch rather than losing it.
+
+A row that cannot be inserted (its payload no longer fits the model, or
+the database rejects its values) is moved to the outbox's dead_letter
+table with the error, so it does not hold up the rows queued after it.
+Errors that are not about the rows, such as a lost connection, leave the
+whole batch queued for the next pass. `drain_lead_outbox
+--retry-dead-letters` queues dead letters again once the cause is fixed.
+
+The file is local to the host, so it must be drained there, by the web
+processes themselves: each process serving requests runs a drainer thread
+(start_drainer(), every LEAD_OUTBOX_DRAIN_INTERVAL seconds). Gunicorn
+workers start it before their first request and drain what is left when
+they exit (core/gunicorn_config.py); under any other server (runserver,
+bare uvicorn) DrainerWSGI/DrainerASGI in core.wsgi/core.asgi start it
+with a process's first request, and what a stopped process left queued is
+drained once the next one starts. Only one process drains at a time (a
+lock file next to the outbox). A container that is killed outright loses
+what was queued since the last pass, at most an interval's worth.
+"""
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DataError, IntegrityError, connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import metrics
+
+# Per model: the timestamp field stamped at enqueue time, and the field
+# duplicates are collapsed on within a batch (None: keep every row).
+OUTBOX_MODELS = {
+    'rearm.demobooking': ('submitted_at', None),
+    'blog.partnershiprequest': ('submitted_at', None),
+    'blog.newslettersubscriber': ('subscribed_at', 'email'),
+}
+
+# Errors that concern the rows themselves; they are dead-lettered. Any
+# other error leaves the batch queued.
+ROW_ERRORS = (LookupError, TypeError, ValueError, ValidationError, DataError, IntegrityError)
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_drainer = {'thread': None, 'stop': None, 'pid': None}
+_drainer_lock = threading.Lock()
+
+
+def _connection():
+    path = str(settings.LEAD_OUTBOX_PATH)
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.path != path:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS outbox ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, model TEXT NOT NULL, payload TEXT NOT NULL)'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS dead_letter ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, model TEXT NOT NULL, payload TEXT NOT NULL, '
+            'error TEXT NOT NULL, failed_at TEXT NOT NULL)'
+        )
+        _local.conn, _local.path = conn, path
+    return conn
+
+
+def enqueue(model, **fields):
+    """Queue a `model` row (e.g. DemoBooking, email=..., ...) for insertion."""
+    label = model._meta.label_lower
+    timestamp_field, _ = OUTBOX_MODELS[label]
+    fields.setdefault(timestamp_field, timezone.now())
+    _connection().execute(
+        'INSERT INTO outbox (model, payload) VALUES (?, ?)',
+        (label, json.dumps(fields, cls=DjangoJSONEncoder)),
+    )
+    metrics.inc('rearm_form_submissions_total', form=model._meta.model_name)
+
+
+def pending_count():
+    return _connection().execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+
+def dead_letter_count():
+    return _connection().execute('SELECT COUNT(*) FROM dead_letter').fetchone()[0]
+
+
+def retry_dead_letters():
+    """Queue every dead letter again; returns how many."""
+    conn = _connection()
+    with _drain_lock():
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            count = conn.execute(
+                'INSERT INTO outbox (model, payload) SELECT model, payload FROM dead_letter ORDER BY id'
+            ).rowcount
+            conn.execute('DELETE FROM dead_letter')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+    return count
+
+
+def _build(label, payload):
+    model = apps.get_model(label)
+    timestamp_field, _ = OUTBOX_MODELS[label]
+    fields = json.loads(payload)
+    fields[timestamp_field] = parse_datetime(fields[timestamp_field])
+    return model(**fields)
+
+
+def _dedupe(label, entries):
+    _, key = OUTBOX_MODELS[label]
+    if key is None:
+        return entries
+    unique = {}
+    for row, obj in entries:
+        unique.setdefault(getattr(obj, key), (row, obj))  # keep the earliest
+    return list(unique.values())
+
+
+def _insert(label, entries):
+    """
+    Insert the (row, obj) `entries` of one model. Returns (rows inserted,
+    [(row, error)] for those the database refused).
+    """
+    manager = apps.get_model(label).objects
+    _, key = OUTBOX_MODELS[label]
+    # Rows already in the table (unique key) are skipped, not errors
+    ignore_conflicts = key is not None
+    try:
+        with transaction.atomic():
+            manager.bulk_create([obj for _, obj in entries], ignore_conflicts=ignore_conflicts)
+        return len(entries), []
+    except ROW_ERRORS:
+        pass
+
+    # Some row is bad: insert them one by one to find out which
+    failed = []
+    for row, obj in entries:
+        obj.pk, obj._state.adding = None, True
+        try:
+            with transaction.atomic():
+                manager.bulk_create([obj], ignore_conflicts=ignore_conflicts)
+        except ROW_ERRORS as e:
+            failed.append((row, e))
+    return len(entries) - len(failed), failed
+
+
+@contextmanager
+def _drain_lock():
+    """Held while a batch moves, so two processes never insert the same rows."""
+    with open(f'{settings.LEAD_OUTBOX_PATH}.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def drain_batch(batch_size):
+    """Insert up to `batch_size` queued rows; returns {label: rows inserted}."""
+    conn = _connection()  # creates the directory the lock file goes in
+    with _drain_lock():
+        return _move_batch(conn, batch_size)
+
+
+def _move_batch(conn, batch_size):
+    rows = conn.execute(
+        'SELECT id, model, payload FROM outbox ORDER BY id LIMIT ?', (batch_size,)
+    ).fetchall()
+    if not rows:
+        return {}
+
+    by_model = defaultdict(list)
+    failed = []
+    for row in rows:
+        try:
+            by_model[row[1]].append((row, _build(row[1], row[2])))
+        except ROW_ERRORS as e:
+            failed.append((row, e))
+
+    inserted = {label: 0 for _, label, _ in rows}
+    with transaction.atomic():
+        for label, entries in by_model.items():
+            inserted[label], refused = _insert(label, _dedupe(label, entries))
+            failed.extend(refused)
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        _dead_letter(conn, failed)
+        conn.execute('DELETE FROM outbox WHERE id <= ?', (rows[-1][0],))
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+    return inserted
+
+
+def _dead_letter(conn, failed):
+    failed_at = timezone.now().isoformat()
+    for (row_id, label, payload), error in failed:
+        logger.error('Lead outbox row %s (%s) could not be inserted, moved to dead_letter: %r',
+                     row_id, label, error)
+        metrics.inc('rearm_lead_outbox_dead_letters_total', model=label)
+    conn.executemany(
+        'INSERT INTO dead_letter (model, payload, error, failed_at) VALUES (?, ?, ?, ?)',
+        [(label, payload, repr(error), failed_at) for (_, label, payload), error in failed],
+    )
+
+
+def drain(batch_size, wait=None):
+    """
+    Drain the outbox batch by batch. With `wait` (seconds), keep polling
+    instead of returning once it is empty.
+    """
+    totals = defaultdict(int)
+    while True:
+        inserted = drain_batch(batch_size)
+        for label, count in inserted.items():
+            totals[label] += count
+        if not inserted:
+            if wait is None:
+                return dict(totals)
+            time.sleep(wait)
+
+
+def _drain_every(interval, batch_size, stop):
+    while not stop.is_set():
+        try:
+            if drain(batch_size):
+                connections.close_all()  # this thread's connection, back to the pool
+        except Exception:
+            logger.exception('Draining the lead outbox failed, retrying in %ss', interval)
+            connections.close_all()
+        stop.wait(interval)
+
+
+def start_drainer(interval=None, batch_size=None):
+    """Drain in a daemon thread of this process every `interval` seconds, once per process."""
+    if _drainer['pid'] == os.getpid():
+        return  # already running here (a forked child has its own pid)
+    interval = settings.LEAD_OUTBOX_DRAIN_INTERVAL if interval is None else interval
+    if not interval:
+        return
+    with _drainer_lock:
+        if _drainer['pid'] == os.getpid():
+            return
+        stop = threading.Event()
+        thread = threading.Thread(target=_drain_every, name='lead-outbox',
+                                  args=(interval, batch_size or settings.LEAD_OUTBOX_BATCH_SIZE, stop),
+                                  daemon=True)
+        _drainer.update(thread=thread, stop=stop, pid=os.getpid())
+        thread.start()
+
+
+def stop_drainer(timeout=10):
+    """Stop this process's drainer thread, then drain what is still queued."""
+    thread, stop = _drainer['thread'], _drainer['stop']
+    if thread is None or _drainer['pid'] != os.getpid():
+        return {}
+    stop.set()
+    thread.join(timeout)
+    _drainer.update(thread=None, stop=None, pid=None)
+    return drain(settings.LEAD_OUTBOX_BATCH_SIZE)
+
+
+class DrainerWSGI:
+    """WSGI wrapper: the process serving a request runs a drainer (start_drainer())."""
+
+    def __init__(self, application):
+        self.application = application
+
+    def __call__(self, environ, start_response):
+        start_drainer()
+        return self.application(environ, start_response)
+
+
+class DrainerASGI:
+    """ASGI wrapper: the process serving a request runs a drainer (start_drainer())."""
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            start_drainer()
+        await self.application(scope, receive, send)
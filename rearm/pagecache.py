@@ -0,0 +1,188 @@
+# rearm/pagecache.py
+"""
+Full-page cache for anonymous GET requests, invalidated by tags.
+
+A cached page records the version of every tag it depends on, e.g.
+``product:*`` (any product), ``product:12`` (one product) or
+``productcategory:3``. Saving or deleting a row bumps its tags (see
+rearm.signals), so any page recorded against an older version is a miss.
+
+CSRF tokens are stripped from the stored HTML and filled in per request,
+so forms on cached pages keep working.
+
+Async views are cached the same way; the cache round trips then run in
+the request's sync thread rather than on the event loop.
+"""
+import hashlib
+import re
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+from .preload import recorded_links, restore_links
+
+PAGE_KEY = 'pagecache:page:{}'
+TAG_KEY = 'pagecache:tag:{}'
+CSRF_PLACEHOLDER = '__PAGECACHE_CSRF_TOKEN__'
+
+# The site chrome (navbar, hero, footer) is on every page
+BASE_TAGS = ('navbar:*', 'hero:*', 'company:*')
+
+# Shorter tag names for models whose model_name is unwieldy
+TAG_NAMES = {
+    'herosection': 'hero',
+    'companyinfo': 'company',
+    'socialmedia': 'company',
+}
+
+_CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def model_tag(model):
+    name = model._meta.model_name
+    return TAG_NAMES.get(name, name)
+
+
+def instance_tags(instance):
+    """Tags touched by saving or deleting `instance`."""
+    name = model_tag(type(instance))
+    tags = {f'{name}:*', f'{name}:{instance.pk}'}
+    # A product moving into a category changes that category's pages too
+    for field in instance._meta.concrete_fields:
+        if field.many_to_one:
+            value = getattr(instance, field.attname)
+            if value is not None:
+                tags.add(f'{model_tag(field.related_model)}:{value}')
+    return tags
+
+
+def invalidate_tags(*tags):
+    # A tag's version is when it last changed (ns), so conditional GETs
+    # (rearm.conditional) can use it for Last-Modified as well
+    now = time.time_ns()
+    cache.set_many({TAG_KEY.format(tag): now for tag in tags}, None)
+
+
+def add_page_tags(request, *tags):
+    """Let a view add dependencies it only knows once it has run."""
+    page_tags = getattr(request, '_page_cache_tags', None)
+    if page_tags is not None:
+        page_tags.update(tags)
+
+
+def tag_versions(tags):
+    """{tag: version} for `tags`; a tag never seen before starts at now."""
+    keys = {TAG_KEY.format(tag): tag for tag in tags}
+    for key in keys:
+        cache.add(key, time.time_ns(), None)
+    current = cache.get_many(keys)
+    return {keys[key]: version for key, version in current.items()}
+
+
+def _is_fresh(entry):
+    current = cache.get_many([TAG_KEY.format(tag) for tag in entry['tags']])
+    return all(
+        current.get(TAG_KEY.format(tag)) == version
+        for tag, version in entry['tags'].items()
+    )
+
+
+def _cacheable_request(request):
+    return (
+        getattr(settings, 'PAGE_CACHE_ENABLED', False)
+        and request.method in ('GET', 'HEAD')
+        # Anyone with a session may be logged in; don't touch the session
+        # (and the DB) to find out.
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+    )
+
+
+def _cacheable_response(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+    )
+
+
+def _page_key(request):
+    digest = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return PAGE_KEY.format(digest)
+
+
+def _cached_response(request):
+    """The cached page for `request` if it is still fresh, else None."""
+    entry = cache.get(_page_key(request))
+    if entry is None or not _is_fresh(entry):
+        return None
+    content = entry['content'].replace(CSRF_PLACEHOLDER, get_token(request))
+    response = HttpResponse(content, content_type=entry['content_type'])
+    response['X-Page-Cache'] = 'hit'
+    restore_links(request, entry.get('preload'))
+    return response
+
+
+def _start_page(request, tags):
+    # Versions are read before rendering so an edit made while the page
+    # renders leaves the stored copy already stale.
+    request._page_cache_tags = set(BASE_TAGS) | set(tags)
+    return tag_versions(request._page_cache_tags)
+
+
+def _store_page(request, versions, response):
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+
+    if _cacheable_response(response):
+        extra = request._page_cache_tags - versions.keys()
+        versions.update(tag_versions(extra))
+        if versions.keys() >= request._page_cache_tags:
+            content = _CSRF_INPUT_RE.sub(
+                rf'\g<1>{CSRF_PLACEHOLDER}\g<2>', response.content.decode(response.charset)
+            )
+            cache.set(_page_key(request), {
+                'tags': versions,
+                'content': content,
+                'content_type': response['Content-Type'],
+                'preload': recorded_links(request),
+            }, getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 60))
+    response['X-Page-Cache'] = 'miss'
+    return response
+
+
+def cache_page_tagged(*tags):
+    """
+    Cache the view's rendered page for anonymous visitors until one of
+    `tags` (or a tag added with add_page_tags) is invalidated.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if not _cacheable_request(request):
+                    return await view_func(request, *args, **kwargs)
+                response = await sync_to_async(_cached_response)(request)
+                if response is not None:
+                    return response
+                versions = await sync_to_async(_start_page)(request, tags)
+                response = await view_func(request, *args, **kwargs)
+                return await sync_to_async(_store_page)(request, versions, response)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable_request(request):
+                return view_func(request, *args, **kwargs)
+            response = _cached_response(request)
+            if response is not None:
+                return response
+            versions = _start_page(request, tags)
+            response = view_func(request, *args, **kwargs)
+            return _store_page(request, versions, response)
+        return wrapper
+    return decorator
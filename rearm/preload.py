@@ -0,0 +1,321 @@
+# rearm/preload.py
+"""
+Preload Link headers, and 103 Early Hints where the server supports them.
+
+The first time a page template is rendered, its critical static assets are
+worked out from the compiled template itself ({% extends %}, overridden
+blocks and constant {% include %}s followed): the stylesheets and scripts
+of {% bundle %} and {% critical_css %}, the fonts of {% font_face %}, and
+where the images are, namely the hero (includes/hero.html, whose background
+is only in an inline style), {% responsive_image %}s marked
+loading="eager", or else the first card of the first loop of
+{% responsive_image %}s when it is a product or post. That map is kept per
+template name, so afterwards a request costs a dict lookup plus resolving
+a handful of image URLs from the view's context.
+
+PreloadMiddleware sends the result as a Link header (rel=preload); images
+carry imagesrcset/imagesizes so the preload matches what <img> picks. The
+page cache keeps a page's links with its HTML.
+
+EarlyHints wraps the ASGI application: when the server advertises the
+http.response.early_hint extension it sends the static links last seen for
+the URL's view before Django starts on the request. Behind WSGI or a server
+without the extension the Link header is all there is (CDNs such as
+Cloudflare turn it into 103s themselves). Off unless PRELOAD_ENABLED.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.models import QuerySet
+from django.template import Context
+from django.template.library import SimpleNode
+from django.template.loader_tags import BlockNode, ExtendsNode, IncludeNode
+from django.template.defaulttags import ForNode
+from django.templatetags.static import static
+from django.urls import Resolver404, resolve
+
+from blog.models import Post
+
+from . import templatehooks
+from .bundles import bundle_paths
+from .images import responsive_image as build_responsive_image
+from .models import Product
+from .site_chrome import get_snapshot
+from .staticvariants import FONT_FORMATS, variant_urls
+from .templatetags.bundles import bundle, critical_css
+from .templatetags.responsive_images import responsive_image
+from .templatetags.static_variants import font_face
+
+HERO_TEMPLATE = 'includes/hero.html'
+HERO_WIDTH = 1920  # what hero.html asks for with |resized
+EARLY_HINT = 'http.response.early_hint'
+CARD_MODELS = (Product, Post)  # list pages whose first card is worth preloading
+
+FONT_TYPES = {'woff2': 'font/woff2', 'woff': 'font/woff', 'otf': 'font/otf', 'ttf': 'font/ttf'}
+
+_templates = {}  # template name -> TemplateAssets
+_views = {}      # URL name -> static links of the template it rendered
+_PENDING = object()
+
+
+def enabled():
+    return getattr(settings, 'PRELOAD_ENABLED', False)
+
+
+def clear():
+    _templates.clear()
+    _views.clear()
+
+
+def _quote(value):
+    return '"%s"' % str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def style_link(url):
+    return f'<{url}>; rel=preload; as=style'
+
+
+def script_link(url):
+    return f'<{url}>; rel=preload; as=script'
+
+
+def font_link(url, extension):
+    return f'<{url}>; rel=preload; as=font; type={_quote(FONT_TYPES[extension])}; crossorigin'
+
+
+def image_link(url, srcset=None, sizes=None):
+    link = f'<{url}>; rel=preload; as=image'
+    if srcset:
+        link += f'; imagesrcset={_quote(srcset)}; imagesizes={_quote(sizes or "100vw")}'
+    return link
+
+
+# --- template analysis ------------------------------------------------------
+
+class TemplateAssets:
+    def __init__(self):
+        self.links = []   # static assets, already formatted
+        self.images = []  # (image FilterExpression, kwargs) of eager <img>s
+        self.loop = None  # (sequence, loop variable, image, kwargs) of the first card loop
+        self.hero = False
+
+
+def _constant(expression):
+    """The value of a literal template argument ("core.css", 800), else None."""
+    var = getattr(expression, 'var', None)
+    return var if isinstance(var, (str, int)) and not expression.filters else None
+
+
+def _nodes(nodelist, engine, blocks, loops=()):
+    """(node, enclosing for loops) for every node `nodelist` can render."""
+    for node in nodelist:
+        if isinstance(node, ExtendsNode):
+            parent = _constant(node.parent_name)
+            if parent:
+                # The most derived template's blocks win
+                yield from _nodes(engine.get_template(parent).nodelist, engine,
+                                  {**node.blocks, **blocks}, loops)
+            return
+        if isinstance(node, BlockNode):
+            yield from _nodes(blocks.get(node.name, node).nodelist, engine, blocks, loops)
+            continue
+        if isinstance(node, IncludeNode):
+            name = _constant(node.template)
+            if name:
+                yield node, loops
+                yield from _nodes(engine.get_template(name).nodelist, engine, {}, loops)
+            continue
+        yield node, loops
+        inner = (*loops, node) if isinstance(node, ForNode) else loops
+        for attribute in node.child_nodelists:
+            yield from _nodes(getattr(node, attribute, None) or [], engine, blocks, inner)
+
+
+def _tag_links(func, args):
+    if func is bundle or func is critical_css:
+        names = settings.CRITICAL_CSS_PAGES[args[0]][1] if func is critical_css else [args[0]]
+        for name in names:
+            make = style_link if name.endswith('.css') else script_link
+            for path in bundle_paths(name):
+                yield make(static(path))
+    elif func is font_face:
+        path = args[1]
+        extension = path.rsplit('.', 1)[-1].lower()
+        variants = variant_urls(path, FONT_FORMATS)
+        if variants:
+            yield font_link(variants[0][1], variants[0][0])
+        elif extension in FONT_TYPES:
+            yield font_link(static(path), extension)
+
+
+def analyze(template):
+    """TemplateAssets for an engine-level Template."""
+    assets = TemplateAssets()
+    for node, loops in _nodes(template.nodelist, template.engine, {}):
+        if isinstance(node, IncludeNode):
+            assets.hero = assets.hero or _constant(node.template) == HERO_TEMPLATE
+        if not isinstance(node, SimpleNode):
+            continue
+        if node.func is responsive_image:
+            image, kwargs = node.args[0], node.kwargs
+            if loops:
+                # Only a card of a top-level loop can be found from the view's context
+                lookups = getattr(image.var, 'lookups', None) or ('',)
+                loop = next((loop for loop in reversed(loops) if lookups[0] in loop.loopvars), None)
+                if assets.loop is None and loop is loops[0]:
+                    assets.loop = (loop.sequence, lookups[0], image, kwargs)
+            elif _constant(kwargs.get('loading')) == 'eager':
+                assets.images.append((image, kwargs))
+            continue
+        args = [_constant(arg) for arg in node.args]
+        if None in args:
+            continue
+        for link in _tag_links(node.func, args):
+            if link not in assets.links:
+                assets.links.append(link)
+    return assets
+
+
+def get_assets(template):
+    name = template.origin.template_name or template.origin.name
+    assets = _templates.get(name)
+    if assets is None:
+        assets = _templates[name] = analyze(template)
+    return assets
+
+
+# --- per request ------------------------------------------------------------
+
+def _first(value):
+    """First row of a list, Page or already evaluated QuerySet, without a query."""
+    if hasattr(value, 'object_list'):
+        value = value.object_list
+    if isinstance(value, QuerySet):
+        value = value._result_cache
+    try:
+        return value[0] if value else None
+    except (TypeError, KeyError, IndexError):
+        return None
+
+
+def _image_link(image, kwargs, context):
+    options = {name: kwargs[name].resolve(context, ignore_failures=True)
+               for name in ('widths', 'ratio', 'crop', 'sizes') if name in kwargs}
+    # Only the view's context is at hand: images from context processors
+    # (the navbar logo) resolve to None and are left to the HTML
+    img = build_responsive_image(image.resolve(context, ignore_failures=True),
+                                 widths=options.get('widths'), ratio=options.get('ratio'),
+                                 crop=options.get('crop') or 'fill')
+    if img is None:
+        return None
+    if len(img.variants) > 1:
+        return image_link(img.src, img.srcset, options.get('sizes') or '100vw')
+    return image_link(img.src)
+
+
+def page_links(template, context, snapshot=None):
+    """Preload links for a page rendered from `template` with the view's `context` dict."""
+    assets = get_assets(template)
+    links = list(assets.links)
+    context = Context(context or {})
+
+    if assets.hero:
+        hero = (snapshot or get_snapshot()).hero_sections.get(context.get('page_name'))
+        img = build_responsive_image(hero.background_image) if hero else None
+        if img:
+            links.append(image_link(img.url_for(HERO_WIDTH)))
+
+    # Eager images are what the page marks as above the fold; failing
+    # that, the first product/post card
+    images = [_image_link(image, kwargs, context) for image, kwargs in assets.images]
+    if assets.loop and not any(images):
+        sequence, loopvar, image, kwargs = assets.loop
+        item = _first(sequence.resolve(context, ignore_failures=True))
+        if isinstance(item, CARD_MODELS):
+            images.append(_image_link(image, kwargs, Context({loopvar: item})))
+    links.extend(link for link in dict.fromkeys(images) if link and link not in links)
+    return links, assets.links
+
+
+def recorded_links(request):
+    """The links recorded for `request` (for the page cache), or None."""
+    links = getattr(request, '_preload_links', None)
+    return None if links is _PENDING else links
+
+
+def restore_links(request, links):
+    """Give a page served from the page cache the links recorded with it."""
+    if links is not None and getattr(request, '_preload_links', None) is _PENDING:
+        request._preload_links = links
+
+
+def _record_page(template, context, request):
+    # Only the page itself: render_to_string() partials come after it
+    if request is not None and getattr(request, '_preload_links', None) is _PENDING:
+        request._preload_links, static_links = page_links(
+            template, context, getattr(request, 'site_chrome', None))
+        match = request.resolver_match
+        if match and match.url_name:
+            _views[match.url_name] = static_links
+
+
+def install():
+    templatehooks.after_page(_record_page)
+
+
+class PreloadMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request._preload_links = _PENDING
+        return self.add_links(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        request._preload_links = _PENDING
+        return self.add_links(request, await self.get_response(request))
+
+    def add_links(self, request, response):
+        links = recorded_links(request)
+        if links and response.get('Content-Type', '').startswith('text/html'):
+            if response.has_header('Link'):
+                links = [response['Link'], *links]
+            response['Link'] = ', '.join(links)
+        return response
+
+
+# --- early hints ------------------------------------------------------------
+
+def view_links(path):
+    """Static links last sent for the view at `path`."""
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return []
+    return _views.get(match.url_name, [])
+
+
+class EarlyHints:
+    """ASGI wrapper sending a 103 with the view's static preloads first."""
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if (scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD')
+                and EARLY_HINT in scope.get('extensions', {}) and enabled()):
+            path = scope['path'].removeprefix(scope.get('root_path', ''))
+            links = view_links(path)
+            if links:
+                await send({'type': EARLY_HINT, 'links': [link.encode('latin-1') for link in links]})
+        await self.application(scope, receive, send)
@@ -0,0 +1,156 @@
+# rearm/querybudget.py
+"""
+Per-request query budgets and N+1 detection.
+
+QueryBudgetMiddleware records every query a request runs, groups them by
+normalized SQL and checks them against QUERY_BUDGETS (keyed by URL name).
+The same checks are available to tests through the `query_budget`
+decorator.
+"""
+import functools
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST_RE = re.compile(r'\bIN \((?:%s, )*%s\)')
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_SPACE_RE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def normalize_sql(sql):
+    """Reduce a statement to its shape so repeats with different values group."""
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    sql = _LITERAL_RE.sub('?', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """Context manager recording (sql, seconds) for every query on every connection."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    # An async view's queries run in its request's sync thread (the async
+    # ORM goes through sync_to_async), whose connections are not the event
+    # loop's: install the wrappers there.
+    async def __aenter__(self):
+        return await sync_to_async(self.__enter__)()
+
+    async def __aexit__(self, *exc_info):
+        await sync_to_async(self.__exit__)(*exc_info)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(seconds for _, seconds in self.queries)
+
+    def patterns(self):
+        return Counter(normalize_sql(sql) for sql, _ in self.queries)
+
+
+def get_budget(url_name):
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(
+        url_name, getattr(settings, 'QUERY_BUDGET_DEFAULT', 20)
+    )
+
+
+def find_violations(recorder, url_name, budget=None):
+    """Return a list of human-readable problems, empty if within budget."""
+    budget = get_budget(url_name) if budget is None else budget
+    threshold = getattr(settings, 'QUERY_BUDGET_REPEAT_THRESHOLD', 5)
+    problems = []
+
+    if recorder.count > budget:
+        problems.append(f'{recorder.count} queries, budget is {budget}')
+    for sql, times in recorder.patterns().most_common():
+        if times <= threshold:
+            break
+        problems.append(f'possible N+1, ran {times}x: {sql[:300]}')
+    return problems
+
+
+class QueryBudgetMiddleware:
+    """Log (or raise, with QUERY_BUDGET_RAISE) when a view blows its query budget."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        self.check(request, recorder)
+        return response
+
+    async def __acall__(self, request):
+        async with QueryRecorder() as recorder:
+            response = await self.get_response(request)
+        self.check(request, recorder)
+        return response
+
+    def check(self, request, recorder):
+        match = request.resolver_match
+        url_name = match.url_name if match else None
+        problems = find_violations(recorder, url_name)
+        if problems:
+            message = f'Query budget exceeded for {request.path} ({url_name}): ' + '; '.join(problems)
+            if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+
+def query_budget(url_name=None, budget=None):
+    """
+    Test decorator: fail the test if it runs more queries than the budget
+    for `url_name` (or an explicit `budget`), or repeats a statement shape.
+    """
+    def decorator(test_func):
+        @functools.wraps(test_func)
+        def wrapper(self, *args, **kwargs):
+            with QueryRecorder() as recorder:
+                result = test_func(self, *args, **kwargs)
+            problems = find_violations(recorder, url_name, budget)
+            if problems:
+                self.fail(f'{url_name or test_func.__name__}: ' + '; '.join(problems))
+            return result
+        return wrapper
+    return decorator
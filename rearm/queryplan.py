@@ -0,0 +1,78 @@
+# rearm/queryplan.py
+"""
+Find full table scans in query plans (SQLite and PostgreSQL).
+
+Used by the EXPLAIN regression tests: every SELECT a public view runs is
+explained, and a table read without an index is reported; indexes_used()
+pins the hot paths to the index meant to serve them. On PostgreSQL
+sequential scans are disabled while explaining, so with test-sized tables
+a "Seq Scan" in the plan means no index could serve the query at all.
+"""
+import json
+import re
+
+_SQLITE_SCAN_RE = re.compile(r'^SCAN (\w+)$')
+_SQLITE_INDEX_RE = re.compile(r'\bUSING (?:COVERING )?INDEX (\w+)')
+_ALIAS_RE = re.compile(r'"(\w+)" (?:AS )?"?([A-Z]\d+)\b"?')
+
+
+def _sqlite_plan(cursor, sql, params):
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+    return [detail for *_, detail in cursor.fetchall()]
+
+
+def _sqlite_scans(cursor, sql, params):
+    aliases = {alias: table for table, alias in _ALIAS_RE.findall(sql)}
+    scans = []
+    for detail in _sqlite_plan(cursor, sql, params):
+        match = _SQLITE_SCAN_RE.match(detail)
+        if match:
+            scans.append(aliases.get(match.group(1), match.group(1)))
+    return scans
+
+
+def _postgresql_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from _postgresql_nodes(child)
+
+
+def _postgresql_plan(cursor, sql, params):
+    cursor.execute('SET enable_seqscan = off')
+    try:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    finally:
+        cursor.execute('RESET enable_seqscan')
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return list(_postgresql_nodes(plan[0]['Plan']))
+
+
+def _postgresql_scans(cursor, sql, params):
+    return [node['Relation Name'] for node in _postgresql_plan(cursor, sql, params)
+            if node['Node Type'] == 'Seq Scan']
+
+
+def full_table_scans(connection, sql, params=None):
+    """Tables `sql` reads in full, per the planner. Empty on other backends."""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return []
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            return _sqlite_scans(cursor, sql, params)
+        if connection.vendor == 'postgresql':
+            return _postgresql_scans(cursor, sql, params)
+    return []
+
+
+def indexes_used(connection, sql, params=None):
+    """Names of the indexes the planner reads for `sql`. Empty on other backends."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            return [match.group(1) for detail in _sqlite_plan(cursor, sql, params)
+                    for match in _SQLITE_INDEX_RE.finditer(detail)]
+        if connection.vendor == 'postgresql':
+            return [node['Index Name'] for node in _postgresql_plan(cursor, sql, params)
+                    if 'Index Name' in node]
+    return []
@@ -0,0 +1,162 @@
+# rearm/search.py
+"""
+Full-text search over posts, products and services.
+
+PostgreSQL keeps a generated ``search_vector`` tsvector column (GIN indexed)
+on each searched table; SQLite keeps an external-content FTS5 table that
+triggers keep in sync. Both are installed by rearm's migrations, see
+``install_search_indexes``.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'english'
+
+# table -> ((column, weight), ...)  weights are only used by PostgreSQL
+SEARCH_TABLES = {
+    'blog_post': (('title', 'A'), ('plain_text', 'B')),
+    'rearm_product': (('name', 'A'), ('description', 'B')),
+    'rearm_service': (('title', 'A'), ('short_description', 'B'), ('content', 'C')),
+}
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+# --- index installation (called from migrations / post_migrate) -------------
+
+def _postgres_vector_sql(columns):
+    return ' || '.join(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({column}, '')), '{weight}')"
+        for column, weight in columns
+    )
+
+
+def _install_postgres(cursor, table, columns):
+    cursor.execute(
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({_postgres_vector_sql(columns)}) STORED"
+    )
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS {table}_search_idx ON {table} USING gin (search_vector)"
+    )
+
+
+def _install_sqlite(cursor, table, columns):
+    names = [column for column, _ in columns]
+    cols = ', '.join(names)
+    new = ', '.join(f'new.{name}' for name in names)
+    old = ', '.join(f'old.{name}' for name in names)
+    fts = f'{table}_fts'
+
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [fts]
+    )
+    created = cursor.fetchone() is None
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} "
+        f"USING fts5({cols}, content='{table}', content_rowid='id')"
+    )
+    # Django rebuilds SQLite tables on many schema changes, which drops
+    # their triggers, so these are (re)created on every migrate.
+    cursor.execute(f"DROP TRIGGER IF EXISTS {fts}_ai")
+    cursor.execute(f"DROP TRIGGER IF EXISTS {fts}_ad")
+    cursor.execute(f"DROP TRIGGER IF EXISTS {fts}_au")
+    cursor.execute(
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END"
+    )
+    cursor.execute(
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END"
+    )
+    cursor.execute(
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END"
+    )
+    if created:
+        cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def install_search_indexes(connection):
+    installers = {'postgresql': _install_postgres, 'sqlite': _install_sqlite}
+    installer = installers.get(connection.vendor)
+    if installer is None:
+        return
+    with connection.cursor() as cursor:
+        for table, columns in SEARCH_TABLES.items():
+            installer(cursor, table, columns)
+
+
+def uninstall_search_indexes(connection):
+    with connection.cursor() as cursor:
+        for table in SEARCH_TABLES:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f"DROP INDEX IF EXISTS {table}_search_idx")
+                cursor.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector")
+            elif connection.vendor == 'sqlite':
+                for suffix in ('ai', 'ad', 'au'):
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+                cursor.execute(f"DROP TABLE IF EXISTS {table}_fts")
+
+
+# --- querying ---------------------------------------------------------------
+
+def fts5_query(text):
+    """Quote each word so user input can't use (or break) FTS5 syntax."""
+    terms = _TERM_RE.findall(text)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search(queryset, text):
+    """
+    Filter `queryset` to rows matching `text`, annotated with `rank`
+    and ordered best match first.
+    """
+    text = (text or '').strip()
+    model = queryset.model
+    table = model._meta.db_table
+    vendor = connections[queryset.db].vendor
+
+    if table not in SEARCH_TABLES:
+        raise ValueError(f'{model.__name__} has no search index')
+
+    if vendor == 'postgresql':
+        tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        match = RawSQL(f'{table}.search_vector @@ {tsquery}', (text,),
+                       output_field=BooleanField())
+        rank = RawSQL(f'ts_rank({table}.search_vector, {tsquery})', (text,),
+                      output_field=FloatField())
+    elif vendor == 'sqlite':
+        expr = fts5_query(text)
+        if not expr:
+            return queryset.none()
+        fts = f'{table}_fts'
+        match = RawSQL(
+            f'{table}.id IN (SELECT rowid FROM {fts} WHERE {fts} MATCH %s)', (expr,),
+            output_field=BooleanField(),
+        )
+        # bm25() is lower-is-better, so flip it to match ts_rank
+        rank = RawSQL(
+            f'(SELECT -bm25({fts}) FROM {fts} WHERE {fts} MATCH %s AND rowid = {table}.id)',
+            (expr,), output_field=FloatField(),
+        )
+    else:
+        match = Q()
+        for column, _ in SEARCH_TABLES[table]:
+            match |= Q(**{f'{column}__icontains': text})
+        rank = Value(0.0, output_field=FloatField())
+
+    return queryset.filter(match).annotate(rank=rank).order_by('-rank')
+
+
+class SearchAdminMixin:
+    """Route the changelist search box through the full-text index."""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search(queryset, search_term), False
@@ -0,0 +1,180 @@
+# rearm/servertiming.py
+"""
+Server-Timing header and per-request timing log.
+
+For a sampled request (SERVER_TIMING_SAMPLE_RATE) ServerTimingMiddleware
+reports:
+  db       time in the database and the query count (QueryRecorder)
+  ctx      context processors (global_context, auth, messages, ...)
+  tpl      template rendering, excluding ctx and the includes listed next
+  tpl-<x>  each template {% include %}d by the page's top-level templates
+  total    the whole request below this middleware
+
+Template timings include queries evaluated lazily while rendering, so db
+overlaps tpl. The same numbers go to the `rearm.servertiming` logger as
+one JSON line. Unsampled requests only pay for a random() call.
+
+Template and context processor timing registers with rearm.templatehooks
+around Template.render and RequestContext.bind_template; the hooks do
+nothing outside a sampled request.
+"""
+import json
+import logging
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import templatehooks
+from .querybudget import QueryRecorder
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('server_timing', default=None)
+_METRIC_RE = re.compile(r'[^A-Za-z0-9_-]+')
+
+
+class RequestTimings:
+    def __init__(self):
+        self.context_processors = 0.0
+        self.templates = 0.0
+        self.includes = {}  # template name -> [seconds, renders]
+        self.depth = 0
+        self.db = 0.0
+        self.queries = 0
+        self.total = 0.0
+
+    def metrics(self):
+        """[(name, milliseconds, description)] in header order."""
+        included = sum(seconds for seconds, _ in self.includes.values())
+        metrics = [
+            ('db', self.db, f'{self.queries} queries'),
+            ('ctx', self.context_processors, None),
+            ('tpl', max(self.templates - self.context_processors - included, 0.0), None),
+        ]
+        for name, (seconds, renders) in self.includes.items():
+            stem = name.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+            description = name if renders == 1 else f'{name} x{renders}'
+            metrics.append((f'tpl-{_METRIC_RE.sub("-", stem)}', seconds, description))
+        metrics.append(('total', self.total, None))
+        return [(name, round(seconds * 1000, 2), description) for name, seconds, description in metrics]
+
+    def header(self):
+        parts = []
+        for name, ms, description in self.metrics():
+            part = f'{name};dur={ms}'
+            if description:
+                part += ';desc="%s"' % description.replace('"', "'")
+            parts.append(part)
+        return ', '.join(parts)
+
+
+def _timed_render(render, template, context):
+    timings = _current.get()
+    if timings is None or timings.depth > 1:
+        return render(template, context)
+    timings.depth += 1
+    started = time.perf_counter()
+    try:
+        return render(template, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        timings.depth -= 1
+        # {% extends %} renders its parent with _render(), so depth 0 is
+        # the page and depth 1 is whatever it (or its parents) include.
+        if timings.depth == 0:
+            timings.templates += elapsed
+        else:
+            entry = timings.includes.setdefault(template.name or '<string>', [0.0, 0])
+            entry[0] += elapsed
+            entry[1] += 1
+
+
+@contextmanager
+def _timed_bind_template(bind_template, context, template):
+    timings = _current.get()
+    started = time.perf_counter()
+    with bind_template(context, template):  # runs the context processors
+        if timings is not None:
+            timings.context_processors += time.perf_counter() - started
+        yield
+
+
+def install():
+    templatehooks.around_render(_timed_render)
+    templatehooks.around_bind(_timed_bind_template)
+
+
+def _sampled():
+    return random.random() < getattr(settings, 'SERVER_TIMING_SAMPLE_RATE', 1.0)
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING_ENABLED', False):
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not _sampled():
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            with QueryRecorder() as recorder:
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.report(request, response, timings, recorder, started)
+
+    async def __acall__(self, request):
+        if not _sampled():
+            return await self.get_response(request)
+
+        # sync_to_async copies the context, so the hooks see `timings` in
+        # the request's sync thread too
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            async with QueryRecorder() as recorder:
+                response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.report(request, response, timings, recorder, started)
+
+    def report(self, request, response, timings, recorder, started):
+        timings.total = time.perf_counter() - started
+        timings.db, timings.queries = recorder.duration, recorder.count
+
+        header = timings.header()
+        if response.has_header('Server-Timing'):
+            header = f"{response['Server-Timing']}, {header}"
+        response['Server-Timing'] = header
+
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'event': 'server_timing',
+            'method': request.method,
+            'path': request.path,
+            'view': match.url_name if match else None,
+            'status': response.status_code,
+            'queries': timings.queries,
+            'timings_ms': {name: ms for name, ms, _ in timings.metrics()},
+        }))
+        return response
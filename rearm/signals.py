@@ -0,0 +1,60 @@
+# rearm/signals.py
+from django.apps import apps
+from django.db import connections
+from django.db.models.signals import post_save, post_delete, m2m_changed
+
+from .models import CompanyInfo, Navbar, HeroSection, SocialMedia
+from .pagecache import instance_tags, invalidate_tags, model_tag
+from .search import SEARCH_TABLES, install_search_indexes
+from .site_chrome import bump_version
+
+# Models whose rows end up in the site chrome snapshot (navbar, hero, footer)
+SITE_CHROME_MODELS = (Navbar, HeroSection, CompanyInfo, SocialMedia)
+
+
+def invalidate_site_chrome(sender, **kwargs):
+    bump_version()
+
+
+for model in SITE_CHROME_MODELS:
+    post_save.connect(invalidate_site_chrome, sender=model,
+                      dispatch_uid=f'site_chrome_save_{model.__name__}')
+    post_delete.connect(invalidate_site_chrome, sender=model,
+                        dispatch_uid=f'site_chrome_delete_{model.__name__}')
+
+
+# Page cache: every model in rearm and blog can appear on a cached page
+PAGE_CACHE_APPS = ('rearm', 'blog')
+
+
+def invalidate_page_cache(sender, instance, **kwargs):
+    invalidate_tags(*instance_tags(instance))
+
+
+def invalidate_page_cache_m2m(sender, instance, action, model, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    tags = instance_tags(instance) | {f'{model_tag(model)}:*'}
+    tags.update(f'{model_tag(model)}:{pk}' for pk in pk_set or ())
+    invalidate_tags(*tags)
+
+
+for app_label in PAGE_CACHE_APPS:
+    for model in apps.get_app_config(app_label).get_models():
+        post_save.connect(invalidate_page_cache, sender=model,
+                          dispatch_uid=f'page_cache_save_{model._meta.label}')
+        post_delete.connect(invalidate_page_cache, sender=model,
+                            dispatch_uid=f'page_cache_delete_{model._meta.label}')
+        for field in model._meta.local_many_to_many:
+            m2m_changed.connect(invalidate_page_cache_m2m, sender=field.remote_field.through,
+                                dispatch_uid=f'page_cache_m2m_{field.remote_field.through._meta.label}')
+
+
+def reinstall_sqlite_search(sender, using, **kwargs):
+    # SQLite table rebuilds during migrate drop the FTS triggers; put them back.
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    tables = set(connection.introspection.table_names())
+    if set(SEARCH_TABLES) <= tables:
+        install_search_indexes(connection)
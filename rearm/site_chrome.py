@@ -0,0 +1,151 @@
+# rearm/site_chrome.py
+import time
+
+from django.core.cache import cache
+from django.urls import reverse, NoReverseMatch
+from django.utils import timezone
+
+from . import metrics
+from .models import CompanyInfo, Navbar, HeroSection
+
+VERSION_KEY = 'site_chrome:version'
+SNAPSHOT_KEY = 'site_chrome:snapshot:{version}'
+CHANGED_AT_KEY = 'site_chrome:changed_at'
+SNAPSHOT_TIMEOUT = 60 * 60 * 24  # superseded snapshots just age out
+
+# Per-worker copy of the last snapshot, so a request only pays one cache
+# lookup (the version key) while the chrome is unchanged.
+_local = {'version': None, 'snapshot': None}
+
+
+class SiteChromeSnapshot:
+    """Everything base.html needs for the navbar, hero and footer."""
+
+    def __init__(self, navbar, hero_sections, company, social_links):
+        self.navbar = navbar
+        self.hero_sections = hero_sections
+        self.company = company
+        self.social_links = social_links
+
+
+def resolve_cta_link(link, default='#'):
+    """Turn a hero CTA link (URL name, path or full URL) into an href."""
+    if not link:
+        return default
+    if '/' in link or '.' in link:
+        return link
+    try:
+        return reverse(link)
+    except NoReverseMatch:
+        return default
+
+
+def _snapshot(heroes, company, navbar):
+    for hero in heroes:
+        hero.primary_cta_href = reverse('book_demo')
+        hero.secondary_cta_href = resolve_cta_link(hero.secondary_cta_link)
+    return SiteChromeSnapshot(
+        navbar=navbar,
+        hero_sections={hero.page: hero for hero in heroes},
+        company=company,
+        social_links=list(company.social_media.all()) if company else [],
+    )
+
+
+def build_snapshot():
+    return _snapshot(
+        list(HeroSection.objects.all()),
+        CompanyInfo.objects.prefetch_related('social_media').first(),
+        Navbar.objects.first(),
+    )
+
+
+async def abuild_snapshot():
+    return _snapshot(
+        [hero async for hero in HeroSection.objects.all()],
+        await CompanyInfo.objects.prefetch_related('social_media').afirst(),
+        await Navbar.objects.afirst(),
+    )
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+async def aget_version():
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, time.time_ns(), None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Key was evicted; start from a fresh value so no stale snapshot matches.
+        cache.set(VERSION_KEY, time.time_ns(), None)
+    cache.set(CHANGED_AT_KEY, timezone.now(), None)
+    _local['version'] = None
+    _local['snapshot'] = None
+
+
+def get_changed_at():
+    """When the chrome last changed, for Last-Modified headers."""
+    changed_at = cache.get(CHANGED_AT_KEY)
+    if changed_at is None:
+        # Unknown (evicted or never bumped): assume now rather than risk a stale 304
+        cache.add(CHANGED_AT_KEY, timezone.now(), None)
+        changed_at = cache.get(CHANGED_AT_KEY)
+    return changed_at
+
+
+def _local_snapshot(version):
+    if _local['version'] == version and _local['snapshot'] is not None:
+        metrics.inc('rearm_cache_requests_total', cache='site_chrome', result='hit')
+        return _local['snapshot']
+    return None
+
+
+def _remember(version, snapshot, cached):
+    metrics.inc('rearm_cache_requests_total', cache='site_chrome',
+                result='hit' if cached else 'miss')
+    _local['version'] = version
+    _local['snapshot'] = snapshot
+    return snapshot
+
+
+def get_snapshot():
+    version = get_version()
+    snapshot = _local_snapshot(version)
+    if snapshot is not None:
+        return snapshot
+
+    key = SNAPSHOT_KEY.format(version=version)
+    snapshot = cache.get(key)
+    cached = snapshot is not None
+    if not cached:
+        snapshot = build_snapshot()
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    return _remember(version, snapshot, cached)
+
+
+async def aget_snapshot():
+    """get_snapshot() for async views: the cache and the ORM are awaited."""
+    version = await aget_version()
+    snapshot = _local_snapshot(version)
+    if snapshot is not None:
+        return snapshot
+
+    key = SNAPSHOT_KEY.format(version=version)
+    snapshot = await cache.aget(key)
+    cached = snapshot is not None
+    if not cached:
+        snapshot = await abuild_snapshot()
+        await cache.aset(key, snapshot, SNAPSHOT_TIMEOUT)
+    return _remember(version, snapshot, cached)
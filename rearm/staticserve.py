@@ -0,0 +1,49 @@
+# rearm/staticserve.py
+"""
+WhiteNoise middleware that can stay on the event loop.
+
+WhiteNoiseMiddleware is sync-only, and one sync middleware at the top of
+the stack makes Django run everything below it (async views included)
+through async_to_sync, a thread per request. This subclass is both: under
+WSGI it is WhiteNoise unchanged; under ASGI a static file is looked up the
+same way and its body read in a worker thread chunk by chunk, and anything
+else is awaited straight through.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+async def _read_chunks(file, block_size):
+    read = sync_to_async(file.read, thread_sensitive=False)
+    while chunk := await read(block_size):
+        yield chunk
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is None:
+            return await self.get_response(request)
+
+        response = self.serve(static_file, request)
+        if response.file_to_stream is not None:
+            # Django would otherwise read a sync body into memory whole
+            response.streaming_content = _read_chunks(response.file_to_stream, response.block_size)
+        return response
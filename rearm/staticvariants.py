@@ -0,0 +1,149 @@
+# rearm/staticvariants.py
+"""
+Modern-format copies of static images and fonts, built during collectstatic.
+
+BundledStaticFilesStorage saves, next to every PNG/JPEG under
+STATIC_VARIANT_DIRS, an .avif and a .webp copy (STATIC_IMAGE_FORMATS, as far
+as this Pillow can encode them), and next to every OTF/TTF a .woff2 subset
+to the characters the templates contain plus STATIC_FONT_UNICODES (for text
+that comes from the database, such as hero titles). A variant is kept only
+if it is smaller than its source. Variants are post-processed like any
+collected file, so they get a hashed name and an entry in the manifest.
+
+{% static_picture %} and {% font_face %} (rearm.templatetags.static_variants)
+offer the variants found in the manifest, best format first, with the
+original as the fallback. Without a manifest (DEBUG) they use the original.
+
+WOFF2 needs fontTools and brotli; without them fonts are left as they are.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.base import ContentFile
+from django.template import engines
+from django.templatetags.static import static
+from PIL import Image, features
+
+try:
+    from fontTools import subset as font_subset
+    from fontTools.ttLib import TTFont
+except ImportError:
+    font_subset = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+FONT_EXTENSIONS = ('.otf', '.ttf')
+
+# extension: (Pillow format, <source type>, save options)
+IMAGE_FORMATS = {
+    'avif': ('AVIF', 'image/avif', {'quality': 60}),
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 6}),
+}
+# extension: @font-face format()
+FONT_FORMATS = {'woff2': 'woff2', 'woff': 'woff', 'otf': 'opentype', 'ttf': 'truetype'}
+
+
+def variant_path(path, extension):
+    return f'{os.path.splitext(path)[0]}.{extension}'
+
+
+def image_formats():
+    return [extension for extension in getattr(settings, 'STATIC_IMAGE_FORMATS', [])
+            if features.check(IMAGE_FORMATS[extension][0].lower())]
+
+
+def woff2_available():
+    if font_subset is None:
+        return False
+    try:
+        import brotli  # noqa: F401  fontTools' WOFF2 writer needs it
+    except ImportError:
+        return False
+    return True
+
+
+# --- building ---------------------------------------------------------------
+
+def encode_image(data, extension):
+    pillow_format, _, options = IMAGE_FORMATS[extension]
+    with Image.open(BytesIO(data)) as image:
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        output = BytesIO()
+        image.save(output, pillow_format, **options)
+    return output.getvalue()
+
+
+def template_text():
+    """Every character in the project's template files."""
+    characters = set()
+    for directory in engines['django'].template_dirs:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith(('.html', '.txt')):
+                    with open(os.path.join(root, name), encoding='utf-8', errors='ignore') as f:
+                        characters.update(f.read())
+    return ''.join(sorted(characters))
+
+
+def subset_font(data, text):
+    """`data` (OTF/TTF) as WOFF2 with only the glyphs for `text` and STATIC_FONT_UNICODES."""
+    options = font_subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    font = TTFont(BytesIO(data))
+    subsetter = font_subset.Subsetter(options)
+    subsetter.populate(
+        text=text,
+        unicodes=font_subset.parse_unicodes(getattr(settings, 'STATIC_FONT_UNICODES', '')),
+    )
+    subsetter.subset(font)
+    output = BytesIO()
+    font_subset.save_font(font, output, options)
+    return output.getvalue()
+
+
+def build_variants(storage, paths):
+    """Save the variants of the collected files in `paths` and add them to it."""
+    directories = tuple(f'{directory.rstrip("/")}/' for directory in getattr(settings, 'STATIC_VARIANT_DIRS', []))
+    sources = [path for path in paths if path.startswith(directories)]
+    formats = image_formats()
+    fonts = woff2_available()
+    if not fonts and any(path.lower().endswith(FONT_EXTENSIONS) for path in sources):
+        logger.warning('fontTools/brotli not installed: static fonts are not converted to WOFF2')
+    text = template_text() if fonts else ''
+
+    for path in sources:
+        lower = path.lower()
+        if lower.endswith(IMAGE_EXTENSIONS):
+            extensions = formats
+        elif fonts and lower.endswith(FONT_EXTENSIONS):
+            extensions = ['woff2']
+        else:
+            continue
+        with storage.open(path) as f:
+            data = f.read()
+        for extension in extensions:
+            target = variant_path(path, extension)
+            content = subset_font(data, text) if extension == 'woff2' else encode_image(data, extension)
+            if len(content) >= len(data):
+                continue
+            if storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(content))
+            paths[target] = (storage, target)
+
+
+# --- rendering --------------------------------------------------------------
+
+def variant_urls(path, extensions):
+    """[(extension, url)] for the variants of `path` in the static manifest, in `extensions` order."""
+    manifest = getattr(staticfiles_storage, 'hashed_files', None)
+    if not manifest:
+        return []
+    return [(extension, static(variant_path(path, extension)))
+            for extension in extensions if variant_path(path, extension) in manifest]
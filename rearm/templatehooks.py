@@ -0,0 +1,85 @@
+# rearm/templatehooks.py
+"""
+Template rendering hooks shared by rearm.servertiming and rearm.preload.
+
+Django has no rendering signal outside its test runner, so both features
+need to wrap template methods. Patching the classes from each middleware's
+__init__ stacked the wrappers in whatever order the middleware happened to
+start; instead this module patches each method once, the first time a hook
+is registered for it, and the features register with it:
+
+  around_render(hook)  hook(render, template, context) wraps every
+                       django.template.base.Template.render, i.e. the
+                       page and each template it {% include %}s
+  around_bind(hook)    hook(bind_template, context, template) wraps
+                       RequestContext.bind_template (a context manager
+                       that runs the context processors)
+  after_page(hook)     hook(template, context, request) runs after the
+                       Django backend renders a template (render(),
+                       TemplateResponse, render_to_string()) with the
+                       view's context dict
+
+Hooks compose in registration order, the first registered nearest the
+original method; registering a hook again does nothing.
+"""
+import functools
+
+from django.template.backends import django as django_backend
+from django.template.base import Template
+from django.template.context import RequestContext
+
+_original_render = Template.render
+_original_bind = RequestContext.bind_template
+_original_page_render = django_backend.Template.render
+
+_render_hooks = []
+_bind_hooks = []
+_page_hooks = []
+
+# The hooked methods call these, rebuilt as hooks are added
+_render = _original_render
+_bind = _original_bind
+
+
+def _chain(original, hooks):
+    return functools.reduce(lambda inner, hook: functools.partial(hook, inner), hooks, original)
+
+
+@functools.wraps(_original_render)
+def _hooked_render(self, context):
+    return _render(self, context)
+
+
+@functools.wraps(_original_bind)
+def _hooked_bind(self, template):
+    return _bind(self, template)
+
+
+@functools.wraps(_original_page_render)
+def _hooked_page_render(self, context=None, request=None):
+    html = _original_page_render(self, context, request)
+    for hook in _page_hooks:
+        hook(self.template, context, request)
+    return html
+
+
+def around_render(hook):
+    global _render
+    if hook not in _render_hooks:
+        _render_hooks.append(hook)
+        _render = _chain(_original_render, _render_hooks)
+        Template.render = _hooked_render
+
+
+def around_bind(hook):
+    global _bind
+    if hook not in _bind_hooks:
+        _bind_hooks.append(hook)
+        _bind = _chain(_original_bind, _bind_hooks)
+        RequestContext.bind_template = _hooked_bind
+
+
+def after_page(hook):
+    if hook not in _page_hooks:
+        _page_hooks.append(hook)
+        django_backend.Template.render = _hooked_page_render
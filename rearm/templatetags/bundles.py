@@ -0,0 +1,29 @@
+# rearm/templatetags/bundles.py
+from django import template
+
+from rearm.bundles import bundle_tags
+from rearm.critical import critical_css_tags
+
+register = template.Library()
+
+
+@register.simple_tag
+def bundle(name):
+    """
+    Link a STATIC_BUNDLES bundle; the extension picks <link> or <script defer>.
+
+        {% bundle "core.css" %}
+        {% bundle "core.js" %}
+    """
+    return bundle_tags(name)
+
+
+@register.simple_tag
+def critical_css(page):
+    """
+    Inline a CRITICAL_CSS_PAGES page's critical CSS and load its bundles
+    without blocking rendering (see rearm.critical).
+
+        {% block stylesheets %}{% critical_css "home" %}{% endblock %}
+    """
+    return critical_css_tags(page)
@@ -0,0 +1,47 @@
+# rearm/templatetags/responsive_images.py
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from rearm.images import responsive_image as build_responsive_image
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes='100vw', widths=None, ratio=None, crop='fill', **attrs):
+    """
+    <img> with srcset/sizes and intrinsic width/height for an image field.
+
+        {% responsive_image product.image alt=product.name sizes="(min-width: 768px) 33vw, 100vw" %}
+        {% responsive_image member.image alt=member.name ratio="1:1" class="avatar" %}
+
+    Extra keyword arguments become attributes; loading="lazy" and
+    decoding="async" are the defaults.
+    """
+    img = build_responsive_image(image, widths=widths, ratio=ratio, crop=crop)
+    if img is None:
+        return ''
+
+    attributes = {'loading': 'lazy', 'decoding': 'async'}
+    attributes.update(attrs)
+    attributes.update(src=img.src, alt=alt)
+    if len(img.variants) > 1:
+        attributes.update(srcset=img.srcset, sizes=sizes)
+    if img.width and img.height:
+        attributes.update(width=img.width, height=img.height)
+    return format_html('<img{}>', flatatt(attributes))
+
+
+@register.filter
+def srcset(image, ratio=None):
+    """srcset value for custom markup: <source srcset="{{ post.featured_image|srcset }}">"""
+    img = build_responsive_image(image, ratio=ratio)
+    return img.srcset if img else ''
+
+
+@register.filter
+def resized(image, width):
+    """URL of the narrowest variant at least `width` px wide, e.g. for CSS backgrounds."""
+    img = build_responsive_image(image)
+    return img.url_for(int(width)) if img else ''
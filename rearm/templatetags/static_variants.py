@@ -0,0 +1,55 @@
+# rearm/templatetags/static_variants.py
+import os
+
+from django import template
+from django.forms.utils import flatatt
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from rearm.staticvariants import FONT_FORMATS, IMAGE_FORMATS, variant_urls
+
+register = template.Library()
+
+
+@register.simple_tag
+def static_picture(path, alt='', **attrs):
+    """
+    A static image as <picture>, offering its AVIF/WebP variants first.
+
+        {% static_picture "img/grunge.png" width=1280 height=85 %}
+
+    Extra keyword arguments become <img> attributes; loading="lazy" and
+    decoding="async" are the defaults. Without variants it is a plain <img>.
+    """
+    attributes = {'loading': 'lazy', 'decoding': 'async'}
+    attributes.update(attrs)
+    attributes.update(src=static(path), alt=alt)
+    img = format_html('<img{}>', flatatt(attributes))
+
+    sources = variant_urls(path, IMAGE_FORMATS)
+    if not sources:
+        return img
+    return format_html(
+        '<picture>{}{}</picture>',
+        format_html_join('', '<source type="{}" srcset="{}">',
+                         ((IMAGE_FORMATS[extension][1], url) for extension, url in sources)),
+        img,
+    )
+
+
+@register.simple_tag
+def font_face(family, path, weight='normal', style='normal', display='swap'):
+    """
+    An @font-face rule for a static font, WOFF2 variant first.
+
+        {% font_face "MonumentExtended" "font/MonumentExtended-Ultrabold.otf" %}
+    """
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    sources = [(variant, url) for variant, url in variant_urls(path, FONT_FORMATS) if variant != extension]
+    sources.append((extension, static(path)))
+    src = format_html_join(',', "url('{}') format('{}')",
+                           ((url, FONT_FORMATS[variant]) for variant, url in sources))
+    return format_html(
+        "<style>@font-face{{font-family:'{}';src:{};font-weight:{};font-style:{};font-display:{}}}</style>",
+        family, src, weight, style, display,
+    )
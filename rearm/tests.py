@@ -1,3 +1,1543 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import importlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import cloudinary
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from cloudinary import CloudinaryResource
+from PIL import Image as PILImage
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.contrib.staticfiles import finders
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import ImageField
+from django.db.models.fields.files import ImageFieldFile
+from django.template import Context, Template
+from django.templatetags.static import static
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+
+from blog.models import Category, NewsletterSubscriber, PartnershipRequest, Post
+from .models import (CompanyInfo, DemoBooking, HeroSection, Navbar, Product, ProductCategory, Service,
+                     SocialMedia)
+from .bundles import BundledStaticFilesStorage, minify_css, rebase_css_urls
+from .changelist import EstimatedCountPaginator
+from .critical import critical_css, fold_elements, load_critical_css
+from .management.commands.bench_servers import build_request, run_load
+from .export import _csv_cell, export_chunks
+from . import metrics, outbox, preload, servertiming, staticvariants, templatehooks, warmup
+from .images import responsive_image
+from core.database import POOL_SIZES, database_config, parse_connection_string, pool_stats
+from .outbox import drain, enqueue, pending_count
+from .pagecache import CSRF_PLACEHOLDER
+from .queryplan import full_table_scans, indexes_used
+from .querybudget import QueryRecorder, find_violations, query_budget
+from .search import fts5_query, search
+from .staticserve import AsyncWhiteNoiseMiddleware
+from .staticvariants import woff2_available
+from .site_chrome import get_snapshot, get_version
+from .uploads import final_name
+
+# Form/upload endpoints, not pages; their cost is one write.
+NON_PAGE_VIEWS = {'upload_media', 'subscribe_newsletter', 'submit_contact'}
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Static files as in DEBUG, whatever DEBUG is: the manifest storage
+# production uses needs collectstatic first
+PLAIN_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+class PublicPagesTestData:
+    """A few rows behind every public page."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = get_user_model().objects.create(username='author')
+        news = Category.objects.create(name='News')
+        # More rows than QUERY_BUDGET_REPEAT_THRESHOLD so per-row lookups show up
+        for i in range(8):
+            post = Post.objects.create(
+                title=f'Post {i}', author=author, content=f'<p>Harvest report {i}</p>',
+                is_published=True,
+            )
+            post.categories.add(news)
+
+        grain = ProductCategory.objects.create(name='Grain')
+        for i in range(8):
+            Product.objects.create(
+                name=f'Maize {i}', slug=f'maize-{i}', category=grain,
+                product_type='type1' if i % 2 else 'type2', description='Dried maize',
+                is_featured=i < 3,
+            )
+        Service.objects.create(title='Export', short_description='Export', content='Export',
+                               slug='export', is_featured=True)
+
+        company = CompanyInfo.objects.create(name='Rearm', address='Lagos',
+                                             phone_number_1='0800', email='info@example.com')
+        for platform in ('facebook', 'twitter', 'instagram', 'linkedin', 'youtube', 'facebook'):
+            SocialMedia.objects.create(company=company, platform=platform, url='https://example.com')
+        for page in ('home', 'services', 'products', 'about'):
+            HeroSection.objects.create(page=page, title=page, secondary_cta_text='More',
+                                       secondary_cta_link='services')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SiteChromeTests(TestCase):
+    """The chrome snapshot is reused until a navbar, hero or company row changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.navbar = Navbar.objects.create(site_name='Rearm', logo='navbar/logo.png')
+        cls.hero = HeroSection.objects.create(page='home', title='Grow more')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unchanged_chrome_costs_no_queries(self):
+        get_snapshot()
+        with self.assertNumQueries(0):
+            snapshot = get_snapshot()
+        self.assertEqual(snapshot.navbar.site_name, 'Rearm')
+        self.assertEqual(snapshot.hero_sections['home'].title, 'Grow more')
+
+    def test_saves_and_deletes_bump_the_version(self):
+        get_snapshot()
+        version = get_version()
+        self.navbar.site_name = 'Rearm Agro'
+        self.navbar.save()
+        self.assertNotEqual(get_version(), version)
+        self.assertEqual(get_snapshot().navbar.site_name, 'Rearm Agro')
+
+        self.hero.title = 'Harvest more'
+        self.hero.save()
+        self.assertEqual(get_snapshot().hero_sections['home'].title, 'Harvest more')
+
+        company = CompanyInfo.objects.create(name='Rearm', address='Lagos',
+                                             phone_number_1='0800', email='info@example.com')
+        SocialMedia.objects.create(company=company, platform='twitter', url='https://example.com')
+        self.assertEqual(len(get_snapshot().social_links), 1)
+        HeroSection.objects.filter(pk=self.hero.pk).get().delete()
+        self.assertEqual(get_snapshot().hero_sections, {})
+
+    def test_evicted_version_is_restarted(self):
+        get_snapshot()
+        cache.clear()
+        self.navbar.save()
+        self.assertEqual(get_snapshot().navbar.site_name, 'Rearm')
+
+
+@override_settings(CACHES=LOCMEM_CACHE, QUERY_BUDGET_ENABLED=False, PAGE_CACHE_ENABLED=False,
+                   STORAGES=PLAIN_STORAGES)
+class SearchTests(TestCase):
+    """The full-text index follows writes; results come best match first."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = get_user_model().objects.create(username='author')
+        cls.grain = ProductCategory.objects.create(name='Grain')
+
+    def post(self, title, content, is_published=True):
+        return Post.objects.create(title=title, author=self.author, content=content,
+                                   is_published=is_published)
+
+    def titles(self, text, queryset=None):
+        return [row.title for row in search(Post.objects.all() if queryset is None else queryset, text)]
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        post = self.post('Cassava prices', '<p>Tubers are up this week</p>')
+        self.assertEqual(self.titles('tubers'), ['Cassava prices'])
+
+        post.title = 'Yam prices'
+        post.content = '<p>Roots are down</p>'
+        post.save()
+        self.assertEqual(self.titles('tubers'), [])
+        self.assertEqual(self.titles('cassava'), [])
+        self.assertEqual(self.titles('roots'), ['Yam prices'])
+
+        post.delete()
+        self.assertEqual(self.titles('roots'), [])
+
+    def test_best_match_comes_first(self):
+        self.post('Weather', '<p>' + 'Rain and sun over the farms this season. ' * 20 + 'Maize too.</p>')
+        self.post('Maize harvest', '<p>Maize, maize and more maize.</p>')
+        self.assertEqual(self.titles('maize'), ['Maize harvest', 'Weather'])
+
+    def test_prefixes_match_and_syntax_is_ignored(self):
+        self.post('Fertiliser guide', '<p>Nitrogen for maize</p>')
+        self.assertEqual(self.titles('fertil'), ['Fertiliser guide'])
+        self.assertEqual(self.titles('nitrogen "maize ('), ['Fertiliser guide'])
+        self.assertEqual(fts5_query('a "b* c'), '"a"* "b"* "c"*')
+        self.assertEqual(self.titles('  '), [])
+
+    def test_products_and_services_are_searched(self):
+        Product.objects.create(name='Sorghum', slug='sorghum', category=self.grain,
+                               product_type='type1', description='Red grain')
+        Service.objects.create(title='Logistics', short_description='Haulage of grain',
+                               content='<p>Trucks</p>', slug='logistics')
+        self.assertEqual([p.name for p in search(Product.objects.all(), 'grain')], ['Sorghum'])
+        self.assertEqual([s.title for s in search(Service.objects.all(), 'grain')], ['Logistics'])
+
+    def test_search_page_lists_published_matches(self):
+        self.post('Harvest news', '<p>Good year</p>')
+        self.post('Harvest draft', '<p>Good year</p>', is_published=False)
+        response = self.client.get(reverse('search_json'), {'q': 'harvest'})
+        self.assertEqual([post['title'] for post in response.json()['posts']], ['Harvest news'])
+
+
+@override_settings(CACHES=LOCMEM_CACHE, QUERY_BUDGET_ENABLED=False, PAGE_CACHE_ENABLED=False,
+                   STORAGES=PLAIN_STORAGES)
+class PublicViewQueryBudgetTests(PublicPagesTestData, TestCase):
+    """Every public page stays within its QUERY_BUDGETS entry, with no N+1."""
+
+    def setUp(self):
+        get_snapshot()  # budgets assume warm site chrome
+
+    def get(self, name, *args, query=''):
+        response = self.client.get(reverse(name, args=args) + query)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_every_public_view_has_a_budget(self):
+        for urlconf in ('rearm.urls', 'blog.urls'):
+            for pattern in import_module(urlconf).urlpatterns:
+                if pattern.name not in NON_PAGE_VIEWS:
+                    self.assertIn(pattern.name, settings.QUERY_BUDGETS)
+                    self.assertTrue(hasattr(self, f'test_{pattern.name}'), f'No budget test for {pattern.name}')
+
+    @query_budget('home')
+    def test_home(self):
+        self.get('home')
+
+    @query_budget('services')
+    def test_services(self):
+        self.get('services')
+
+    @query_budget('book_demo')
+    def test_book_demo(self):
+        self.get('book_demo')
+
+    @query_budget('about')
+    def test_about(self):
+        self.get('about')
+
+    @query_budget('service_detail')
+    def test_service_detail(self):
+        self.get('service_detail', 'export')
+
+    @query_budget('product_list')
+    def test_product_list(self):
+        self.get('product_list')
+
+    @query_budget('product_detail')
+    def test_product_detail(self):
+        self.get('product_detail', 'maize-1')
+
+    @query_budget('search')
+    def test_search(self):
+        self.get('search', query='?q=maize')
+
+    @query_budget('search_json')
+    def test_search_json(self):
+        self.get('search_json', query='?q=harvest')
+
+    @query_budget('post_list')
+    def test_post_list(self):
+        self.get('post_list')
+
+    @query_budget('post_list_all')
+    def test_post_list_all(self):
+        self.get('post_list_all')
+
+    @query_budget('post_list_json')
+    def test_post_list_json(self):
+        self.get('post_list_json')
+
+    @query_budget('post_detail')
+    def test_post_detail(self):
+        self.get('post_detail', 'post-3')
+
+    @query_budget('category_posts')
+    def test_category_posts(self):
+        self.get('category_posts', 'news')
+
+
+# Small lookup tables read whole on every page; an index would not help.
+FULL_SCAN_ALLOWED = {
+    'blog_category', 'rearm_navbar', 'rearm_herosection', 'rearm_companyinfo', 'rearm_socialmedia',
+}
+
+# (URL name, args, query string) for every public page
+PUBLIC_PAGES = [
+    ('home', (), ''), ('services', (), ''), ('service_detail', ('export',), ''),
+    ('book_demo', (), ''), ('about', (), ''),
+    ('product_list', (), ''), ('product_detail', ('maize-1',), ''),
+    ('search', (), '?q=maize'), ('search_json', (), '?q=harvest'),
+    ('post_list', (), ''), ('post_list_all', (), ''), ('post_list_json', (), ''),
+    ('post_detail', ('post-3',), ''), ('category_posts', ('news',), ''),
+]
+
+
+@override_settings(CACHES=LOCMEM_CACHE, QUERY_BUDGET_ENABLED=False, PAGE_CACHE_ENABLED=False,
+                   STORAGES=PLAIN_STORAGES)
+class QueryPlanTests(PublicPagesTestData, TestCase):
+    """No public page query is planned as a full scan of a growing table."""
+
+    def test_public_pages_use_indexes(self):
+        for name, args, query in PUBLIC_PAGES:
+            cache.clear()
+            with self.subTest(page=name + query), CaptureQueriesContext(connection) as captured:
+                response = self.client.get(reverse(name, args=args) + query)
+                self.assertEqual(response.status_code, 200)
+            for entry in captured.captured_queries:
+                scans = set(full_table_scans(connection, entry['sql'])) - FULL_SCAN_ALLOWED
+                with self.subTest(page=name + query, sql=entry['sql']):
+                    self.assertFalse(scans, f'Full scan of {", ".join(sorted(scans))}')
+
+    def test_post_pages_use_the_published_index(self):
+        posts = Post.objects.published().order_by('-created_at', '-id')
+        cursor = posts[3]
+        for queryset in (posts[:10], posts.filter(created_at__lt=cursor.created_at)[:10]):
+            sql, params = queryset.query.sql_with_params()
+            with self.subTest(sql=sql):
+                self.assertIn('blog_post_published_idx', indexes_used(connection, sql, params))
+
+    def test_full_table_scans_reports_unindexed_filter(self):
+        sql, params = Product.objects.filter(description='Dried maize').query.sql_with_params()
+        self.assertIn('rearm_product', full_table_scans(connection, sql, params))
+
+
+@override_settings(CACHES=LOCMEM_CACHE, QUERY_BUDGET_ENABLED=False, PAGE_CACHE_ENABLED=True,
+                   STORAGES=PLAIN_STORAGES)
+class PageCacheTests(TestCase):
+    """Anonymous pages are served from cache until a model they show changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        grain = ProductCategory.objects.create(name='Grain')
+        cls.maize = Product.objects.create(name='Maize', slug='maize', category=grain,
+                                           product_type='type1', description='Dried maize')
+        cls.beans = Product.objects.create(name='Beans', slug='beans', category=grain,
+                                           product_type='type1', description='Beans')
+        cls.other = Product.objects.create(name='Cocoa', slug='cocoa', product_type='type2',
+                                           category=ProductCategory.objects.create(name='Cash crops'),
+                                           description='Cocoa')
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_second_request_is_a_hit(self):
+        self.assertEqual(self.get('/products/')['X-Page-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get('/products/')['X-Page-Cache'], 'hit')
+
+    def test_save_invalidates_dependent_pages(self):
+        self.get('/products/')
+        self.maize.description = 'Yellow maize'
+        self.maize.save()
+        response = self.get('/products/')
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Maize')
+
+    def test_detail_page_ignores_unrelated_products(self):
+        self.get('/product/maize/')
+        self.other.save()
+        self.assertEqual(self.get('/product/maize/')['X-Page-Cache'], 'hit')
+        self.beans.save()
+        self.assertEqual(self.get('/product/maize/')['X-Page-Cache'], 'miss')
+
+    def test_csrf_token_is_not_shared(self):
+        self.get('/')
+        token = 'a' * 32
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = token
+        response = self.get('/')
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, 'name="csrfmiddlewaretoken"')
+        self.assertNotContains(response, CSRF_PLACEHOLDER)
+
+    def test_sessions_bypass_the_cache(self):
+        self.get('/products/')
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'x'
+        self.assertNotIn('X-Page-Cache', self.get('/products/'))
+
+
+@override_settings(CACHES=LOCMEM_CACHE, QUERY_BUDGET_ENABLED=False, PAGE_CACHE_ENABLED=False,
+                   STORAGES=PLAIN_STORAGES)
+class ConditionalGetTests(TestCase):
+    """Detail pages answer revalidation with a 304 until the object, chrome or related rows change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.maize = Product.objects.create(name='Maize', slug='maize', product_type='type1',
+                                           category=ProductCategory.objects.create(name='Grain'),
+                                           description='Dried maize')
+        cls.post = Post.objects.create(title='Harvest', author=get_user_model().objects.create(username='a'),
+                                       content='<p>Harvest</p>', is_published=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unchanged_page_is_not_modified(self):
+        for url in ('/product/maize/', self.post.get_absolute_url()):
+            first = self.client.get(url)
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self):
+        first = self.client.get('/product/maize/')
+        response = self.client.get('/product/maize/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_object_change_invalidates(self):
+        first = self.client.get('/product/maize/')
+        self.maize.save()
+        response = self.client.get('/product/maize/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_site_chrome_change_invalidates(self):
+        first = self.client.get('/product/maize/')
+        HeroSection.objects.create(page='products', title='Products')
+        response = self.client.get('/product/maize/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_related_rows_invalidate(self):
+        product_page = self.client.get('/product/maize/')
+        post_page = self.client.get(self.post.get_absolute_url())
+        Product.objects.create(name='Sorghum', slug='sorghum', product_type='type1',
+                               category=self.maize.category, description='Red grain')
+        Post.objects.create(title='Planting', author=self.post.author, content='<p>Rain</p>', is_published=True)
+        for page, url in ((product_page, '/product/maize/'), (post_page, self.post.get_absolute_url())):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=page['ETag'])
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_last_modified_follows_related_rows(self):
+        with mock.patch('rearm.pagecache.time.time_ns', return_value=4_102_444_800 * 10 ** 9):
+            Category.objects.create(name='Markets')  # 2100-01-01
+        response = self.client.get(self.post.get_absolute_url())
+        self.assertEqual(response['Last-Modified'], 'Fri, 01 Jan 2100 00:00:00 GMT')
+
+
+@override_settings(STORAGES=PLAIN_STORAGES)
+class ResponsiveImageTests(TestCase):
+    """srcset variants: Cloudinary transformation URLs, or Pillow copies for ImageFields."""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.storage = FileSystemStorage(location=self.media, base_url='/media/')
+        buffer = BytesIO()
+        PILImage.new('RGB', (1000, 500), 'green').save(buffer, format='PNG')
+        self.storage.save('products/maize.png', ContentFile(buffer.getvalue()))
+        field = ImageField(storage=self.storage)
+        field.name = 'image'
+        self.local = ImageFieldFile(None, field, 'products/maize.png')
+
+    def test_cloudinary_variants(self):
+        with mock.patch.object(cloudinary.config(), 'cloud_name', 'demo'):
+            img = responsive_image(CloudinaryResource('products/maize'),
+                                   widths=[320, 640], ratio='4:3')
+        self.assertEqual([w for _, w in img.variants], [320, 640])
+        self.assertIn('w_320', img.variants[0][0])
+        self.assertIn('ar_4:3', img.src)
+        self.assertEqual((img.width, img.height), (640, 480))
+
+    def test_local_variants_are_generated_once(self):
+        img = responsive_image(self.local, widths=[320, 640, 1280])
+        self.assertEqual([w for _, w in img.variants], [320, 640, 1000])
+        self.assertEqual((img.width, img.height), (1000, 500))
+        with self.storage.open('responsive/320w/products/maize.png') as f, PILImage.open(f) as variant:
+            self.assertEqual(variant.size, (320, 160))
+        responsive_image(self.local, widths=[320, 640, 1280])
+        self.assertEqual(len(self.storage.listdir('responsive/320w/products')[1]), 1)
+
+    def test_tag(self):
+        html = Template(
+            '{% load responsive_images %}{% responsive_image image alt="Maize" ratio="1:1" widths="320" %}'
+        ).render(Context({'image': self.local}))
+        self.assertIn('srcset="/media/responsive/320x320-fill/products/maize.png 320w', html)
+        self.assertIn('width="500"', html)
+        self.assertIn('height="500"', html)
+        self.assertIn('loading="lazy"', html)
+
+    def test_empty_image(self):
+        html = Template('{% load responsive_images %}{% responsive_image image %}').render(Context({'image': None}))
+        self.assertEqual(html, '')
+
+
+@override_settings(STORAGES=PLAIN_STORAGES)
+class UploadMediaTests(TestCase):
+    """upload_media stores images once, under their hash, and enforces its limits."""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        overrides = self.settings(MEDIA_ROOT=media, MEDIA_URL='/media/')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def png(self, size=(3000, 100), name='field.png'):
+        buffer = BytesIO()
+        PILImage.new('RGB', size, 'green').save(buffer, format='PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def upload(self, file):
+        return self.client.post(reverse('upload_media'), {'file': file})
+
+    def location(self, response):
+        self.assertEqual(response.status_code, 200)
+        return response.json()['location'].removeprefix('/media/')
+
+    def test_original_is_served_and_converted_after_the_response(self):
+        request = RequestFactory().post(reverse('upload_media'), {'file': self.png()})
+        request._dont_enforce_csrf_checks = True
+        with mock.patch('rearm.views.optimize_upload') as optimize:
+            response = resolve(request.path).func(request)
+            self.assertEqual(response.status_code, 200)
+            name = json.loads(response.content)['location'].removeprefix('/media/')
+            optimize.assert_not_called()
+            response.close()  # the server closes the response once it is sent
+        self.assertRegex(name, r'^uploads/originals/[0-9a-f]{64}\.png$')
+        self.assertTrue(default_storage.exists(name))
+        optimize.assert_called_once_with(name, final_name(os.path.basename(name)[:-4]))
+
+    def test_upload_is_converted_to_webp(self):
+        original = self.location(self.upload(self.png()))
+        webp = self.location(self.upload(self.png()))
+        self.assertRegex(webp, r'^uploads/[0-9a-f]{2}/[0-9a-f]{64}\.webp$')
+        with default_storage.open(webp) as f, PILImage.open(f) as img:
+            self.assertEqual((img.format, img.size), ('WEBP', (2560, 85)))
+        self.assertTrue(default_storage.exists(original))  # may already be embedded somewhere
+
+    def test_jpeg_with_large_metadata_before_its_dimensions(self):
+        buffer = BytesIO()
+        PILImage.new('RGB', (800, 600), 'green').save(buffer, format='JPEG', icc_profile=os.urandom(100 * 1024))
+        jpeg = buffer.getvalue()
+        self.location(self.upload(SimpleUploadedFile('photo.jpg', jpeg, content_type='image/jpeg')))
+        name = self.location(self.upload(SimpleUploadedFile('photo.jpg', jpeg, content_type='image/jpeg')))
+        with default_storage.open(name) as f, PILImage.open(f) as img:
+            self.assertEqual((img.format, img.size), ('WEBP', (800, 600)))
+
+    def test_unconvertible_upload_is_served_as_uploaded(self):
+        with mock.patch('rearm.uploads.ImageOps.exif_transpose', side_effect=OSError('broken')), \
+                self.assertLogs('rearm.uploads', 'WARNING'):
+            first = self.location(self.upload(self.png()))
+            second = self.location(self.upload(self.png()))
+        self.assertRegex(first, r'^uploads/originals/[0-9a-f]{64}\.png$')
+        self.assertEqual(second, first)
+        self.assertTrue(default_storage.exists(first))
+
+    def test_duplicate_upload_is_stored_once(self):
+        first = self.location(self.upload(self.png(name='a.png')))
+        second = self.location(self.upload(self.png(name='b.png')))
+        self.assertNotEqual(first, second)
+        self.assertEqual(len(default_storage.listdir('uploads/originals')[1]), 1)
+        self.assertEqual(len(default_storage.listdir(os.path.dirname(second))[1]), 1)
+
+    def test_limits(self):
+        with self.settings(UPLOAD_MAX_PIXELS=1000):
+            self.assertEqual(self.upload(self.png()).status_code, 413)
+        with self.settings(UPLOAD_MAX_BYTES=100):
+            self.assertEqual(self.upload(self.png()).status_code, 413)
+        not_an_image = SimpleUploadedFile('notes.png', b'plain text', content_type='image/png')
+        self.assertEqual(self.upload(not_an_image).status_code, 400)
+
+    def test_csrf_is_checked(self):
+        client = Client(enforce_csrf_checks=True)
+        response = client.post(reverse('upload_media'), {'file': self.png()})
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(STORAGES=PLAIN_STORAGES)
+class LeadOutboxTests(TestCase):
+    """Lead forms only queue submissions; drain_lead_outbox inserts them in batches."""
+
+    def setUp(self):
+        outbox_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outbox_dir)
+        overrides = self.settings(LEAD_OUTBOX_PATH=os.path.join(outbox_dir, 'outbox.sqlite3'))
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def subscribe(self, email):
+        return self.client.post(reverse('subscribe_newsletter'), {'email': email},
+                                HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def test_forms_queue_without_touching_the_database(self):
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('book_demo'), {
+                'name': 'Ada', 'email': 'ada@example.com', 'phone': '0800',
+            })
+            self.subscribe('ada@example.com')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(pending_count(), 2)
+        self.assertFalse(DemoBooking.objects.exists())
+
+        call_command('drain_lead_outbox', stdout=StringIO())
+        booking = DemoBooking.objects.get()
+        self.assertEqual(booking.calendly_event_uri, response.url)
+        self.assertTrue(NewsletterSubscriber.objects.filter(email='ada@example.com').exists())
+        self.assertEqual(pending_count(), 0)
+
+    def test_newsletter_duplicates_are_dropped(self):
+        NewsletterSubscriber.objects.create(email='old@example.com')
+        for email in ('new@example.com', 'New@Example.com ', 'old@example.com'):
+            self.assertEqual(self.subscribe(email).status_code, 200)
+        self.assertEqual(self.subscribe('not an email').status_code, 400)
+
+        call_command('drain_lead_outbox', batch_size=2, stdout=StringIO())
+        self.assertEqual(sorted(NewsletterSubscriber.objects.values_list('email', flat=True)),
+                         ['new@example.com', 'old@example.com'])
+
+    def test_submission_time_is_kept(self):
+        self.client.post(reverse('submit_contact'), {
+            'name': 'Ada', 'email': 'ada@example.com', 'phone': '0800', 'business_name': 'Farm',
+            'business_type': 'Grain', 'interest': 'Export',
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        queued_at = timezone.now()
+        call_command('drain_lead_outbox', stdout=StringIO())
+        self.assertLess(PartnershipRequest.objects.get().submitted_at, queued_at)
+
+    def test_bad_rows_are_dead_lettered(self):
+        enqueue(DemoBooking, name='Ada', email='ada@example.com', phone='0800')
+        enqueue(DemoBooking, name=None, email='eve@example.com', phone='0800')  # NOT NULL
+        enqueue(DemoBooking, name='Old', email='old@example.com', phone='0800', fax='1')  # field since removed
+        enqueue(DemoBooking, name='Grace', email='grace@example.com', phone='0800')
+        out = StringIO()
+        with self.assertLogs('rearm.outbox', 'ERROR') as logs:
+            call_command('drain_lead_outbox', stdout=out)
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(sorted(DemoBooking.objects.values_list('name', flat=True)), ['Ada', 'Grace'])
+        self.assertEqual((pending_count(), outbox.dead_letter_count()), (0, 2))
+        self.assertIn('2 submissions could not be inserted', out.getvalue())
+
+        with self.assertLogs('rearm.outbox', 'ERROR'):
+            call_command('drain_lead_outbox', retry_dead_letters=True, stdout=out)
+        self.assertIn('2 dead letters queued again', out.getvalue())
+        self.assertEqual(DemoBooking.objects.count(), 2)
+        self.assertEqual((pending_count(), outbox.dead_letter_count()), (0, 2))
+
+    def test_database_errors_leave_the_batch_queued(self):
+        enqueue(DemoBooking, name='Ada', email='ada@example.com', phone='0800')
+        with mock.patch.object(DemoBooking.objects, 'bulk_create', side_effect=OperationalError('gone')):
+            with self.assertRaises(OperationalError):
+                drain(10)
+        self.assertEqual((pending_count(), outbox.dead_letter_count()), (1, 0))
+        drain(10)
+        self.assertEqual(DemoBooking.objects.get().name, 'Ada')
+
+
+class LeadOutboxDrainerTests(TransactionTestCase):
+    """The web processes drain the outbox themselves: nothing else runs on their host."""
+
+    def setUp(self):
+        outbox_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outbox_dir)
+        overrides = self.settings(LEAD_OUTBOX_PATH=os.path.join(outbox_dir, 'outbox.sqlite3'),
+                                  LEAD_OUTBOX_DRAIN_INTERVAL=0.05)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def wait_until_drained(self):
+        # Poll the outbox file, not the test database: in-memory SQLite
+        # locks the table while the drainer thread writes to it
+        for _ in range(100):
+            if not pending_count():
+                return
+            time.sleep(0.05)
+        self.fail('The outbox was not drained')
+
+    def test_gunicorn_workers_drain_the_outbox(self):
+        gunicorn_config = import_module('core.gunicorn_config')
+        worker = mock.Mock(pid=os.getpid())
+        with mock.patch.object(warmup, 'warm', return_value={}):
+            gunicorn_config.post_worker_init(worker)
+        self.addCleanup(outbox.stop_drainer)
+
+        enqueue(DemoBooking, name='Ada', email='ada@example.com', phone='0800')
+        self.wait_until_drained()
+        self.assertEqual(DemoBooking.objects.get().name, 'Ada')
+
+        # What is still queued when the worker exits is drained on the way out
+        outbox._drainer['stop'].set()
+        outbox._drainer['thread'].join()
+        enqueue(DemoBooking, name='Grace', email='grace@example.com', phone='0800')
+        gunicorn_config.worker_exit(None, worker)
+        self.assertEqual(DemoBooking.objects.count(), 2)
+        self.assertEqual(pending_count(), 0)
+        self.assertIsNone(outbox._drainer['thread'])
+
+    def test_wsgi_and_asgi_processes_drain_the_outbox(self):
+        self.addCleanup(outbox.stop_drainer)
+        app = mock.Mock(return_value=[b'ok'])
+        self.assertEqual(outbox.DrainerWSGI(app)({}, None), [b'ok'])
+        thread = outbox._drainer['thread']
+        self.assertTrue(thread.is_alive())
+
+        async def asgi_app(scope, receive, send):
+            pass
+        async_to_sync(outbox.DrainerASGI(asgi_app))({'type': 'http'}, None, None)
+        self.assertIs(outbox._drainer['thread'], thread)  # one drainer per process
+
+        enqueue(DemoBooking, name='Ada', email='ada@example.com', phone='0800')
+        self.wait_until_drained()
+        self.assertEqual(DemoBooking.objects.get().name, 'Ada')
+
+    def test_one_process_drains_a_batch_at_a_time(self):
+        for i in range(50):
+            enqueue(DemoBooking, name=f'Lead {i}', email='lead@example.com', phone='0800')
+        threads = [threading.Thread(target=drain, args=(5,)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(DemoBooking.objects.count(), 50)
+
+
+@override_settings(STORAGES=PLAIN_STORAGES)
+class ExportTests(TestCase):
+    """Lead tables export as streamed CSV/JSONL, from the admin or a command."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pw')
+        for i in range(3):
+            DemoBooking.objects.create(name=f'Ada {i}', email=f'ada{i}@example.com', phone='0800')
+        DemoBooking.objects.create(name='=HYPERLINK("x")', email='eve@example.com', phone='+234 801 234 5678')
+
+    def test_admin_action_streams_csv(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('admin:rearm_demobooking_changelist'), {
+            'action': 'export_csv',
+            '_selected_action': DemoBooking.objects.values_list('pk', flat=True)[:2],
+        })
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,name,email,phone,submitted_at,calendly_event_uri')
+        self.assertEqual(len(lines), 3)
+
+    async def test_admin_action_streams_chunk_by_chunk_under_asgi(self):
+        await self.async_client.aforce_login(self.admin)
+        with mock.patch('rearm.export.BUFFER_SIZE', 1):
+            response = await self.async_client.post(reverse('admin:rearm_demobooking_changelist'), {
+                'action': 'export_csv',
+                '_selected_action': [pk async for pk in DemoBooking.objects.values_list('pk', flat=True)],
+            })
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 5)  # header and one per row
+        self.assertEqual(chunks[0].decode().strip(), 'id,name,email,phone,submitted_at,calendly_event_uri')
+
+    def test_command_writes_gzipped_jsonl(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'bookings.jsonl.gz')
+        call_command('export_leads', 'rearm.demobooking', format='jsonl', gzip=True,
+                     output=path, chunk_size=2, stdout=StringIO())
+        with gzip.open(path, 'rt') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual([row['email'] for row in rows][:2], ['ada0@example.com', 'ada1@example.com'])
+        self.assertEqual(len(rows), 4)
+
+    def test_export_actions_need_the_view_permission(self):
+        user = get_user_model().objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+        user.user_permissions.add(Permission.objects.get(codename='add_demobooking'))
+        model_admin = admin.site._registry[DemoBooking]
+        request = RequestFactory().get('/')
+        request.user = user
+        self.assertNotIn('export_csv', model_admin.get_actions(request))
+
+        user.user_permissions.add(Permission.objects.get(codename='view_demobooking'))
+        request.user = get_user_model().objects.get(pk=user.pk)  # fresh permission cache
+        self.assertIn('export_csv', model_admin.get_actions(request))
+        self.assertNotIn('export_csv', model_admin.get_actions(RequestFactory().get('/', {'_popup': 1})))
+
+    def test_csv_formulas_are_neutralized(self):
+        queryset = DemoBooking.objects.filter(email='eve@example.com')
+        content = b''.join(export_chunks(queryset, ('name', 'phone'))).decode()
+        self.assertIn('"\'=HYPERLINK(""x"")",+234 801 234 5678', content)
+        self.assertEqual([_csv_cell(value) for value in ('-12.5', '+1', '-2+3', '@SUM(A1)', '\t=1', '\r1')],
+                         ['-12.5', '+1', "'-2+3", "'@SUM(A1)", "'\t=1", "'\r1"])
+
+
+@override_settings(STORAGES=PLAIN_STORAGES)
+class AdminChangeListTests(TestCase):
+    """Changelists cost a fixed number of queries and skip COUNT(*) on big tables."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pw')
+        for name in ('Grain', 'Cash crops', 'Tubers'):
+            category = ProductCategory.objects.create(name=name)
+            for i in range(3):
+                Product.objects.create(name=f'{name} {i}', slug=f'{category.slug}-{i}',
+                                       category=category, product_type='type1', description='-')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_product_counts_are_annotated(self):
+        url = reverse('admin:rearm_productcategory_changelist')
+        self.client.get(url)  # warm the session/permission caches
+        with QueryRecorder() as recorder:
+            response = self.client.get(url)
+        self.assertContains(response, '<td class="field-product_count">3</td>', count=3, html=True)
+        self.assertEqual(find_violations(recorder, None, budget=8), [])
+
+    def test_large_tables_use_the_estimate(self):
+        queryset = NewsletterSubscriber.objects.order_by('pk')
+        with mock.patch('rearm.changelist.table_estimate', return_value=5_000_000):
+            self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 5_000_000)
+            with mock.patch('rearm.changelist.query_estimate', return_value=1234):
+                filtered = queryset.filter(email__startswith='a')
+                self.assertEqual(EstimatedCountPaginator(filtered, 100).count, 1234)
+        with mock.patch('rearm.changelist.table_estimate', return_value=10):
+            self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, QUERY_BUDGET_ENABLED=False, STORAGES=PLAIN_STORAGES)
+class ScaleCommandTests(TestCase):
+    """seed_scale fills every model; bench_views reports every page."""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        overrides = self.settings(MEDIA_ROOT=media, MEDIA_URL='/media/')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def seed(self):
+        call_command('seed_scale', posts=6, products=5, subscribers=7, leads=3, seed=1, stdout=StringIO())
+
+    def test_seed_scale_creates_rows(self):
+        self.seed()
+        self.assertEqual(Post.objects.count(), 6)
+        self.assertEqual(Product.objects.count(), 5)
+        self.assertEqual(NewsletterSubscriber.objects.count(), 7)
+        self.assertEqual(DemoBooking.objects.count(), 3)
+        self.assertEqual(PartnershipRequest.objects.count(), 3)
+        self.assertTrue(Post.objects.exclude(plain_text='').exists())
+        self.assertTrue(default_storage.exists('seed/placeholder-0.jpg'))
+        # a second run adds rows instead of colliding on unique slugs
+        call_command('seed_scale', posts=2, products=2, subscribers=0, leads=0, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 8)
+
+    def test_bench_views_writes_json(self):
+        self.seed()
+        path = os.path.join(settings.MEDIA_ROOT, 'bench.json')
+        with mock.patch.object(cloudinary.config(), 'cloud_name', 'demo'):
+            call_command('bench_views', requests=3, warmup=0, urls=['home', 'post_detail'],
+                         json=path, stdout=StringIO())
+        with open(path) as f:
+            report = json.load(f)
+        self.assertEqual(sorted(report['urls']), ['home', 'post_detail'])
+        home = report['urls']['home']
+        self.assertEqual(home['status'], 200)
+        self.assertLessEqual(home['p50_ms'], home['p99_ms'])
+        self.assertGreater(home['bytes'], 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, QUERY_BUDGET_ENABLED=False, PAGE_CACHE_ENABLED=False,
+                   SERVER_TIMING_ENABLED=True, SERVER_TIMING_SAMPLE_RATE=1.0,
+                   STORAGES=PLAIN_STORAGES)
+class ServerTimingTests(TestCase):
+    """Sampled requests carry a Server-Timing breakdown and log it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        HeroSection.objects.create(page='home', title='Home')
+
+    def test_header_and_log_line(self):
+        with self.assertLogs('rearm.servertiming', 'INFO') as logs:
+            response = self.client.get(reverse('about'))
+        header = response['Server-Timing']
+        for metric in ('db;dur=', 'ctx;dur=', 'tpl;dur=', 'tpl-navbar;dur=', 'tpl-footer;dur=', 'total;dur='):
+            self.assertIn(metric, header)
+        self.assertIn('desc="includes/navbar.html"', header)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'about')
+        self.assertEqual(record['status'], 200)
+        self.assertIn('tpl-navbar', record['timings_ms'])
+
+    @override_settings(PRELOAD_ENABLED=True, STATIC_BUNDLES_ENABLED=True)
+    def test_shares_one_render_hook_with_preload(self):
+        preload.clear()
+        self.addCleanup(preload.clear)
+        for _ in range(2):  # each test client loads the middleware again
+            response = Client().get(reverse('about'))
+            self.assertIn('tpl-navbar;dur=', response['Server-Timing'])
+            self.assertIn('rel=preload', response['Link'])
+        self.assertIs(Template.render, templatehooks._hooked_render)
+        self.assertEqual(templatehooks._render_hooks, [servertiming._timed_render])
+        self.assertEqual(templatehooks._page_hooks, [preload._record_page])
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_untouched(self):
+        response = self.client.get(reverse('about'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+@override_settings(CACHES=LOCMEM_CACHE, QUERY_BUDGET_ENABLED=False, PAGE_CACHE_ENABLED=True,
+                   METRICS_ENABLED=True, METRICS_TOKEN='', STORAGES=PLAIN_STORAGES)
+class MetricsTests(TestCase):
+    """/metrics sums every worker's file and serves the text format."""
+
+    @classmethod
+    def setUpTestData(cls):
+        HeroSection.objects.create(page='home', title='Home')
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        overrides = self.settings(METRICS_DIR=directory)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(metrics.clear)
+        self.directory = directory
+
+    def scrape(self, **headers):
+        response = self.client.get('/metrics', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return response.content.decode()
+
+    def test_request_metrics(self):
+        self.client.get(reverse('about'))
+        self.client.get(reverse('about'))
+        body = self.scrape()
+        self.assertIn('rearm_http_responses_total{status="200",view="about"} 2', body)
+        self.assertIn('rearm_http_request_duration_seconds_count{view="about"} 2', body)
+        self.assertIn('rearm_http_request_duration_seconds_bucket{view="about",le="+Inf"} 2', body)
+        self.assertIn('rearm_db_queries_per_request_count{view="about"} 2', body)
+        self.assertIn('rearm_cache_requests_total{cache="page",result="hit"} 1', body)
+        self.assertIn('rearm_cache_requests_total{cache="page",result="miss"} 1', body)
+
+    def test_values_from_other_processes_are_summed(self):
+        metrics.inc('rearm_form_submissions_total', form='demobooking')
+        other = metrics.MmapStore(os.path.join(self.directory, 'metrics_999999.db'))
+        self.addCleanup(other.close)
+        other.add(metrics._key('rearm_form_submissions_total', labels={'form': 'demobooking'}), 2)
+        self.assertIn('rearm_form_submissions_total{form="demobooking"} 3', self.scrape())
+
+    def test_exited_processes_are_folded_into_one_file(self):
+        key = metrics._key('rearm_form_submissions_total', labels={'form': 'demobooking'})
+        gunicorn_config = import_module('core.gunicorn_config')
+        for pid, count in ((999997, 2), (999998, 3)):
+            store = metrics.MmapStore(os.path.join(self.directory, f'metrics_{pid}.db'))
+            store.add(key, count)
+            store.close()
+            gunicorn_config.child_exit(None, mock.Mock(pid=pid))
+        metrics.mark_process_dead(999999)  # never recorded anything
+        metrics.inc('rearm_form_submissions_total', form='demobooking')
+
+        self.assertIn('rearm_form_submissions_total{form="demobooking"} 6', self.scrape())
+        self.assertEqual(sorted(name for name in os.listdir(self.directory) if name.endswith('.db')),
+                         sorted([metrics.AGGREGATE_FILE, f'metrics_{os.getpid()}.db']))
+
+    def test_store_grows_past_initial_size(self):
+        for i in range(3000):
+            metrics.inc('rearm_http_responses_total', view=f'view-{i}', status=200)
+        body = self.scrape()
+        self.assertIn('rearm_http_responses_total{status="200",view="view-2999"} 1', body)
+
+    def test_token_and_disabled(self):
+        with self.settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            self.scrape(HTTP_AUTHORIZATION='Bearer secret')
+        with self.settings(METRICS_ENABLED=False):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+    def test_pool_counters(self):
+        pool = mock.Mock(pop_stats=mock.Mock(return_value={
+            'pool_size': 4, 'requests_num': 3, 'requests_queued': 1, 'requests_wait_ms': 250,
+        }))
+        with mock.patch.dict(connection.settings_dict['OPTIONS'], {'pool': True}), \
+                mock.patch.object(connection, 'pool', pool, create=True):
+            metrics.record_pool_stats()
+        body = self.scrape()
+        self.assertIn('rearm_db_pool_events_total{database="default",event="requests_num"} 3', body)
+        self.assertIn('rearm_db_pool_events_total{database="default",event="requests_queued"} 1', body)
+        self.assertIn('rearm_db_pool_wait_seconds_total{database="default"} 0.25', body)
+        self.assertNotIn('event="pool_size"', body)
+
+
+BUNDLE_SOURCES = {
+    'css/a.css': '/* a */\n.a ,  .b > p {\n  color : red;\n  content: "x  /* y */";\n}\n',
+    'pkg/css/b.css': '.b { background: url("../img/b.png") }\n' + '.c { color: blue }\n' * 50,
+    'pkg/img/b.png': 'png',
+    'js/a.js': '// a\nfunction a() {\n    return 1\n}\n',
+}
+
+
+@override_settings(STATIC_BUNDLES={'site.css': ['css/a.css', 'pkg/css/b.css'], 'site.js': ['js/a.js']},
+                   STORAGES=PLAIN_STORAGES)
+class StaticBundleTests(TestCase):
+    """collectstatic builds hashed, minified bundles; {% bundle %} links them."""
+
+    def test_minify_css_keeps_strings(self):
+        self.assertEqual(minify_css(BUNDLE_SOURCES['css/a.css']), '.a,.b>p{color :red;content:"x  /* y */"}')
+
+    def test_rebase_css_urls(self):
+        css = rebase_css_urls(BUNDLE_SOURCES['pkg/css/b.css'], 'pkg/css/b.css', 'bundles/site.css')
+        self.assertIn('url("../pkg/img/b.png")', css)
+        self.assertIn('url(/x.png)', rebase_css_urls('a{background:url(/x.png)}', 'pkg/css/b.css', 'bundles/site.css'))
+
+    def test_post_process_builds_hashed_bundles(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        storage = BundledStaticFilesStorage(location=root, base_url='/static/')
+        for path, content in BUNDLE_SOURCES.items():
+            storage.save(path, ContentFile(content.encode()))
+        paths = {path: (storage, path) for path in BUNDLE_SOURCES}
+        list(storage.post_process(paths))
+
+        css_name = storage.stored_name('bundles/site.css')
+        self.assertRegex(css_name, r'^bundles/site\.[0-9a-f]{12}\.css$')
+        with storage.open(css_name) as f:
+            css = f.read().decode()
+        self.assertTrue(css.startswith('.a,.b>p{'))
+        self.assertRegex(css, r'url\("\.\./pkg/img/b\.[0-9a-f]{12}\.png"\)')
+        self.assertTrue(storage.exists(css_name + '.gz'))
+        with storage.open(storage.stored_name('bundles/site.js')) as f:
+            self.assertEqual(f.read().decode(), 'function a() {\nreturn 1\n}')
+
+    def test_tag_links_bundle_or_sources(self):
+        template = Template('{% load bundles %}{% bundle "site.css" %}{% bundle "site.js" %}')
+        with self.settings(STATIC_BUNDLES_ENABLED=True):
+            self.assertEqual(template.render(Context()),
+                             '<link rel="stylesheet" href="/static/bundles/site.css">'
+                             '<script src="/static/bundles/site.js" defer></script>')
+        with self.settings(STATIC_BUNDLES_ENABLED=False):
+            html = template.render(Context())
+        self.assertIn('href="/static/css/a.css"', html)
+        self.assertIn('href="/static/pkg/css/b.css"', html)
+        self.assertIn('<script src="/static/js/a.js" defer></script>', html)
+
+    def test_templates_only_reference_existing_static_files(self):
+        # The manifest storage raises for a missing file on every render
+        missing = []
+        for directory in ('templates', 'rearm/templates', 'blog/templates'):
+            for root, _, names in os.walk(os.path.join(settings.BASE_DIR, directory)):
+                for name in names:
+                    with open(os.path.join(root, name)) as f:
+                        paths = re.findall(r"""{% static ['"]([^'"]+)['"]""", f.read())
+                    missing += [(name, path) for path in paths if finders.find(path) is None]
+        self.assertEqual(missing, [])
+
+
+@override_settings(STORAGES=PLAIN_STORAGES)
+class StaticVariantTests(TestCase):
+    """collectstatic adds WebP/AVIF/WOFF2 variants; the tags offer them before the original."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        storages = dict(settings.STORAGES, staticfiles={
+            'BACKEND': 'rearm.bundles.BundledStaticFilesStorage',
+            'OPTIONS': {'location': self.root, 'base_url': '/static/'},
+        })
+        self.overrides = self.settings(STORAGES=storages, STATIC_BUNDLES={}, STATIC_IMAGE_FORMATS=['webp'])
+        self.overrides.enable()
+        self.addCleanup(self.overrides.disable)
+
+    def collect(self, sources):
+        storage = BundledStaticFilesStorage(location=self.root, base_url='/static/')
+        for path, content in sources.items():
+            storage.save(path, ContentFile(content))
+        list(storage.post_process({path: (storage, path) for path in sources}))
+        storage.save_manifest()
+        return storage
+
+    def png(self, size, noise=True):
+        output = BytesIO()
+        image = PILImage.effect_noise(size, 64).convert('RGBA') if noise else PILImage.new('1', size)
+        image.save(output, 'PNG', optimize=True)
+        return output.getvalue()
+
+    def test_post_process_adds_hashed_webp(self):
+        storage = self.collect({'img/grunge.png': self.png((200, 40)), 'css/a.png': self.png((200, 40))})
+        self.assertRegex(storage.stored_name('img/grunge.webp'), r'^img/grunge\.[0-9a-f]{12}\.webp$')
+        self.assertFalse(storage.exists('css/a.webp'))  # outside STATIC_VARIANT_DIRS
+
+    def test_variant_larger_than_source_is_dropped(self):
+        # A flat 1-bit PNG beats lossy WebP
+        storage = self.collect({'img/flat.png': self.png((256, 256), noise=False)})
+        self.assertNotIn('img/flat.webp', storage.hashed_files)
+
+    def test_picture_offers_variants_from_manifest(self):
+        self.collect({'img/grunge.png': self.png((200, 40))})
+        html = Template('{% load static_variants %}{% static_picture "img/grunge.png" width=200 %}').render(Context())
+        self.assertRegex(html, r'^<picture><source type="image/webp" srcset="/static/img/grunge\.[0-9a-f]{12}\.webp">'
+                               r'<img alt="" decoding="async" loading="lazy" src="/static/img/grunge\.[0-9a-f]{12}\.png" '
+                               r'width="200"></picture>$')
+
+    def test_without_manifest_tags_use_the_original(self):
+        with self.settings(STORAGES=dict(settings.STORAGES, staticfiles={
+                'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'})):
+            html = Template('{% load static_variants %}{% static_picture "img/grunge.png" %}'
+                            '{% font_face "Monument" "font/m.otf" weight="800" %}').render(Context())
+        self.assertEqual(html, '<img alt="" decoding="async" loading="lazy" src="/static/img/grunge.png">'
+                               "<style>@font-face{font-family:'Monument';src:url('/static/font/m.otf') "
+                               "format('opentype');font-weight:800;font-style:normal;font-display:swap}</style>")
+
+    def test_fonts_are_subset_to_the_template_text(self):
+        # Runs without fontTools: the subsetter is replaced, template_text() is not
+        with mock.patch.object(staticvariants, 'woff2_available', return_value=True), \
+                mock.patch.object(staticvariants, 'subset_font', return_value=b'wOF2') as subset_font:
+            storage = self.collect({'font/m.otf': b'OTTO' + b'\0' * 64})
+        data, text = subset_font.call_args.args
+        self.assertEqual(data, b'OTTO' + b'\0' * 64)
+        self.assertIn('{', text)  # from the project's templates
+        self.assertRegex(storage.stored_name('font/m.woff2'), r'^font/m\.[0-9a-f]{12}\.woff2$')
+
+    @skipUnless(woff2_available(), 'WOFF2 needs fontTools and brotli')
+    def test_fonts_get_woff2_subset(self):
+        with open(os.path.join(settings.BASE_DIR, 'static', 'font', 'MonumentExtended-Ultrabold.otf'), 'rb') as f:
+            self.collect({'font/m.otf': f.read()})
+        html = Template('{% load static_variants %}{% font_face "M" "font/m.otf" %}').render(Context())
+        self.assertRegex(html, r"src:url\('/static/font/m\.[0-9a-f]{12}\.woff2'\) format\('woff2'\),"
+                               r"url\('/static/font/m\.[0-9a-f]{12}\.otf'\) format\('opentype'\)")
+
+
+FOLD_PAGE = """<html><head><style>.x{}</style></head><body>
+<nav class="navbar"><a class="logo" href="/">R</a></nav>
+<main class="about-main">
+  <section class="hero-section"><h1 class="hero-title">Rearm</h1><img src="a.png"></section>
+  <section class="intro"><p class="lead">First block</p></section>
+  <section class="team"><div class="member">Below the fold</div></section>
+</main>
+<script>document.write('<div class="injected"></div>')</script>
+</body></html>"""
+
+FOLD_CSS = """
+body { margin: 0 }
+.navbar a.logo:hover { color: red }
+.hero-section > h1, .unused { font-size: 3rem; animation: rise 1s }
+.intro .lead[data-x] { color: gray }
+.team .member { color: blue }
+@media (max-width: 600px) { .hero-title { font-size: 2rem } .member { display: none } }
+@media print { .member { display: none } }
+@keyframes rise { from { opacity: 0 } }
+@keyframes spin { to { transform: rotate(1turn) } }
+@font-face { font-family: Monument; src: url("../font/m.otf") }
+"""
+
+
+@override_settings(CACHES=LOCMEM_CACHE, QUERY_BUDGET_ENABLED=False, PAGE_CACHE_ENABLED=False,
+                   STORAGES=PLAIN_STORAGES)
+class CriticalCssTests(PublicPagesTestData, TestCase):
+    """Above-the-fold CSS is extracted per page type, inlined, and the bundles load async."""
+
+    def setUp(self):
+        load_critical_css.cache_clear()
+        self.addCleanup(load_critical_css.cache_clear)
+
+    def test_fold_ends_after_first_block_following_the_hero(self):
+        classes = set().union(*(element[1] for element in fold_elements(FOLD_PAGE)))
+        self.assertTrue({'navbar', 'logo', 'hero-section', 'hero-title', 'intro', 'lead'} <= classes)
+        self.assertNotIn('member', classes)
+        self.assertNotIn('injected', classes)
+
+    def test_critical_css_keeps_fold_rules_only(self):
+        css = critical_css(FOLD_CSS, fold_elements(FOLD_PAGE))
+        self.assertIn('body{margin:0}', css)
+        self.assertIn('.navbar a.logo:hover{color:red}', css)
+        self.assertIn('.hero-section>h1,.unused{', css)
+        self.assertIn('.intro .lead[data-x]{color:gray}', css)
+        self.assertIn('@media (max-width:600px){.hero-title{font-size:2rem}}', css)
+        self.assertIn('@keyframes rise', css)
+        self.assertIn('@font-face', css)
+        self.assertNotIn('.member', css)
+        self.assertNotIn('@media print', css)
+        self.assertNotIn('spin', css)
+
+    def test_tag_inlines_critical_css_and_preloads_bundles(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        os.makedirs(os.path.join(root, 'critical'))
+        with open(os.path.join(root, 'critical', 'page.css'), 'w') as f:
+            f.write("@font-face{src:url('../font/m.otf')}.hero{color:red}")
+        overrides = self.settings(STATICFILES_DIRS=[root], CRITICAL_CSS_PAGES={'page': ('home', ['core.css'])})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        template = Template('{% load bundles %}{% critical_css "page" %}')
+        with self.settings(STATIC_BUNDLES_ENABLED=True):
+            html = template.render(Context())
+        self.assertIn("<style>@font-face{src:url('/static/font/m.otf')}.hero{color:red}</style>", html)
+        self.assertIn('<link rel="preload" href="/static/bundles/core.css" as="style" '
+                      'onload="this.onload=null;this.rel=\'stylesheet\'">', html)
+        self.assertIn('<noscript><link rel="stylesheet" href="/static/bundles/core.css"></noscript>', html)
+
+        with self.settings(STATIC_BUNDLES_ENABLED=False):
+            html = template.render(Context())
+        self.assertNotIn('<style>', html)
+        self.assertIn('<link rel="stylesheet" href="/static/css/navbar.css">', html)
+
+    def test_pages_without_critical_file_link_bundles(self):
+        with self.settings(STATIC_BUNDLES_ENABLED=True, CRITICAL_CSS_PAGES={'missing': ('home', ['core.css'])}):
+            html = Template('{% load bundles %}{% critical_css "missing" %}').render(Context())
+        self.assertEqual(html, '<link rel="stylesheet" href="/static/bundles/core.css">')
+
+    def test_command_writes_critical_css(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        call_command('build_critical_css', 'home', output_dir=root, stdout=StringIO())
+        with open(os.path.join(root, 'critical', 'home.css')) as f:
+            css = f.read()
+        self.assertIn('.navbar{', css)
+        self.assertIn('.hero-title{', css)
+        self.assertFalse(os.path.exists(os.path.join(root, 'critical', 'about.css')))
+
+
+@override_settings(CACHES=LOCMEM_CACHE, QUERY_BUDGET_ENABLED=False, PAGE_CACHE_ENABLED=True,
+                   STATIC_BUNDLES_ENABLED=True, PRELOAD_ENABLED=True, STORAGES=PLAIN_STORAGES)
+class PreloadTests(PublicPagesTestData, TestCase):
+    """Pages send Link: rel=preload for their bundles, fonts and first images; ASGI sends 103s."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        HeroSection.objects.filter(page='home').update(background_image='hero/fields')
+        Product.objects.update(image='products/maize')
+
+    def setUp(self):
+        preload.clear()
+        self.addCleanup(preload.clear)
+        patcher = mock.patch.object(cloudinary.config(), 'cloud_name', 'demo')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Under DEBUG the fields are ImageFields: give them files wide enough for variants
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        overrides = self.settings(MEDIA_ROOT=media_root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        for name in ('hero/fields', 'products/maize'):
+            os.makedirs(os.path.join(media_root, os.path.dirname(name)), exist_ok=True)
+            PILImage.new('RGB', (2000, 1000), 'green').save(os.path.join(media_root, name), 'JPEG')
+
+    def image_link(self, image, sizes):
+        # What the page's {% responsive_image %} builds, Cloudinary or local
+        img = responsive_image(image)
+        self.assertGreater(len(img.variants), 1)
+        return preload.image_link(img.src, img.srcset, sizes)
+
+    def test_home_links_assets_hero_and_first_card(self):
+        response = self.client.get(reverse('home'))
+        link = response['Link']
+        self.assertIn(f"<{static('bundles/core.css')}>; rel=preload; as=style", link)
+        self.assertIn(f"<{static('bundles/home.css')}>; rel=preload; as=style", link)
+        self.assertIn(f"<{static('bundles/core.js')}>; rel=preload; as=script", link)
+        self.assertIn(f"<{static('font/MonumentExtended-Ultrabold.otf')}>; rel=preload; as=font; "
+                      'type="font/otf"; crossorigin', link)
+        hero = responsive_image(HeroSection.objects.get(page='home').background_image)
+        self.assertIn(preload.image_link(hero.url_for(preload.HERO_WIDTH)), link)
+        card = self.image_link(Product.objects.filter(is_featured=True).first().image,
+                               '(min-width: 992px) 25vw, (min-width: 576px) 50vw, 100vw')
+        self.assertIn(card, link)
+        self.assertEqual(link.count('products/maize'), card.count('products/maize'))
+
+        cached = self.client.get(reverse('home'))
+        self.assertEqual(cached['X-Page-Cache'], 'hit')
+        self.assertEqual(cached['Link'], response['Link'])
+
+    def test_eager_image_wins_over_cards(self):
+        product = Product.objects.get(slug='maize-1')
+        link = self.client.get(reverse('product_detail', args=[product.slug]))['Link']
+        self.assertEqual(link.count('as=image'), 1)
+        self.assertIn(self.image_link(product.image, '(min-width: 768px) 650px, 100vw'), link)
+        self.assertIn(f"<{static('bundles/product.js')}>; rel=preload; as=script", link)
+
+    def test_json_responses_have_no_links(self):
+        self.assertFalse(self.client.get(reverse('search_json'), {'q': 'maize'}).has_header('Link'))
+
+    def test_early_hints_for_a_known_view(self):
+        self.client.get(reverse('home'))
+        sent = []
+
+        async def app(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 200})
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/', 'extensions': {preload.EARLY_HINT: {}}}
+        async_to_sync(preload.EarlyHints(app))(scope, None, send)
+        self.assertEqual(sent[0]['type'], preload.EARLY_HINT)
+        self.assertIn(b'</static/bundles/home.css>; rel=preload; as=style', sent[0]['links'])
+        self.assertFalse(any(b'as=image' in link for link in sent[0]['links']))
+
+        sent.clear()
+        async_to_sync(preload.EarlyHints(app))(dict(scope, extensions={}), None, send)
+        self.assertEqual([message['type'] for message in sent], ['http.response.start'])
+
+
+@contextmanager
+def async_urlconf():
+    """The URLconf as core/asgi.py gets it: urls.py picks the views at import."""
+    def reload():
+        for name in ('rearm.urls', 'blog.urls', settings.ROOT_URLCONF):
+            importlib.reload(import_module(name))
+        clear_url_caches()
+
+    with override_settings(ASYNC_VIEWS=True):
+        reload()
+    try:
+        yield
+    finally:
+        reload()
+
+
+_CSRF_VALUE_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+@override_settings(CACHES=LOCMEM_CACHE, QUERY_BUDGET_ENABLED=False, PAGE_CACHE_ENABLED=False,
+                   STORAGES=PLAIN_STORAGES)
+class AsyncViewTests(PublicPagesTestData, TestCase):
+    """The async read views serve what the sync ones do, without sync ORM calls on the event loop."""
+
+    def content(self, response):
+        return _CSRF_VALUE_RE.sub(r'\g<1>\g<2>', response.content.decode())
+
+    def test_pages_match_sync_views(self):
+        author = get_user_model().objects.get(username='author')
+        for i in range(8, 12):
+            Post.objects.create(title=f'Post {i}', author=author, content='<p>More</p>', is_published=True)
+        next_page = self.client.get(reverse('post_list_json')).json()['next']
+        pages = [reverse(name, args=args) + query for name, args, query in PUBLIC_PAGES]
+        pages += [next_page, reverse('product_detail', args=['missing'])]
+        expected = {}
+        for url in pages:
+            cache.clear()
+            expected[url] = self.client.get(url)
+
+        with async_urlconf():
+            self.assertTrue(iscoroutinefunction(resolve(reverse('post_detail', args=['post-3'])).func))
+            for url in pages:
+                cache.clear()
+                with self.subTest(url=url):
+                    # Raises SynchronousOnlyOperation if a query runs on the loop
+                    response = async_to_sync(self.async_client.get)(url)
+                    self.assertEqual(response.status_code, expected[url].status_code)
+                    self.assertEqual(self.content(response), self.content(expected[url]))
+
+    @override_settings(PAGE_CACHE_ENABLED=True)
+    def test_page_cache_and_conditional_get(self):
+        url = reverse('product_detail', args=['maize-1'])
+        with async_urlconf():
+            first = async_to_sync(self.async_client.get)(url)
+            self.assertEqual(first['X-Page-Cache'], 'miss')
+            self.assertEqual(async_to_sync(self.async_client.get)(url)['X-Page-Cache'], 'hit')
+            with self.assertNumQueries(1):
+                response = async_to_sync(self.async_client.get)(url, headers={'If-None-Match': first['ETag']})
+            self.assertEqual(response.status_code, 304)
+
+    def test_query_recorder_sees_async_queries(self):
+        async def count():
+            async with QueryRecorder() as recorder:
+                await Product.objects.acount()
+                await Post.objects.afirst()
+            return recorder.count
+
+        self.assertEqual(async_to_sync(count)(), 2)
+
+    def test_static_files_stream_without_a_thread_per_request(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        with open(os.path.join(root, 'app.js'), 'w') as f:
+            f.write('console.log(1);' * 1000)
+
+        async def get_response(request):
+            raise AssertionError('static file not served')
+
+        middleware = AsyncWhiteNoiseMiddleware(get_response)
+        middleware.add_files(root, prefix='static/')
+        self.assertTrue(iscoroutinefunction(middleware))
+
+        async def fetch():
+            response = await middleware(RequestFactory().get('/static/app.js'))
+            return response, b''.join([chunk async for chunk in response])
+
+        response, body = async_to_sync(fetch)()
+        response.close()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertEqual(body, b'console.log(1);' * 1000)
+
+
+class ServerBenchmarkTests(TestCase):
+    """bench_servers' load generator, against a stub HTTP server."""
+
+    def test_slow_clients_hold_connections_while_clients_are_timed(self):
+        slow_headers = []
+
+        async def handle(reader, writer):
+            head = await reader.readuntil(b'\r\n\r\n')
+            slow_headers.append(head.count(b'X-Slow-'))
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: close\r\n\r\nok')
+            await writer.drain()
+            writer.close()
+
+        async def bench():
+            server = await asyncio.start_server(handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                return await run_load('127.0.0.1', port, build_request('/', 'localhost'),
+                                      concurrency=2, duration=0.3, slow_clients=1, slow_interval=0.05)
+
+        result = async_to_sync(bench)()
+        self.assertGreater(result['requests'], 0)
+        self.assertEqual(result['errors'], 0)
+        self.assertEqual(result['statuses'], {'200': result['requests']})
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        # The slow client's request only ended once the timed clients were done
+        self.assertGreater(max(slow_headers), 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, QUERY_BUDGET_ENABLED=False, PAGE_CACHE_ENABLED=True,
+                   STORAGES=PLAIN_STORAGES)
+class WarmupTests(PublicPagesTestData, TestCase):
+    """Worker warmup (core.gunicorn_config's post_worker_init) and the /healthz, /readyz probes."""
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.dict(warmup._state, {'warm': False, 'thread': None})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_healthz_answers_ahead_of_the_host_check(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/healthz', HTTP_HOST='not-allowed.example')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ok'})
+        self.assertEqual(response['Cache-Control'], 'no-store')
+
+    def test_readyz_is_unavailable_until_warm(self):
+        with mock.patch.object(warmup, 'start_warming') as start_warming, self.assertLogs('django.request'):
+            response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {'status': 'unavailable', 'warm': False, 'database': True})
+        start_warming.assert_called_once_with()
+
+        with mock.patch.object(warmup, 'public_urls', return_value=['/', '/products/']):
+            timings = warmup.warm()
+        self.assertEqual(list(timings), ['connect', 'templates', 'caches', 'pages'])
+        response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'ready')
+
+    def test_readyz_reports_the_database(self):
+        warmup._state['warm'] = True
+        with mock.patch.object(connection, 'cursor', side_effect=OperationalError), self.assertLogs('django.request'):
+            response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {'status': 'unavailable', 'warm': True, 'database': False})
+
+    def test_warm_fills_the_page_cache(self):
+        notify = mock.Mock()
+        with mock.patch.object(warmup, 'public_urls', return_value=['/', '/products/']):
+            warmup.warm(notify=notify)
+        self.assertEqual(notify.call_count, 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/products/')['X-Page-Cache'], 'hit')
+
+    def test_public_urls_cover_the_get_pages(self):
+        urls = warmup.public_urls()
+        post = Post.objects.published().first()
+        product = Product.objects.filter(is_active=True).first()
+        for url in ('/', '/products/', reverse('post_detail', args=[post.slug]),
+                    reverse('product_detail', args=[product.slug]), reverse('search') + '?q=maize'):
+            self.assertIn(url, urls)
+        self.assertNotIn(reverse('upload_media'), urls)
+
+    def test_compile_templates_loads_every_project_template(self):
+        with self.assertNoLogs('rearm.warmup', 'WARNING'):
+            compiled = warmup.compile_templates()
+        templates = [name for directory in ('rearm/templates', 'blog/templates', 'templates')
+                     for _, _, names in os.walk(os.path.join(settings.BASE_DIR, directory))
+                     for name in names if name.endswith(warmup.TEMPLATE_EXTENSIONS)]
+        self.assertEqual(compiled, len(templates))
+
+
+class DatabaseConfigTests(TestCase):
+    """core.database builds DATABASES for core.settings and core.deployment."""
+
+    AZURE = "dbname=rearm host=rearm.postgres.database.azure.com port=5432 sslmode=require user=admin password='p w\\'d'"
+
+    def test_azure_connection_string(self):
+        self.assertEqual(parse_connection_string(self.AZURE)['password'], "p w'd")
+        config = database_config({'AZURE_POSTGRESQL_CONNECTIONSTRING': self.AZURE})
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((config['NAME'], config['USER'], config['HOST'], config['PORT']),
+                         ('rearm', 'admin', 'rearm.postgres.database.azure.com', '5432'))
+        self.assertEqual(config['OPTIONS']['sslmode'], 'require')
+        self.assertEqual(config['OPTIONS']['options'], '-c statement_timeout=30000')
+        self.assertEqual(config['OPTIONS']['pool'], {'min_size': 2, 'max_size': 4, 'timeout': 10.0,
+                                                     'max_idle': 300.0, 'max_lifetime': 1800.0})
+        # Django refuses a pool with persistent connections
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+
+    def test_database_url_without_pool(self):
+        config = database_config({
+            'DATABASE_URL': 'postgres://web:secret@db:5432/rearm',
+            'AZURE_POSTGRESQL_CONNECTIONSTRING': self.AZURE,
+            'DATABASE_POOL': 'false',
+            'DATABASE_STATEMENT_TIMEOUT': '0',
+        })
+        self.assertEqual((config['NAME'], config['HOST']), ('rearm', 'db'))
+        self.assertEqual(config['OPTIONS'], {'sslmode': 'require'})
+        self.assertEqual(config['CONN_MAX_AGE'], 600)
+
+    def test_sqlite_fallback(self):
+        self.assertEqual(database_config({}, base_dir='/srv/rearm'),
+                         {'ENGINE': 'django.db.backends.sqlite3', 'NAME': '/srv/rearm/db.sqlite3'})
+        config = database_config({'DATABASE_URL': 'sqlite:////tmp/rearm.db'})
+        self.assertNotIn('OPTIONS', config)
+
+    @skipUnless(importlib.util.find_spec('psycopg_pool'), 'needs psycopg_pool')
+    def test_pool_sizes_on_readyz(self):
+        from psycopg_pool import ConnectionPool
+
+        self.assertIsNone(pool_stats())
+        pool = ConnectionPool(kwargs={'host': '127.0.0.1'}, open=False, min_size=1, max_size=3)
+        with mock.patch.dict(connection.settings_dict['OPTIONS'], {'pool': {'max_size': 3}}), \
+                mock.patch.object(connection, 'pool', pool, create=True), \
+                mock.patch.dict(warmup._state, {'warm': True}):
+            self.assertEqual(pool_stats()['pool_max'], 3)
+            response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['pool']), set(POOL_SIZES))
+        self.assertEqual(response.json()['pool']['pool_max'], 3)
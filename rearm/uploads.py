@@ -0,0 +1,177 @@
+# rearm/uploads.py
+"""
+Content-addressed image uploads.
+
+ContentHashUploadHandler streams the upload to a temporary file while
+hashing it, and gives up as soon as the body is over UPLOAD_MAX_BYTES or the
+image header declares more than UPLOAD_MAX_PIXELS, without reading the rest.
+When the dimensions are not within the first HEADER_BYTES (large EXIF, XMP
+or ICC segments come before them in many camera JPEGs), the image is checked
+from the temporary file once the upload is complete.
+
+Files are stored under their SHA-256, so uploading the same image twice
+stores it once. The response hands back the original's URL, which is stable
+from the moment it is saved; optimize_upload() then downscales and converts
+it to WebP after the response has been sent. Once that WebP exists, uploads
+of the same image are given its URL instead. The original is always kept:
+it may already be embedded in a page, and it is what is served when Pillow
+cannot convert the image.
+"""
+import hashlib
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = 'uploads'
+ORIGINALS_DIR = 'uploads/originals'
+HEADER_BYTES = 64 * 1024  # enough of most files for Pillow to read the dimensions
+
+FORMAT_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'GIF': '.gif',
+    'WEBP': '.webp',
+    'BMP': '.bmp',
+    'TIFF': '.tif',
+}
+
+
+class UploadRejected(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def max_bytes():
+    return getattr(settings, 'UPLOAD_MAX_BYTES', 10 * 1024 * 1024)
+
+
+def max_pixels():
+    return getattr(settings, 'UPLOAD_MAX_PIXELS', 40_000_000)
+
+
+def final_name(digest):
+    return f'{UPLOAD_DIR}/{digest[:2]}/{digest}.webp'
+
+
+def original_name(digest, image_format):
+    return f'{ORIGINALS_DIR}/{digest}{FORMAT_EXTENSIONS[image_format]}'
+
+
+class ContentHashUploadHandler(FileUploadHandler):
+    """Hash, size-check and sniff an image upload while it streams to disk."""
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.error = None
+        self.file = None
+        self.header = b''
+        self.image_format = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > max_bytes() + HEADER_BYTES:  # allowance for multipart framing
+            self.error = UploadRejected('File too large', status=413)
+            # Claim the body without reading it
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+        self.file = TemporaryUploadedFile(self.file_name, self.content_type, 0, self.charset,
+                                          self.content_type_extra)
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > max_bytes():
+            self.abort(UploadRejected('File too large', status=413))
+        if self.image_format is None and len(self.header) < HEADER_BYTES:
+            self.header += raw_data[:HEADER_BYTES - len(self.header)]
+            self.sniff(BytesIO(self.header))
+        self.sha256.update(raw_data)
+        self.file.write(raw_data)
+
+    def sniff(self, stream, complete=False):
+        """
+        Read format and dimensions from `stream`. Unless it is `complete`,
+        a failure may only mean the dimensions have not arrived yet.
+        """
+        try:
+            with Image.open(stream) as img:
+                image_format, (width, height) = img.format, img.size
+        except Image.DecompressionBombError:
+            self.abort(UploadRejected('Image has too many pixels', status=413))
+        except (OSError, SyntaxError, ValueError):
+            if complete:
+                self.abort(UploadRejected('Not an image'))
+            return  # header incomplete, try again with the next chunk
+        if image_format not in FORMAT_EXTENSIONS:
+            self.abort(UploadRejected(f'Unsupported image format {image_format}'))
+        if width * height > max_pixels():
+            self.abort(UploadRejected('Image has too many pixels', status=413))
+        self.image_format = image_format
+
+    def abort(self, error):
+        self.error = error
+        if self.file is not None:
+            self.file.close()
+        raise StopUpload(connection_reset=True)
+
+    def file_complete(self, file_size):
+        if self.image_format is None:
+            self.file.seek(0)
+            self.sniff(self.file, complete=True)
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.content_hash = self.sha256.hexdigest()
+        self.file.image_format = self.image_format
+        return self.file
+
+
+def store_upload(uploaded_file):
+    """
+    Store `uploaded_file` (from ContentHashUploadHandler) under its hash.
+    Returns (name to serve, name of the original still to optimize or None).
+    """
+    digest = uploaded_file.content_hash
+    name = final_name(digest)
+    if default_storage.exists(name):
+        return name, None  # converted on an earlier upload
+
+    original = original_name(digest, uploaded_file.image_format)
+    if not default_storage.exists(original):
+        default_storage.save(original, File(uploaded_file))
+    return original, original
+
+
+def optimize_upload(original, name):
+    """
+    Downscale the image at `original` and save it as WebP at `name`. The
+    original is left in place; if it cannot be converted, it stays the only copy.
+    """
+    if default_storage.exists(name):
+        return
+    max_dimension = getattr(settings, 'UPLOAD_MAX_DIMENSION', 2560)
+    try:
+        with default_storage.open(original, 'rb') as f, Image.open(f) as img:
+            animated = getattr(img, 'is_animated', False)
+            if not animated:
+                img = ImageOps.exif_transpose(img)
+                img.thumbnail((max_dimension, max_dimension))
+            buffer = BytesIO()
+            img.save(buffer, format='WEBP', quality=getattr(settings, 'UPLOAD_WEBP_QUALITY', 80),
+                     save_all=animated)
+    except (OSError, ValueError) as e:
+        logger.warning(f'Could not optimize upload {original}, serving it as uploaded: {e}')
+        return
+    default_storage.save(name, File(buffer, name=os.path.basename(name)))
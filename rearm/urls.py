@@ -1,19 +1,27 @@
 # core/urls.py
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 from rearm import views
 from .views import book_demo_page
 
+# The read pages are served by their async versions under ASGI
+read_views = views
+if settings.ASYNC_VIEWS:
+    from rearm import async_views as read_views
+
 urlpatterns = [
-    path('', views.home, name='home'),
-    path('services/', views.services, name='services'),
-    path('services/<slug:slug>/', views.service_detail, name='service_detail'),
+    path('', read_views.home, name='home'),
+    path('services/', read_views.services, name='services'),
+    path('services/<slug:slug>/', read_views.service_detail, name='service_detail'),
     path('upload_media/', views.upload_media, name='upload_media'),
     path('book-demo/', book_demo_page, name='book_demo'),
-    path('about/', views.about, name='about'),
-    path('products/', views.product_list, name='product_list'),
+    path('about/', read_views.about, name='about'),
+    path('products/', read_views.product_list, name='product_list'),
     # path('products/<slug:slug>/', views.products_by_category, name='products_by_category'),
-    path('product/<slug:slug>/', views.product_detail, name='product_detail'),
+    path('product/<slug:slug>/', read_views.product_detail, name='product_detail'),
+    path('search/', read_views.search, name='search'),
+    path('search.json', read_views.search_json, name='search_json'),
     # path('contact/', views.contact, name='contact'),
 ]
 
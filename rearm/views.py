@@ -2,25 +2,37 @@
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_GET
-from datetime import datetime
-import os
+from django.core.files.storage import default_storage
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_GET, require_POST
+from django.utils.text import Truncator
 
 from .models import (
     Service, AboutSection, TeamMember, Leadership, Navbar,
-    Product, ProductCategory
+    Product, ProductCategory, DemoBooking
 )
 from blog.models import Post
 from .forms import DemoBookingForm
+from .search import search as search_index
+from .pagecache import cache_page_tagged, add_page_tags
+from .conditional import detail_condition
+from .outbox import enqueue
+from .uploads import ContentHashUploadHandler, final_name, optimize_upload, store_upload
 
+SEARCH_MIN_LENGTH = 2
+SEARCH_RESULTS_LIMIT = 10
 
+# Product pages also show related products: any product or category edit may change one
+PRODUCT_DETAIL_TAGS = ('product:*', 'productcategory:*')
+
+
+@cache_page_tagged('leadership:*', 'aboutsection:*', 'service:*', 'product:*', 'post:*', 'category:*')
 def home(request):
     ceo_message = Leadership.objects.filter(is_ceo=True).first()  # CEO message
     about_content = AboutSection.objects.filter(is_active=True).first()
     featured_services = Service.objects.filter(is_featured=True)[:3]  # 3 featured services
     featured_products = Product.objects.filter(is_featured=True)[:3]  # 3 featured products
-    blog_posts = Post.objects.filter(is_published=True).order_by('-created_at')[:4]  # latest 4 posts
+    blog_posts = Post.objects.published().cards().with_card_relations().order_by('-created_at')[:4]  # latest 4 posts
 
     context = {
         'ceo': ceo_message,
@@ -33,6 +45,7 @@ def home(request):
     return render(request, "rearm/home.html", context)
 
 
+@cache_page_tagged('service:*')
 def services(request):
     services = Service.objects.filter(is_featured=True)
     return render(request, 'rearm/services.html', {'services': services})
@@ -43,40 +56,52 @@ def service_detail(request, slug):
     return render(request, 'rearm/service_detail.html', {'service': service})
 
 
+class UploadResponse(JsonResponse):
+    """JsonResponse that converts the stored upload once it has been sent."""
+
+    def __init__(self, data, pending=None, name=None, **kwargs):
+        super().__init__(data, **kwargs)
+        self.pending = pending
+        self.name = name
+
+    def close(self):
+        super().close()
+        if self.pending:
+            optimize_upload(self.pending, self.name)
+
+
 @csrf_exempt
 def upload_media(request):
-    if request.FILES:
-        file = request.FILES['file']
-        # Create unique filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        ext = os.path.splitext(file.name)[1]
-        filename = f"uploads/{timestamp}{ext}"
-
-        # Save file manually
-        media_path = os.path.join('media', filename)
-        os.makedirs(os.path.dirname(media_path), exist_ok=True)
-        with open(media_path, 'wb+') as dest:
-            for chunk in file.chunks():
-                dest.write(chunk)
-
-        return JsonResponse({
-            'location': f"/media/{filename}"
-        })
-    return JsonResponse({'error': 'Invalid upload'}, status=400)
+    # Upload handlers must be in place before anything reads request.POST,
+    # CSRF checks included, so those run inside _upload_media.
+    request.upload_handlers = [ContentHashUploadHandler(request)]
+    return _upload_media(request)
+
+
+@csrf_protect
+@require_POST
+def _upload_media(request):
+    handler = request.upload_handlers[0]
+    file = request.FILES.get('file')
+    if handler.error is not None:
+        return JsonResponse({'error': str(handler.error)}, status=handler.error.status)
+    if file is None:
+        return JsonResponse({'error': 'Invalid upload'}, status=400)
+
+    name, pending = store_upload(file)
+    return UploadResponse({'location': default_storage.url(name)},
+                          pending=pending, name=final_name(file.content_hash))
 
 
 def book_demo_page(request):
     if request.method == 'POST':
         form = DemoBookingForm(request.POST)
         if form.is_valid():
-            booking = form.save()
-
             # Your actual Calendly URL here
             calendly_url = "https://meet.brevo.com/reaarm"
 
-            # Save Calendly link to booking
-            booking.calendly_event_uri = calendly_url
-            booking.save()
+            # Queued with the Calendly link; drain_lead_outbox inserts it
+            enqueue(DemoBooking, calendly_event_uri=calendly_url, **form.cleaned_data)
 
             return redirect(calendly_url)
     else:
@@ -86,6 +111,7 @@ def book_demo_page(request):
 
 
 @require_GET
+@cache_page_tagged('aboutsection:*', 'leadership:*', 'teammember:*')
 def about(request):
     try:
         about_content = AboutSection.objects.filter(is_active=True).latest('id')
@@ -111,6 +137,7 @@ def about(request):
     return render(request, 'rearm/about.html', context)
 
 
+@cache_page_tagged('product:*')
 def product_list(request):
     agricultural = Product.objects.filter(
         product_type='type1',
@@ -129,15 +156,83 @@ def product_list(request):
     return render(request, 'rearm/products/list.html', context)
 
 
+@detail_condition(Product.objects.filter(is_active=True), tags=PRODUCT_DETAIL_TAGS)
+@cache_page_tagged()
 def product_detail(request, slug):
     product = get_object_or_404(Product, slug=slug, is_active=True)
-    related_products = Product.objects.filter(
+    related_products = list(Product.objects.filter(
         category=product.category,
         is_active=True
-    ).exclude(id=product.id)[:4]
+    ).exclude(id=product.id)[:4])
+
+    # Only this product, the related ones shown and their category matter
+    add_page_tags(request, f'product:{product.id}', f'productcategory:{product.category_id}',
+                  *(f'product:{related.id}' for related in related_products))
 
     context = {
         'product': product,
         'related_products': related_products,
     }
     return render(request, 'rearm/products/detail.html', context)
+
+
+def _search_querysets(query):
+    """The unevaluated result querysets for `query`, by kind."""
+    if len(query) < SEARCH_MIN_LENGTH:
+        return {'posts': Post.objects.none(), 'products': Product.objects.none(),
+                'services': Service.objects.none()}
+    posts = search_index(Post.objects.published().cards(), query)
+    products = search_index(
+        Product.objects.filter(is_active=True).only('id', 'name', 'slug', 'description', 'image'),
+        query,
+    )
+    services = search_index(
+        Service.objects.only('id', 'title', 'slug', 'short_description', 'image'),
+        query,
+    )
+    return {
+        'posts': posts[:SEARCH_RESULTS_LIMIT],
+        'products': products[:SEARCH_RESULTS_LIMIT],
+        'services': services[:SEARCH_RESULTS_LIMIT],
+    }
+
+
+def _search_results(query):
+    return {kind: list(results) for kind, results in _search_querysets(query).items()}
+
+
+@require_GET
+def search(request):
+    query = request.GET.get('q', '').strip()
+    context = {
+        'query': query,
+        'results': _search_results(query),
+        'page_name': 'search',
+    }
+    return render(request, 'rearm/search.html', context)
+
+
+def _search_payload(query, results):
+    return {
+        'query': query,
+        'posts': [
+            {'title': post.title, 'url': post.get_absolute_url(), 'excerpt': post.excerpt}
+            for post in results['posts']
+        ],
+        'products': [
+            {'title': product.name, 'url': product.get_absolute_url(),
+             'excerpt': Truncator(product.description).words(20)}
+            for product in results['products']
+        ],
+        'services': [
+            {'title': service.title, 'url': service.get_absolute_url(),
+             'excerpt': Truncator(service.short_description).words(20)}
+            for service in results['services']
+        ],
+    }
+
+
+@require_GET
+def search_json(request):
+    query = request.GET.get('q', '').strip()
+    return JsonResponse(_search_payload(query, _search_results(query)))
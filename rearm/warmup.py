@@ -0,0 +1,241 @@
+# rearm/warmup.py
+"""
+Worker warmup, and the /healthz and /readyz probes.
+
+A fresh worker pays for template compilation, its first database
+connection and the site chrome on its first requests. warm() pays them up
+front: it opens the database connections, compiles the project's
+templates, loads the site chrome and critical CSS, and requests every
+public page once in-process (which also fills the page cache and the
+preload map). core/gunicorn_config.py compiles the templates in the master
+before forking and runs warm() in each worker before it accepts a
+connection.
+
+HealthCheckMiddleware answers the probes ahead of every other middleware,
+so no host check, SSL redirect, session or page cache is involved:
+
+  /healthz  200 while the process can serve at all (liveness)
+  /readyz   200 once this process is warm and the database answers, else
+            503 (readiness); with its connection pool's sizes. Under a server without the gunicorn hooks
+            (uvicorn, runserver) the first probe starts warming in the
+            background.
+"""
+import functools
+import logging
+import os
+import threading
+import time
+from importlib import import_module
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.http import JsonResponse
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.test import Client
+from django.urls import reverse
+
+from blog.models import Category, Post
+from core.database import POOL_SIZES, pool_stats
+
+from .critical import load_critical_css
+from .models import Product, Service
+from .site_chrome import get_snapshot
+
+logger = logging.getLogger(__name__)
+
+URLCONFS = ('rearm.urls', 'blog.urls')
+
+# Form/upload endpoints: POST only, nothing to request with a GET
+SKIPPED_VIEWS = {'upload_media', 'subscribe_newsletter', 'submit_contact'}
+
+# URL name -> callable returning the reverse() args, from existing rows
+URL_ARGS = {
+    'service_detail': lambda: Service.objects.values_list('slug', flat=True).first(),
+    'product_detail': lambda: Product.objects.filter(is_active=True).values_list('slug', flat=True).first(),
+    'post_detail': lambda: Post.objects.published().values_list('slug', flat=True).first(),
+    'category_posts': lambda: (Category.objects.filter(post__is_published=True)
+                               .values_list('slug', flat=True).first()),
+}
+
+URL_QUERIES = {
+    'search': 'q=maize',
+    'search_json': 'q=maize',
+}
+
+TEMPLATE_EXTENSIONS = ('.html', '.txt')
+
+_state = {'warm': False, 'thread': None}
+_lock = threading.Lock()
+
+
+def is_warm():
+    return _state['warm']
+
+
+def request_host():
+    """A Host header ALLOWED_HOSTS accepts, for in-process requests."""
+    host = settings.ALLOWED_HOSTS[0].strip().lstrip('.') if settings.ALLOWED_HOSTS else ''
+    return host if host and host != '*' else 'localhost'
+
+
+def open_connections():
+    for connection in connections.all():
+        connection.ensure_connection()
+
+
+def compile_templates():
+    """Load every project template (not those of installed packages) into the engines' caches."""
+    compiled = 0
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            if not str(directory).startswith(str(settings.BASE_DIR)):
+                continue
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    if not name.endswith(TEMPLATE_EXTENSIONS):
+                        continue
+                    template_name = os.path.relpath(os.path.join(root, name), directory).replace(os.sep, '/')
+                    try:
+                        engine.get_template(template_name)
+                    except (TemplateDoesNotExist, TemplateSyntaxError) as exc:
+                        logger.warning('Template %s not compiled: %s', template_name, exc)
+                        continue
+                    compiled += 1
+    return compiled
+
+
+def prime_caches():
+    get_snapshot()
+    for page in getattr(settings, 'CRITICAL_CSS_PAGES', {}):
+        load_critical_css(page)
+
+
+def public_urls():
+    """Path (with query string) of every public page that has the rows to build its URL."""
+    urls = []
+    for urlconf in URLCONFS:
+        for pattern in import_module(urlconf).urlpatterns:
+            name = pattern.name
+            if not name or name in SKIPPED_VIEWS:
+                continue
+            args = ()
+            if name in URL_ARGS:
+                value = URL_ARGS[name]()
+                if value is None:
+                    continue
+                args = (value,)
+            query = URL_QUERIES.get(name, '')
+            urls.append(reverse(name, args=args) + (f'?{query}' if query else ''))
+    return urls
+
+
+def render_pages(notify=None):
+    """Request each public page once; returns how many did not answer 200."""
+    client = Client(HTTP_HOST=request_host(), secure=getattr(settings, 'SECURE_SSL_REDIRECT', False))
+    failed = []
+    for url in public_urls():
+        try:
+            status = client.get(url).status_code
+        except Exception:
+            logger.exception('Warmup request for %s failed', url)
+            status = None
+        if status != 200:
+            failed.append(url)
+        if notify:
+            notify()
+    if failed:
+        logger.warning('Warmup: %s did not answer 200', ', '.join(failed))
+    return len(failed)
+
+
+def warm(notify=None):
+    """
+    Warm this process up; returns {step: seconds}. `notify` is called
+    between pages (gunicorn's worker.notify, so a long warmup is not
+    taken for a hung worker).
+    """
+    timings = {}
+    for step, func in (('connect', open_connections), ('templates', compile_templates),
+                       ('caches', prime_caches), ('pages', functools.partial(render_pages, notify))):
+        started = time.perf_counter()
+        try:
+            func()
+        except Exception:
+            # A worker that can't warm up still serves; /readyz reports the database
+            logger.exception('Warmup step %s failed', step)
+        timings[step] = round(time.perf_counter() - started, 3)
+    _state['warm'] = True
+    return timings
+
+
+def _warm_in_background():
+    try:
+        logger.info('Warmed up: %s', warm())
+    finally:
+        connections.close_all()
+
+
+def start_warming():
+    """Warm up in a thread, once per process."""
+    with _lock:
+        if _state['thread'] is None and not _state['warm']:
+            _state['thread'] = threading.Thread(target=_warm_in_background, name='warmup', daemon=True)
+            _state['thread'].start()
+
+
+# --- probes -----------------------------------------------------------------
+
+def database_ok():
+    try:
+        with connections['default'].cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except DatabaseError:
+        return False
+    return True
+
+
+def _probe_response(data, status=200):
+    response = JsonResponse(data, status=status)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def healthz():
+    return _probe_response({'status': 'ok'})
+
+
+def readyz():
+    warm = is_warm()
+    if not warm:
+        start_warming()
+    database = database_ok()
+    ready = warm and database
+    data = {'status': 'ready' if ready else 'unavailable', 'warm': warm, 'database': database}
+    stats = pool_stats()
+    if stats is not None:
+        data['pool'] = {key: stats.get(key, 0) for key in POOL_SIZES}
+    return _probe_response(data, status=200 if ready else 503)
+
+
+PROBES = {'/healthz': healthz, '/readyz': readyz}
+
+
+class HealthCheckMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        probe = PROBES.get(request.path_info)
+        return probe() if probe else self.get_response(request)
+
+    async def __acall__(self, request):
+        probe = PROBES.get(request.path_info)
+        return await sync_to_async(probe)() if probe else await self.get_response(request)